@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Campaign Throughput Benchmark
+Sends whole campaigns to a local SMTP sink and reports msgs/sec, latency, CPU time and peak RSS.
+"""
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; CPU time and peak RSS are then not reported
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_automation_tool import EmailAutomationTool
+from smtp_sink import SMTPSink
+
+
+PLAIN_BODY = "Dear {Name},\n\nThank you for joining us! Your email {Email} has been registered.\n\n" * 10
+HTML_BODY = "<html><body><p>Dear <strong>{Name}</strong>,</p><p>Your email <em>{Email}</em> is registered.</p></body></html>"
+
+
+def percentile(values, fraction: float):
+    """Return the value at the given fraction of the sorted values, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+def usage():
+    """CPU seconds used by this process and its children, and their peak RSS in MB."""
+    if resource is None:
+        return None, None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    # ru_maxrss is reported in KB on Linux and in bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return cpu, max(own.ru_maxrss, children.ru_maxrss) / scale
+
+
+def run_scenario(spec: dict) -> dict:
+    """Send one campaign in this process and return its measurements."""
+    with tempfile.TemporaryDirectory() as directory:
+        recipients_path = os.path.join(directory, 'recipients.csv')
+        with open(recipients_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['Name', 'Email'])
+            for i in range(spec['recipients']):
+                writer.writerow([f'User {i}', f'user{i}@example{i % 50}.com'])
+        
+        attachments = []
+        if spec['attachment_kb']:
+            attachment = os.path.join(directory, 'brochure.pdf')
+            with open(attachment, 'wb') as file:
+                file.write(os.urandom(spec['attachment_kb'] * 1024))
+            attachments.append(attachment)
+        
+        tool = EmailAutomationTool()
+        tool.email_config = spec['email_config']
+        tool.send_settings.update(spec['send_settings'])
+        if spec['outbox']:
+            tool.send_settings['outbox_path'] = os.path.join(directory, 'outbox')
+        tool.load_recipients(recipients_path, stream=True)
+        email_data = {
+            'subject': 'Welcome, {Name}!',
+            'body': HTML_BODY if spec['format'] == 'html' else PLAIN_BODY,
+            'format': spec['format'],
+            'attachments': attachments
+        }
+        
+        latencies = array('d')
+        
+        def timed(attempt):
+            def timed_attempt(*args, **kwargs):
+                start = time.perf_counter()
+                result = attempt(*args, **kwargs)
+                latencies.append(time.perf_counter() - start)
+                return result
+            return timed_attempt
+        
+        # Messages sent from the outbox go through attempt_send_batch
+        tool.attempt_send = timed(tool.attempt_send)
+        tool.attempt_send_batch = timed(tool.attempt_send_batch)
+        
+        cpu_before, _ = usage()
+        start = time.perf_counter()
+        summary = tool.send_bulk_emails(email_data) or {}
+        elapsed = time.perf_counter() - start
+        cpu_after, peak_rss = usage()
+    
+    return {
+        'successful': summary.get('successful', 0),
+        'failed': summary.get('failed', 0),
+        'seconds': elapsed,
+        'p50_ms': None if not latencies else percentile(latencies, 0.50) * 1000,
+        'p99_ms': None if not latencies else percentile(latencies, 0.99) * 1000,
+        'cpu_seconds': None if cpu_before is None else cpu_after - cpu_before,
+        'peak_rss_mb': peak_rss
+    }
+
+
+def format_value(value, pattern: str) -> str:
+    """Format a measurement, showing '-' when it is not available."""
+    return '-' if value is None else format(value, pattern)
+
+
+def main():
+    """Run every scenario in a fresh process and print a results table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma-separated recipient counts')
+    parser.add_argument('--formats', default='plain,html', help='comma-separated formats (plain, html)')
+    parser.add_argument('--attachment-kb', type=int, default=256,
+                        help='attachment size for the attachment scenarios (0 skips them)')
+    parser.add_argument('--workers', type=int, default=4, help='send worker threads per process')
+    parser.add_argument('--processes', default='1', help='comma-separated process counts to compare')
+    parser.add_argument('--outbox', default='off',
+                        help='comma-separated outbox modes to compare (off renders as it sends, on spools ahead)')
+    parser.add_argument('--latency', type=float, default=0.0, help='sink delay before every reply, in seconds')
+    parser.add_argument('--extensions', default='',
+                        help='comma-separated ESMTP extensions the sink advertises, e.g. PIPELINING,CHUNKING')
+    parser.add_argument('--temp-fail-rate', type=float, default=0.0, help='fraction of recipients refused with 451')
+    parser.add_argument('--perm-fail-rate', type=float, default=0.0, help='fraction of recipients refused with 550')
+    parser.add_argument('--json', dest='json_path', help='also write the results to this JSON file')
+    parser.add_argument('--scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.scenario:
+        # Child mode: keep the tool's per-recipient output off the result line
+        stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+        result = run_scenario(json.loads(args.scenario))
+        stdout.write(json.dumps(result) + '\n')
+        return
+    
+    sizes = [int(size) for size in args.sizes.split(',')]
+    formats = args.formats.split(',')
+    process_counts = [int(count) for count in args.processes.split(',')]
+    attachment_sizes = [0, args.attachment_kb] if args.attachment_kb else [0]
+    outbox_modes = [mode == 'on' for mode in args.outbox.split(',')]
+    
+    print(f"{'Scenario':<34}{'sent':>8}{'msg/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'CPU s':>9}{'RSS MB':>9}")
+    print("-" * 88)
+    results = []
+    # Scenarios run in a scratch directory so their logs do not pile up in the project
+    with tempfile.TemporaryDirectory() as workdir, SMTPSink(latency=args.latency, temp_fail_rate=args.temp_fail_rate,
+                  perm_fail_rate=args.perm_fail_rate, keep_messages=False, seed=1,
+                  extensions=[name for name in args.extensions.upper().split(',') if name]) as sink:
+        for size in sizes:
+            for email_format in formats:
+                for attachment_kb in attachment_sizes:
+                    for processes, outbox in ((p, o) for p in process_counts for o in outbox_modes):
+                        name = f"{size} {email_format}"
+                        name += f" +{attachment_kb}KB" if attachment_kb else ""
+                        name += f" x{processes}p" if processes > 1 else ""
+                        name += " outbox" if outbox else ""
+                        spec = {
+                            'recipients': size,
+                            'format': email_format,
+                            'attachment_kb': attachment_kb,
+                            'outbox': outbox,
+                            'email_config': sink.email_config(),
+                            'send_settings': {
+                                'workers': args.workers,
+                                'processes': processes,
+                                'journal_path': None,
+                                'retry_base_delay': 0.05,
+                                'retry_max_delay': 0.5,
+                                'rate_limit': {'messages_per_second': 1e9, 'burst': 1e9, 'messages_per_day': None}
+                            }
+                        }
+                        sink.reset()
+                        completed = subprocess.run(
+                            [sys.executable, os.path.abspath(__file__), '--scenario', json.dumps(spec)],
+                            cwd=workdir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True
+                        )
+                        result = json.loads(completed.stdout.strip().splitlines()[-1])
+                        result.update({'scenario': name, 'received': sink.message_count})
+                        results.append(result)
+                        
+                        rate = result['successful'] / result['seconds'] if result['seconds'] else 0
+                        print(f"{name:<34}{result['successful']:>8}{rate:>10.0f}"
+                              f"{format_value(result['p50_ms'], '.2f'):>9}{format_value(result['p99_ms'], '.2f'):>9}"
+                              f"{format_value(result['cpu_seconds'], '.1f'):>9}"
+                              f"{format_value(result['peak_rss_mb'], '.0f'):>9}")
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+        print(f"\n💾 Results written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Message Assembly Benchmark
+Compares messages/sec of full MIME serialization against the spliced builder.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_automation_tool import EmailAutomationTool
+
+
+PLAIN_BODY = "Dear {Name},\n\nThank you for joining us! Your email {Email} has been registered.\n\n" * 10
+HTML_BODY = "<html><body><p>Dear <strong>{Name}</strong>,</p><p>Your email <em>{Email}</em> is registered.</p></body></html>"
+
+
+def measure(tool: EmailAutomationTool, email_data: dict, messages: int) -> float:
+    """Serialize messages for distinct recipients and return messages per second."""
+    recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(messages)]
+    start = time.perf_counter()
+    for recipient in recipients:
+        tool.serialize_message(recipient, email_data)
+    return messages / (time.perf_counter() - start)
+
+
+def main():
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=2000, help='messages per scenario')
+    parser.add_argument('--attachment-kb', type=int, default=512, help='attachment size in KB')
+    args = parser.parse_args()
+    
+    tool = EmailAutomationTool()
+    tool.email_config = {'email': 'sender@example.com'}
+    
+    with tempfile.TemporaryDirectory() as directory:
+        attachment = os.path.join(directory, 'brochure.pdf')
+        with open(attachment, 'wb') as file:
+            file.write(os.urandom(args.attachment_kb * 1024))
+        
+        scenarios = [
+            ('plain', PLAIN_BODY, []),
+            ('html', HTML_BODY, []),
+            ('plain + attachment', PLAIN_BODY, [attachment]),
+            ('html + attachment', HTML_BODY, [attachment]),
+        ]
+        
+        print(f"{'Scenario':<22}{'mime msg/s':>14}{'splice msg/s':>16}{'speedup':>10}")
+        print("-" * 62)
+        for name, body, attachments in scenarios:
+            email_data = {
+                'subject': 'Welcome, {Name}!',
+                'body': body,
+                'format': 'html' if name.startswith('html') else 'plain',
+                'attachments': attachments
+            }
+            results = {}
+            for mode in ('mime', 'splice'):
+                tool.send_settings['message_assembly'] = mode
+                results[mode] = measure(tool, email_data, args.messages)
+            speedup = results['splice'] / results['mime']
+            print(f"{name:<22}{results['mime']:>14.0f}{results['splice']:>16.0f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
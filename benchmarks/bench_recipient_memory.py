@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Recipient Memory Benchmark
+Compares memory, iteration and random access of a list of dicts against the recipient stores.
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recipient_source import RecipientSource
+from recipient_store import create_recipient_store
+
+
+def write_recipients(path: str, rows: int) -> None:
+    """Write a CSV with a distinct name and address and a few repeated columns per row."""
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("Name,Email,Company,City,Plan\n")
+        for i in range(rows):
+            file.write(f"User {i},user{i}@example.com,Company {i % 500},City {i % 50},"
+                       f"{('free', 'team', 'enterprise')[i % 3]}\n")
+
+
+def measure(mode: str, path: str, directory: str, lookups: int) -> dict:
+    """Load the recipients into a store and time iterating and indexing it."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    recipients = create_recipient_store(mode, RecipientSource(path), directory)
+    load = time.perf_counter() - start
+    gc.collect()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    
+    start = time.perf_counter()
+    for recipient in recipients:
+        recipient['email']
+    iterate = time.perf_counter() - start
+    
+    indexes = [random.randrange(len(recipients)) for _ in range(lookups)]
+    start = time.perf_counter()
+    for index in indexes:
+        recipients[index]
+    lookup = time.perf_counter() - start
+    
+    if hasattr(recipients, 'close'):
+        recipients.close()
+    return {'memory': memory, 'load': load, 'iterate': iterate, 'lookup': lookup}
+
+
+def main():
+    """Run the benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200000, help='recipients to load')
+    parser.add_argument('--lookups', type=int, default=10000, help='random index lookups to time')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'recipients.csv')
+        write_recipients(path, args.rows)
+        
+        print(f"{args.rows} recipients, {os.path.getsize(path) / 2 ** 20:.1f} MB of CSV\n")
+        print(f"{'Store':<10}{'MB':>10}{'bytes/row':>12}{'load s':>10}{'iterate s':>12}{'lookup µs':>12}")
+        print("-" * 66)
+        for mode in ('list', 'compact', 'mmap'):
+            result = measure(mode, path, directory, args.lookups)
+            print(f"{mode:<10}{result['memory'] / 2 ** 20:>10.1f}{result['memory'] / args.rows:>12.0f}"
+                  f"{result['load']:>10.2f}{result['iterate']:>12.2f}"
+                  f"{result['lookup'] / args.lookups * 1e6:>12.1f}")
+        print("\nMemory is the Python heap after loading (tracemalloc); mmap pages live in the OS page cache.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures how long importing the tool takes with -X importtime and checks it against a budget.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds allowed for importing email_automation_tool, with everything it imports
+DEFAULT_BUDGET_MS = 120
+
+# Subsystems that must only be imported when they are used
+LAZY_MODULES = ('smtplib', 'ssl', 'email.mime.text', 'email.mime.multipart', 'email.mime.base',
+                'message_builder', 'sender_pool', 'sent_index', 'campaign_scheduler', 'sqlite3', 'multiprocessing',
+                'http.server', 'cProfile', 'logging.handlers')
+
+
+def import_times(module: str = 'email_automation_tool') -> dict:
+    """
+    Import a module in a fresh interpreter and read -X importtime.
+    
+    Args:
+        module (str): Module to import
+    
+    Returns:
+        dict: Cumulative microseconds per imported module
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, cumulative, name = (part.strip() for part in line.replace('import time:', '|').split('|'))
+        times[name] = int(cumulative)
+    return times
+
+
+def measure(runs: int = 5, module: str = 'email_automation_tool') -> float:
+    """
+    Median cumulative import time of a module over several fresh interpreters.
+    
+    Args:
+        runs (int): Interpreters started
+        module (str): Module to import
+    
+    Returns:
+        float: Milliseconds
+    """
+    return statistics.median(import_times(module)[module] / 1000 for _ in range(runs))
+
+
+def main():
+    """Print the slowest imports and fail when the import exceeds the budget."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to measure')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET_MS, help='allowed import time in ms')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    args = parser.parse_args()
+    
+    times = import_times()
+    print(f"{'Module':<40}{'cumulative ms':>15}")
+    print("-" * 55)
+    for name, micros in sorted(times.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<40}{micros / 1000:>15.1f}")
+    
+    eager = [name for name in LAZY_MODULES if name in times]
+    if eager:
+        print(f"\n⚠️ Imported at startup although only needed later: {', '.join(eager)}")
+    
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import email_automation_tool; email_automation_tool.EmailAutomationTool()'],
+                   cwd=ROOT, check=True)
+    wall = (time.perf_counter() - start) * 1000
+    
+    median = measure(args.runs)
+    print(f"\n⏱️ Import: {median:.1f} ms median of {args.runs} (budget {args.budget:.0f} ms); "
+          f"interpreter start, import and construction: {wall:.0f} ms")
+    if median > args.budget or eager:
+        print("❌ Startup budget exceeded")
+        sys.exit(1)
+    print("✅ Within budget")
+
+
+if __name__ == "__main__":
+    main()
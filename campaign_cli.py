@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+Headless Campaign Runner
+Runs a campaign described by a TOML, JSON or YAML spec file without prompts, for cron and CI.
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from email_automation_tool import EmailAutomationTool
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        # Python before 3.11
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+# Exit codes
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_ERROR = 2
+
+SPEC_SECTIONS = {'smtp', 'email', 'recipients', 'settings', 'campaign_id', 'resume'}
+SMTP_KEYS = {'provider', 'email', 'password', 'app_password', 'smtp_server', 'smtp_port', 'use_tls'}
+
+BODY_FORMATS = {'.html': 'html', '.htm': 'html'}
+
+# 'render' and 'send' split a campaign around the outbox spool
+STAGES = ('all', 'render', 'send')
+
+
+class SpecError(ValueError):
+    """Raised when a campaign spec is missing, malformed or inconsistent."""
+
+
+def load_spec(path: str) -> Dict:
+    """
+    Read a campaign spec file. The format follows the extension.
+    
+    Args:
+        path (str): .toml, .json, .yaml or .yml file
+    
+    Returns:
+        Dict: Parsed spec
+    
+    Raises:
+        SpecError: If the file cannot be read or parsed
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.json':
+            with open(path, 'r', encoding='utf-8') as file:
+                spec = json.load(file)
+        elif extension == '.toml':
+            if tomllib is None:
+                raise SpecError("TOML specs need Python 3.11 or the tomli package")
+            with open(path, 'rb') as file:
+                spec = tomllib.load(file)
+        elif extension in ('.yaml', '.yml'):
+            try:
+                # Optional, and slow to import, so only loaded for YAML specs
+                import yaml
+            except ImportError:
+                raise SpecError("YAML specs need the PyYAML package") from None
+            with open(path, 'r', encoding='utf-8') as file:
+                spec = yaml.safe_load(file)
+        else:
+            raise SpecError(f"Unsupported spec format: {extension or path} (use .toml, .json or .yaml)")
+    except SpecError:
+        raise
+    except OSError as e:
+        raise SpecError(f"Cannot read spec {path}: {str(e)}") from None
+    except Exception as e:
+        # json, tomllib and yaml each raise their own parse errors
+        raise SpecError(f"Cannot parse spec {path}: {str(e)}") from None
+    
+    if not isinstance(spec, dict):
+        raise SpecError(f"Spec {path} must contain a table/object at the top level")
+    return spec
+
+
+def load_config_module(module_name: str = 'config') -> Dict:
+    """
+    Read EMAIL_CONFIG and EMAIL_SETTINGS from a config.py made from config_template.py.
+    
+    Args:
+        module_name (str): Module to import
+    
+    Returns:
+        Dict: 'smtp' and 'settings' from the module; empty if it does not exist
+    """
+    try:
+        module = importlib.import_module(module_name)
+    except ModuleNotFoundError as e:
+        if e.name != module_name:
+            raise
+        return {'smtp': {}, 'settings': {}}
+    return {
+        'smtp': dict(getattr(module, 'EMAIL_CONFIG', {})),
+        'settings': dict(getattr(module, 'EMAIL_SETTINGS', {}))
+    }
+
+
+def resolve_path(path: str, base_dir: str) -> str:
+    """Resolve a spec path relative to the directory of the spec file."""
+    return os.path.normpath(os.path.join(base_dir, os.path.expanduser(path)))
+
+
+def build_email_config(smtp: Dict, defaults: Dict[str, Dict]) -> Dict:
+    """
+    Merge spec SMTP settings over config.py credentials into a tool email_config.
+    
+    Args:
+        smtp (Dict): SMTP settings from the spec and config.py
+        defaults (Dict[str, Dict]): Server and port per provider
+    
+    Returns:
+        Dict: Email configuration
+    
+    Raises:
+        SpecError: If the sender or server is missing
+    """
+    unknown = set(smtp) - SMTP_KEYS
+    if unknown:
+        raise SpecError(f"Unknown smtp settings: {', '.join(sorted(unknown))}")
+    
+    provider = smtp.get('provider', 'gmail')
+    provider_defaults = defaults.get(provider, {})
+    config = {
+        'provider': provider,
+        'email': smtp.get('email', ''),
+        'password': smtp.get('password', smtp.get('app_password', '')),
+        'smtp_server': smtp.get('smtp_server', provider_defaults.get('smtp_server')),
+        'smtp_port': int(smtp.get('smtp_port', provider_defaults.get('smtp_port', 587))),
+        'use_tls': bool(smtp.get('use_tls', True))
+    }
+    if not config['email']:
+        raise SpecError("No sender address: set email in config.py EMAIL_CONFIG or the spec's smtp section")
+    if not config['smtp_server']:
+        raise SpecError(f"No SMTP server for provider '{provider}': set smtp_server")
+    if config['use_tls'] and not config['password']:
+        raise SpecError("No app password: set app_password in config.py EMAIL_CONFIG")
+    return config
+
+
+def build_email_data(email: Dict, base_dir: str) -> Dict:
+    """
+    Build the email composition data, reading template files.
+    
+    Args:
+        email (Dict): Email section of the spec
+        base_dir (str): Directory relative paths are resolved against
+    
+    Returns:
+        Dict: Email composition data
+    
+    Raises:
+        SpecError: If the subject, body or an attachment is missing
+    """
+    def text(key: str) -> Optional[str]:
+        if email.get(f'{key}_file'):
+            path = resolve_path(email[f'{key}_file'], base_dir)
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    return file.read().strip() if key == 'subject' else file.read()
+            except OSError as e:
+                raise SpecError(f"Cannot read {key} template {path}: {str(e)}") from None
+        return email.get(key)
+    
+    subject = text('subject')
+    body = text('body')
+    if not subject:
+        raise SpecError("The email section needs a subject or subject_file")
+    if not body or not body.strip():
+        raise SpecError("The email section needs a body or body_file")
+    
+    email_format = email.get('format')
+    if email_format is None:
+        extension = os.path.splitext(email.get('body_file') or '')[1].lower()
+        email_format = BODY_FORMATS.get(extension, 'plain')
+    if email_format not in ('plain', 'html'):
+        raise SpecError(f"Email format must be 'plain' or 'html', not '{email_format}'")
+    
+    attachments = [resolve_path(path, base_dir) for path in email.get('attachments', [])]
+    missing = [path for path in attachments if not os.path.isfile(path)]
+    if missing:
+        raise SpecError(f"Attachment not found: {', '.join(missing)}")
+    
+    return {
+        'subject': subject,
+        'body': body,
+        'format': email_format,
+        'attachments': attachments
+    }
+
+
+def run_campaign(spec: Dict, base_dir: str = '.', config: Optional[Dict] = None,
+                 dry_run: bool = False, stage: str = 'all') -> Dict:
+    """
+    Run a campaign from start to finish without prompts.
+    
+    Args:
+        spec (Dict): Parsed campaign spec
+        base_dir (str): Directory relative paths in the spec are resolved against
+        config (Optional[Dict]): 'smtp' and 'settings' defaults, as from load_config_module()
+        dry_run (bool): Check the spec, recipients and SMTP login without sending
+        stage (str): 'all' renders and sends, 'render' only renders into the
+            outbox spool (settings.outbox_path), 'send' only sends that spool
+    
+    Returns:
+        Dict: Result with 'status' ('sent', 'partial', 'failed', 'rendered',
+            'checked' or 'error'), 'exit_code', the campaign counts and
+            'elapsed_seconds'; unexpected exceptions are reported in 'error'
+            rather than raised
+    """
+    started = time.time()
+    result = {
+        'status': 'error',
+        'exit_code': EXIT_ERROR,
+        'campaign_id': None,
+        'successful': 0,
+        'failed': 0,
+        'skipped': 0,
+        'filtered': 0,
+        'elapsed_seconds': 0.0,
+        'error': None
+    }
+    
+    def finish(**updates) -> Dict:
+        result.update(updates)
+        result['elapsed_seconds'] = round(time.time() - started, 3)
+        return result
+    
+    config = config or {'smtp': {}, 'settings': {}}
+    try:
+        unknown = set(spec) - SPEC_SECTIONS
+        if unknown:
+            raise SpecError(f"Unknown spec sections: {', '.join(sorted(unknown))}")
+        
+        tool = EmailAutomationTool()
+        settings = dict(config['settings'], **spec.get('settings', {}))
+        unknown = set(settings) - set(tool.send_settings)
+        if unknown:
+            raise SpecError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        tool.send_settings.update(settings)
+        smtp = dict(config['smtp'])
+        if spec.get('smtp', {}).get('provider', smtp.get('provider')) != smtp.get('provider'):
+            # Another provider than config.py: use its default server and port
+            smtp.pop('smtp_server', None)
+            smtp.pop('smtp_port', None)
+        smtp.update(spec.get('smtp', {}))
+        tool.email_config = build_email_config(smtp, tool.smtp_config)
+        if stage not in STAGES:
+            raise SpecError(f"Stage must be one of {', '.join(STAGES)}, not '{stage}'")
+        if stage != 'all' and not tool.send_settings['outbox_path']:
+            raise SpecError(f"The {stage} stage needs settings.outbox_path")
+        if stage == 'send':
+            return send_outbox(tool, bool(spec.get('resume', False)), dry_run, finish)
+        email_data = build_email_data(spec.get('email', {}), base_dir)
+        
+        recipients = spec.get('recipients', {})
+        if isinstance(recipients, str):
+            recipients = {'path': recipients}
+        if not recipients.get('path'):
+            raise SpecError("The recipients section needs a path")
+        if not tool.load_recipients(resolve_path(recipients['path'], base_dir),
+                                    stream=recipients.get('stream', True)):
+            raise SpecError(f"Cannot load recipients from {recipients['path']}")
+        
+        campaign_id = spec.get('campaign_id')
+        if campaign_id is None and (tool.send_settings['journal_path'] or tool.send_settings['sent_index_dir']):
+            from send_journal import make_campaign_id
+            campaign_id = make_campaign_id(email_data, tool.recipients_path)
+        
+        if stage == 'render':
+            if dry_run:
+                tool.preview_email(email_data)
+                return finish(status='checked', exit_code=EXIT_OK, campaign_id=campaign_id)
+            rendered = tool.render_outbox(email_data, campaign_id=campaign_id)
+            if rendered is None:
+                return finish(campaign_id=campaign_id, error="Outbox could not be rendered; see the log for details")
+            return finish(status='rendered', exit_code=EXIT_OK, campaign_id=campaign_id, rendered=rendered)
+        
+        if not tool.test_smtp_connection():
+            server = f"{tool.email_config['smtp_server']}:{tool.email_config['smtp_port']}"
+            return finish(error=f"Cannot connect to {server}")
+        
+        if dry_run:
+            tool.preview_email(email_data)
+            return finish(status='checked', exit_code=EXIT_OK, campaign_id=campaign_id)
+        
+        summary = tool.send_bulk_emails(email_data, campaign_id=campaign_id, resume=bool(spec.get('resume', False)))
+        if summary is None:
+            return finish(campaign_id=campaign_id, error="Campaign could not start; see the log for details")
+        
+        return finish(campaign_id=campaign_id, **summary_result(summary))
+    except SpecError as e:
+        return finish(error=str(e))
+    except Exception as e:
+        # Anything unexpected still ends in a JSON result for the caller
+        return finish(error=f"{type(e).__name__}: {str(e)}")
+
+
+def summary_result(summary: Dict[str, int]) -> Dict:
+    """Status, exit code and counts of a campaign summary."""
+    counts = {key: summary[key] for key in ('successful', 'failed', 'skipped', 'filtered')}
+    if not counts['failed']:
+        status, exit_code = 'sent', EXIT_OK
+    elif counts['successful'] or counts['skipped']:
+        status, exit_code = 'partial', EXIT_FAILURES
+    else:
+        status, exit_code = 'failed', EXIT_FAILURES
+    return dict(counts, status=status, exit_code=exit_code)
+
+
+def send_outbox(tool: EmailAutomationTool, resume: bool, dry_run: bool, finish: Callable[..., Dict]) -> Dict:
+    """Send stage: stream the outbox spool rendered earlier to the SMTP server."""
+    from outbox_spool import OutboxSpool
+    
+    path = tool.send_settings['outbox_path']
+    try:
+        with OutboxSpool(path, 'r') as outbox:
+            campaign_id = outbox.manifest.get('campaign_id')
+    except (OSError, ValueError) as e:
+        return finish(error=f"Cannot open outbox {path}: {str(e)}")
+    
+    if not tool.test_smtp_connection():
+        return finish(error=f"Cannot connect to {tool.email_config['smtp_server']}:{tool.email_config['smtp_port']}")
+    if dry_run:
+        return finish(status='checked', exit_code=EXIT_OK, campaign_id=campaign_id)
+    
+    summary = tool.send_outbox(path, resume=resume)
+    if summary is None:
+        return finish(campaign_id=campaign_id, error="Outbox could not be sent; see the log for details")
+    return finish(campaign_id=campaign_id, **summary_result(summary))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run a campaign spec from the command line.
+    
+    The JSON result goes to stdout (or --result); progress goes to stderr.
+    
+    Args:
+        argv (Optional[List[str]]): Arguments (defaults to sys.argv)
+    
+    Returns:
+        int: 0 if every message was sent, 1 if some failed, 2 on a spec,
+            configuration or connection error
+    """
+    parser = argparse.ArgumentParser(description="Run an email campaign from a spec file without prompts.")
+    parser.add_argument('spec', help='campaign spec (.toml, .json or .yaml)')
+    parser.add_argument('--result', help='write the JSON result to this file instead of stdout')
+    parser.add_argument('--config-module', default='config',
+                        help='module holding EMAIL_CONFIG and EMAIL_SETTINGS (default: config)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='check the spec, recipients and SMTP login, and preview the first message')
+    parser.add_argument('--stage', choices=STAGES, default='all',
+                        help='render into the outbox only, send the outbox only, or both (default)')
+    parser.add_argument('--quiet', action='store_true', help='suppress progress output')
+    args = parser.parse_args(argv)
+    
+    progress = open(os.devnull, 'w', encoding='utf-8') if args.quiet else sys.stderr
+    try:
+        with contextlib.redirect_stdout(progress):
+            try:
+                spec = load_spec(args.spec)
+                config = load_config_module(args.config_module)
+                base_dir = os.path.dirname(os.path.abspath(args.spec))
+                result = run_campaign(spec, base_dir, config, dry_run=args.dry_run, stage=args.stage)
+            except SpecError as e:
+                result = {'status': 'error', 'exit_code': EXIT_ERROR, 'error': str(e)}
+            except Exception as e:
+                result = {'status': 'error', 'exit_code': EXIT_ERROR, 'error': f"{type(e).__name__}: {str(e)}"}
+    finally:
+        if args.quiet:
+            progress.close()
+    
+    output = json.dumps(result, indent=2)
+    if args.result:
+        with open(args.result, 'w', encoding='utf-8') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
+    if result['error']:
+        print(f"❌ {result['error']}", file=sys.stderr)
+    return result['exit_code']
+
+
+if __name__ == "__main__":
+    sys.exit(main())
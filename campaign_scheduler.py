@@ -0,0 +1,418 @@
+"""
+Campaign Scheduler
+Persistent job store and min-heap scheduler that runs campaigns at absolute times
+or on cron-like recurring rules.
+"""
+
+import heapq
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+SCHEDULED = 'scheduled'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    next_run REAL,
+    rule TEXT,
+    status TEXT NOT NULL,
+    runs INTEGER NOT NULL DEFAULT 0,
+    last_run REAL,
+    last_result TEXT,
+    email_data TEXT NOT NULL,
+    recipients_path TEXT
+);
+"""
+
+CRON_ALIASES = {
+    '@hourly': '0 * * * *',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@weekly': '0 0 * * 0',
+    '@monthly': '0 0 1 * *'
+}
+
+# (name, lowest value, highest value) of the five cron fields
+CRON_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+
+class JobDeferred(Exception):
+    """Raised by a runner when a job cannot run yet; it is tried again later instead of failing."""
+
+
+class CronRule:
+    """Five-field cron expression (minute hour day month weekday) evaluated in local time."""
+    
+    def __init__(self, expression: str):
+        """
+        Parse an expression.
+        
+        Fields accept '*', numbers, ranges ('1-5'), lists ('1,15') and steps
+        ('*/15', '9-17/2'). Weekday 0 and 7 are Sunday. The aliases @hourly,
+        @daily, @weekly and @monthly are understood.
+        
+        Args:
+            expression (str): Cron expression
+        
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression}")
+        
+        parsed = [self._parse_field(text, low, high, name) for text, (name, low, high) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # Python weekdays run Monday=0..Sunday=6; cron runs Sunday=0..Saturday=6 (7 is Sunday too)
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        # As in cron, a restricted day and weekday match when either one does
+        self.days_restricted = fields[2] != '*'
+        self.weekdays_restricted = fields[4] != '*'
+    
+    @staticmethod
+    def _parse_field(text: str, low: int, high: int, name: str) -> Set[int]:
+        """Expand one field into the set of values it allows."""
+        values = set()
+        for part in text.split(','):
+            span, _, step_text = part.partition('/')
+            try:
+                step = int(step_text) if step_text else 1
+                if span == '*':
+                    start, end = low, high
+                elif '-' in span:
+                    start, end = (int(value) for value in span.split('-', 1))
+                else:
+                    start = int(span)
+                    end = high if step_text else start
+            except ValueError:
+                raise ValueError(f"Invalid cron {name} field: {text}") from None
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Invalid cron {name} field: {text}")
+            values.update(range(start, end + 1, step))
+        return values
+    
+    def _day_matches(self, moment: datetime) -> bool:
+        """Check the day-of-month and weekday fields."""
+        day_ok = moment.day in self.days
+        weekday_ok = moment.weekday() in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+    
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        Find the first matching minute after a moment.
+        
+        Args:
+            moment (datetime): Naive local time
+        
+        Returns:
+            datetime: Next matching time
+        
+        Raises:
+            ValueError: If nothing matches within five years (e.g. 31 February)
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=5 * 366)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+
+class CampaignScheduler:
+    """Runs stored campaign jobs when they are due, several at a time, in background threads."""
+    
+    def __init__(self, path: str, runner: Callable[[Dict], Dict], max_concurrent: int = 2,
+                 clock: Callable[[], float] = time.time, defer_delay: float = 60.0):
+        """
+        Open (or create) the job store. Call start() to begin running jobs.
+        
+        Args:
+            path (str): SQLite database file holding the jobs
+            runner (Callable[[Dict], Dict]): Runs one job and returns its result;
+                the job has an 'interrupted' flag when it was cut off by a restart
+            max_concurrent (int): Campaigns run at the same time
+            clock (Callable[[], float]): Wall-clock time source (epoch seconds)
+            defer_delay (float): Seconds until a job whose runner raised
+                JobDeferred is tried again
+        """
+        self.path = path
+        self.runner = runner
+        self.max_concurrent = max_concurrent
+        self.clock = clock
+        self.defer_delay = defer_delay
+        
+        self._condition = threading.Condition()
+        self._heap: List[Tuple[float, str]] = []
+        self._jobs: Dict[str, Dict] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopping = False
+        
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._load()
+    
+    def _load(self) -> None:
+        """Read unfinished jobs from the store into the heap."""
+        rows = self._connection.execute(
+            "SELECT job_id, created_at, next_run, rule, status, runs, last_run, last_result, "
+            "email_data, recipients_path FROM jobs WHERE status IN (?, ?)",
+            (SCHEDULED, RUNNING)
+        ).fetchall()
+        for row in rows:
+            job = self._row_to_job(row)
+            if job['status'] == RUNNING:
+                # Cut off by a restart: run again right away, resuming the campaign
+                job['status'] = SCHEDULED
+                job['next_run'] = self.clock()
+                job['interrupted'] = True
+                self._save(job)
+            self._jobs[job['job_id']] = job
+            heapq.heappush(self._heap, (job['next_run'], job['job_id']))
+    
+    @staticmethod
+    def _row_to_job(row: Tuple) -> Dict:
+        """Convert a database row to a job dictionary."""
+        job_id, created_at, next_run, rule, status, runs, last_run, last_result, email_data, recipients_path = row
+        last_result = json.loads(last_result) if last_result else None
+        return {
+            'job_id': job_id,
+            'created_at': created_at,
+            'next_run': next_run,
+            'rule': rule,
+            'status': status,
+            'runs': runs,
+            'last_run': last_run,
+            'last_result': last_result,
+            'email_data': json.loads(email_data),
+            'recipients_path': recipients_path,
+            # A deferred run of an interrupted campaign still has to resume it
+            'interrupted': bool(last_result and last_result.get('interrupted'))
+        }
+    
+    def _save(self, job: Dict) -> None:
+        """Write a job to the store. The caller holds the condition lock."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO jobs (job_id, created_at, next_run, rule, status, runs, last_run, "
+            "last_result, email_data, recipients_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job['job_id'], job['created_at'], job['next_run'], job['rule'], job['status'], job['runs'],
+             job['last_run'], json.dumps(job['last_result']) if job['last_result'] is not None else None,
+             json.dumps(job['email_data']), job['recipients_path'])
+        )
+    
+    def add_job(self, email_data: Dict, recipients_path: Optional[str], run_at: Optional[float] = None,
+                rule: Optional[str] = None) -> str:
+        """
+        Store a new job.
+        
+        Args:
+            email_data (Dict): Email composition data
+            recipients_path (Optional[str]): Recipients file, read when the job runs
+            run_at (Optional[float]): Epoch time of the first run; the next match
+                of the rule (or now, without a rule) when omitted
+            rule (Optional[str]): Cron expression for recurring jobs
+        
+        Returns:
+            str: Job id
+        
+        Raises:
+            ValueError: If the rule is malformed
+        """
+        if rule is not None:
+            cron = CronRule(rule)
+            if run_at is None:
+                run_at = cron.next_after(datetime.fromtimestamp(self.clock())).timestamp()
+        if run_at is None:
+            run_at = self.clock()
+        
+        job = {
+            'job_id': uuid.uuid4().hex[:12],
+            'created_at': self.clock(),
+            'next_run': run_at,
+            'rule': rule,
+            'status': SCHEDULED,
+            'runs': 0,
+            'last_run': None,
+            'last_result': None,
+            'email_data': email_data,
+            'recipients_path': recipients_path,
+            'interrupted': False
+        }
+        with self._condition:
+            self._save(job)
+            self._jobs[job['job_id']] = job
+            heapq.heappush(self._heap, (run_at, job['job_id']))
+            self._condition.notify()
+        return job['job_id']
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job. A run already in progress finishes, but is not repeated.
+        
+        Args:
+            job_id (str): Job id
+        
+        Returns:
+            bool: True if the job was waiting or running
+        """
+        with self._condition:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            job['status'] = CANCELLED
+            self._save(job)
+            self._condition.notify()
+        return True
+    
+    def list_jobs(self, include_finished: bool = False) -> List[Dict]:
+        """
+        List jobs by their next run time.
+        
+        Args:
+            include_finished (bool): Also list done, failed and cancelled jobs
+        
+        Returns:
+            List[Dict]: Job dictionaries
+        """
+        query = ("SELECT job_id, created_at, next_run, rule, status, runs, last_run, last_result, "
+                 "email_data, recipients_path FROM jobs")
+        if not include_finished:
+            query += f" WHERE status IN ('{SCHEDULED}', '{RUNNING}')"
+        with self._condition:
+            rows = self._connection.execute(query + " ORDER BY next_run").fetchall()
+        return [self._row_to_job(row) for row in rows]
+    
+    def start(self) -> None:
+        """Start the scheduler thread and the campaign workers."""
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='campaign')
+        self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+        self._thread.start()
+    
+    def stop(self, wait: bool = True) -> None:
+        """
+        Stop scheduling new runs.
+        
+        Args:
+            wait (bool): Wait for running campaigns to finish; campaigns cut off
+                are resumed on the next start
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+    
+    def close(self) -> None:
+        """Stop the scheduler and close the job store."""
+        self.stop()
+        self._connection.close()
+    
+    @property
+    def running(self) -> int:
+        """Number of jobs currently running."""
+        with self._condition:
+            return sum(1 for job in self._jobs.values() if job['status'] == RUNNING)
+    
+    def _loop(self) -> None:
+        """Sleep until the earliest job is due, then hand it to a worker."""
+        with self._condition:
+            while not self._stopping:
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                run_at, job_id = self._heap[0]
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != SCHEDULED or job['next_run'] != run_at:
+                    # Cancelled or rescheduled since it was pushed
+                    heapq.heappop(self._heap)
+                    continue
+                wait = run_at - self.clock()
+                if wait > 0:
+                    self._condition.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                job['status'] = RUNNING
+                self._save(job)
+                self._executor.submit(self._run, job_id, dict(job))
+    
+    def _run(self, job_id: str, job: Dict) -> None:
+        """Run one job in a worker thread and schedule its next run."""
+        started = self.clock()
+        try:
+            result = self.runner(job)
+            status = DONE
+        except JobDeferred as e:
+            self._defer(job_id, str(e))
+            return
+        except Exception as e:
+            result = {'error': str(e)}
+            status = FAILED
+        
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                # Cancelled while running; the store already says so
+                return
+            job['runs'] += 1
+            job['last_run'] = started
+            job['last_result'] = result
+            job['interrupted'] = False
+            next_run = None
+            if job['rule']:
+                try:
+                    next_run = CronRule(job['rule']).next_after(datetime.fromtimestamp(self.clock())).timestamp()
+                except ValueError:
+                    next_run = None
+            if next_run is not None:
+                job['status'] = SCHEDULED
+                job['next_run'] = next_run
+                heapq.heappush(self._heap, (next_run, job_id))
+            else:
+                job['status'] = status
+                del self._jobs[job_id]
+            self._save(job)
+            self._condition.notify()
+    
+    def _defer(self, job_id: str, reason: str) -> None:
+        """Put a job whose runner could not start it back in the queue, defer_delay seconds out."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job['status'] = SCHEDULED
+            job['next_run'] = self.clock() + self.defer_delay
+            job['last_result'] = {'deferred': reason, 'interrupted': job['interrupted']}
+            heapq.heappush(self._heap, (job['next_run'], job_id))
+            self._save(job)
+            self._condition.notify()
@@ -27,14 +27,141 @@ DEFAULT_RECIPIENTS_JSON = 'sample_recipients.json'
 
 # Email sending settings
 EMAIL_SETTINGS = {
-    # Delay between emails (in seconds) to avoid rate limiting
-    'delay_between_emails': 1,
+    # Minimum delay between emails (in seconds); 0 uses the provider's rate profile
+    'delay_between_emails': 0,
     
-    # Maximum retry attempts for failed emails
+    # Override the provider's rate profile, e.g. {'messages_per_second': 5, 'burst': 20}
+    'rate_limit': {},
+    
+    # More accounts or relays to spread bulk sends over, each with its own quota and weight, e.g.
+    # [{'email': 'second@gmail.com', 'password': 'app_password', 'weight': 2},
+    #  {'name': 'relay', 'smtp_server': 'smtp.relay.example', 'smtp_port': 587, 'messages_per_day': 0}]
+    # Missing keys come from EMAIL_CONFIG; an empty list sends from EMAIL_CONFIG only
+    'senders': [],
+    
+    # 'weighted' round-robin by weight, or 'least_loaded'; failing senders rest for sender_cooldown seconds
+    'sender_selection': 'weighted',
+    'sender_cooldown': 60,
+    
+    # Maximum retry attempts for failed emails (only transient 4xx/connection failures are retried)
     'max_retries': 3,
     
+    # Backoff before the first retry, doubling up to the maximum (in seconds)
+    'retry_base_delay': 5,
+    'retry_max_delay': 300,
+    
+    # Worker threads sending in parallel (1 sends sequentially)
+    'workers': 1,
+    
+    # Recipients queued for workers at once (0 = four per worker)
+    'max_in_flight': 0,
+    
+    # SMTP sessions kept open and reused during bulk sends (at least one per worker)
+    'pool_size': 1,
+    
+    # Recycle a session after this many messages or seconds
+    'max_messages_per_connection': 100,
+    'max_connection_age': 300,
+    
+    # Probe idle sessions with NOOP after this many seconds
+    'noop_interval': 30,
+    
+    # Pipeline commands and send bodies with BDAT when the server advertises PIPELINING/CHUNKING
+    'smtp_pipelining': True,
+    'smtp_chunking': True,
+    'bdat_chunk_size': 1024 * 1024,
+    
+    # 'splice' builds shared MIME parts once per campaign, 'mime' builds each message fully
+    'message_assembly': 'splice',
+    
+    # 'auto' picks 7bit, quoted-printable or base64 per part by size; 'base64' as before
+    'transfer_encoding': 'auto',
+    # Unencoded 8bit bodies: 'auto' when the server advertises 8BITMIME, True or False
+    'mime_8bit': 'auto',
+    # HTML bodies as multipart/alternative with a generated text part and minified HTML
+    'html_alternative': False,
+    
+    # Rendered subjects and bodies reused by recipients with the same field values
+    # (0 entries disables the cache)
+    'render_cache_entries': 1024,
+    'render_cache_bytes': 32 * 1024 * 1024,
+    
+    # Render messages into this spool directory on a background thread while the
+    # sessions send them (None renders each message as it is sent)
+    'outbox_path': None,
+    'outbox_queue_size': 256,
+    
+    # Loaded recipients are kept in 'compact' columnar arrays, an 'mmap' temporary
+    # file for lists larger than memory, or a plain 'list' of dicts
+    'recipient_store': 'compact',
+    'recipient_store_dir': None,
+    
+    # Normalize, deduplicate and syntax-check addresses before sending
+    'validate_recipients': True,
+    
+    # Look up recipient domains before sending (MX with dnspython installed, otherwise DNS)
+    'check_domains': False,
+    
+    # Addresses never to send to: one per line, or a CSV with an Email column
+    'suppression_list': None,
+    
+    # Recipients of one domain addressed in a single transaction when the subject and
+    # body have no placeholders (1 = one message per recipient)
+    'recipients_per_transaction': 1,
+    
+    # Concurrent transactions per recipient domain (0 = unlimited)
+    'domain_concurrency': 0,
+    
+    # Worker processes, each sending one shard of the recipients (1 = single process)
+    'processes': 1,
+    
+    # Prometheus text file with per-phase timings and counters, rewritten during a campaign
+    'metrics_path': None,
+    'metrics_interval': 10,
+    
+    # JSON summary of the phase timings written when a campaign ends
+    'metrics_summary_path': None,
+    
+    # Serve live metrics at http://127.0.0.1:<port>/metrics (0 = off)
+    'metrics_port': 0,
+    
+    # Write cProfile stats for each campaign to this file
+    'profile_path': None,
+    
+    # Journal of each recipient's delivery state, used to resume campaigns (None disables it)
+    'journal_path': 'send_journal.db',
+    
+    # Journal writes are batched; at most this many records or seconds are buffered
+    'journal_batch_size': 200,
+    'journal_flush_interval': 1.0,
+    
+    # Per-campaign index of the addresses already sent to; re-runs skip them (None disables it)
+    'sent_index_dir': None,
+    
     # Log file path
-    'log_file': 'email_logs.log'
+    'log_file': 'email_logs.log',
+    
+    # Rotate the log at this size, keeping this many old files
+    'log_max_bytes': 10 * 1024 * 1024,
+    'log_backup_count': 5,
+    
+    # Rotate by time instead of size, e.g. 'midnight'
+    'log_rotate_when': None,
+    
+    # 'text' or 'json' (one JSON object per line)
+    'log_format': 'text',
+    
+    # Lowest level echoed to the console ('OFF' silences it)
+    'log_console_level': 'WARNING',
+    
+    # Print every Nth successful delivery; failures are always printed
+    'progress_every': 1,
+    
+    # Job store for scheduled campaigns, kept across restarts
+    'scheduler_path': 'scheduled_jobs.db',
+    
+    # Scheduled campaigns allowed to run at the same time
+    'max_concurrent_campaigns': 2
 }
 
 # Personalization placeholders
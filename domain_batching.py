@@ -0,0 +1,124 @@
+"""
+Domain Batching
+Groups recipients by domain so identical messages can be sent to many
+recipients in one SMTP transaction, and limits concurrency per domain.
+"""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List
+
+from template_engine import compile_template
+
+
+def recipient_domain(recipient: Dict[str, str]) -> str:
+    """
+    Get the lower-cased domain of a recipient's address.
+    
+    Args:
+        recipient (Dict[str, str]): Recipient data
+    
+    Returns:
+        str: Domain part of the address
+    """
+    return recipient['email'].rpartition('@')[2].lower()
+
+
+def is_personalized(email_data: Dict) -> bool:
+    """
+    Check whether the subject or body contains any placeholder.
+    
+    Args:
+        email_data (Dict): Email composition data
+    
+    Returns:
+        bool: True if messages may differ between recipients
+    """
+    return bool(compile_template(email_data['subject']).fields or compile_template(email_data['body']).fields)
+
+
+class DomainBatcher:
+    """Splits a recipient stream into per-domain batches."""
+    
+    def __init__(self, batch_size: int = 50, max_buffered: int = 10000):
+        """
+        Initialize the batcher.
+        
+        Args:
+            batch_size (int): Recipients per transaction (RCPT TO commands)
+            max_buffered (int): Recipients held across all domain queues before the
+                fullest queue is sent early, which bounds memory on huge lists
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.batch_size = batch_size
+        self.max_buffered = max(max_buffered, batch_size)
+    
+    def batches(self, recipients: Iterable[Dict[str, str]]) -> Iterator[List[Dict[str, str]]]:
+        """
+        Yield batches of recipients that share a domain.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to group
+        
+        Yields:
+            List[Dict[str, str]]: Up to batch_size recipients of one domain
+        """
+        queues: 'OrderedDict[str, List[Dict[str, str]]]' = OrderedDict()
+        buffered = 0
+        for recipient in recipients:
+            domain = recipient_domain(recipient)
+            if not recipient['email'].isascii():
+                # Kept apart so a server without SMTPUTF8 refuses only these recipients
+                domain += ' (SMTPUTF8)'
+            queue = queues.setdefault(domain, [])
+            queue.append(recipient)
+            buffered += 1
+            
+            if len(queue) >= self.batch_size:
+                del queues[domain]
+                buffered -= len(queue)
+                yield queue
+            elif buffered >= self.max_buffered:
+                fullest = max(queues, key=lambda name: len(queues[name]))
+                queue = queues.pop(fullest)
+                buffered -= len(queue)
+                yield queue
+        
+        for queue in queues.values():
+            yield queue
+
+
+class DomainLimiter:
+    """Caps the number of concurrent transactions per recipient domain."""
+    
+    def __init__(self, limit: int):
+        """
+        Initialize the limiter.
+        
+        Args:
+            limit (int): Concurrent transactions allowed per domain (0 = unlimited)
+        """
+        self.limit = limit
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def slot(self, domain: str):
+        """
+        Hold one of the domain's transaction slots for the duration of the block.
+        
+        Args:
+            domain (str): Recipient domain
+        """
+        if not self.limit:
+            yield
+            return
+        
+        with self._lock:
+            semaphore = self._semaphores.get(domain)
+            if semaphore is None:
+                semaphore = self._semaphores[domain] = threading.Semaphore(self.limit)
+        with semaphore:
+            yield
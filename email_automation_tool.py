@@ -4,21 +4,34 @@ Email Automation Tool
 A comprehensive tool for sending bulk emails with personalization, attachments, and scheduling.
 """
 
-import smtplib
 import json
-import csv
 import os
-import sys
 import time
 import logging
 from datetime import datetime, timedelta
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-from typing import List, Dict, Optional, Tuple
-import threading
-import schedule
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Dict, Optional, Tuple, Union
+from recipient_source import RecipientSource
+from recipient_store import MappedRecipientStore, create_recipient_store
+from template_engine import RenderCache, compile_template
+from attachment_cache import AttachmentCache
+from mime_encoding import EncodingPolicy, html_to_text, mime_text_part, minify_html
+from metrics import CampaignMetrics, RENDER, MESSAGE, SENDMAIL
+
+# The SMTP, MIME, journal, scheduler and multi-process subsystems are imported
+# where they are first used, so the module loads quickly for scripts and for
+# commands that never send
+if TYPE_CHECKING:
+    from email.mime.multipart import MIMEMultipart
+    from smtp_pool import SMTPConnectionPool
+    from sender_pool import SenderPool
+    from rate_limiter import TokenBucketRateLimiter
+    from retry_queue import RetryQueue
+    from send_journal import SendJournal
+    from sent_index import SentIndex
+    from metrics import MetricsServer
+    from campaign_scheduler import CampaignScheduler
+    from outbox_spool import OutboxSpool
+    from recipient_validation import RecipientValidator
 
 
 class EmailAutomationTool:
@@ -36,82 +49,233 @@ class EmailAutomationTool:
                 'smtp_port': 587
             }
         }
+        self.send_settings = {
+            # Worker threads delivering in parallel, and the cap on recipients in flight
+            'workers': 1,
+            'max_in_flight': 0,
+            # Minimum seconds between messages (0 = use the provider's rate profile)
+            'delay_between_emails': 0,
+            # Overrides for the provider's messages_per_second, messages_per_day and burst
+            'rate_limit': {},
+            # Number of SMTP sessions kept open during bulk sends (at least one per worker)
+            'pool_size': 1,
+            # Recycle a session after this many messages or seconds
+            'max_messages_per_connection': 100,
+            'max_connection_age': 300,
+            # Probe idle sessions with NOOP after this many seconds
+            'noop_interval': 30,
+            # Accounts and relays a bulk send is spread over, each a dict like email_config
+            # plus optional name, weight, messages_per_second, messages_per_day and burst;
+            # missing keys come from email_config (empty = send from email_config only)
+            'senders': [],
+            # 'weighted' round-robin in proportion to the weights, or 'least_loaded'
+            'sender_selection': 'weighted',
+            # Seconds a sender that failed is passed over before it is tried again
+            'sender_cooldown': 60,
+            # Use ESMTP PIPELINING (one round trip for the envelope) and CHUNKING (BDAT
+            # bodies in bdat_chunk_size pieces) when the server advertises them
+            'smtp_pipelining': True,
+            'smtp_chunking': True,
+            'bdat_chunk_size': 1024 * 1024,
+            # 'splice' builds the constant MIME parts once per campaign; 'mime' builds
+            # a full MIMEMultipart tree for every message
+            'message_assembly': 'splice',
+            # 'auto' sends each part in its smallest valid transfer encoding (7bit, 8bit,
+            # quoted-printable or base64); 'base64' encodes all non-ASCII text and every
+            # attachment as base64, as the email package does
+            'transfer_encoding': 'auto',
+            # 8bit bodies: 'auto' uses them when every server of the campaign advertises
+            # 8BITMIME, True always, False never
+            'mime_8bit': 'auto',
+            # Send HTML bodies as multipart/alternative with a text version generated
+            # from the HTML, and the HTML minified
+            'html_alternative': False,
+            # Rendered subjects and bodies kept for reuse by recipients with the same
+            # values for the fields the template references (0 disables the cache)
+            'render_cache_entries': 1024,
+            'render_cache_bytes': 32 * 1024 * 1024,
+            # Spool directory messages are rendered into on a background thread while
+            # the sessions send them (None renders each message as it is sent); at most
+            # outbox_queue_size rendered messages wait for a session
+            'outbox_path': None,
+            'outbox_queue_size': 256,
+            # Loaded recipients are kept in 'compact' columnar arrays, an 'mmap' temporary
+            # file for lists larger than memory, or a plain 'list' of dicts
+            'recipient_store': 'compact',
+            'recipient_store_dir': None,
+            # SQLite journal recording each recipient's delivery state (None disables it)
+            'journal_path': 'send_journal.db',
+            # Journal writes are batched; at most this many records or seconds are buffered
+            'journal_batch_size': 200,
+            'journal_flush_interval': 1.0,
+            # Directory of per-campaign indexes of the addresses already sent to; recipients
+            # found there are skipped, so a re-run only sends to new addresses (None disables it)
+            'sent_index_dir': None,
+            # Transient failures (4xx, dropped connections) are retried with jittered
+            # exponential backoff; permanent failures (5xx) are not
+            'max_retries': 3,
+            'retry_base_delay': 5,
+            'retry_max_delay': 300,
+            # Normalize, deduplicate and syntax-check addresses before sending
+            'validate_recipients': True,
+            # Look up recipient domains (MX with dnspython installed, otherwise DNS)
+            'check_domains': False,
+            # File of addresses never to send to (one per line, or CSV with an Email column)
+            'suppression_list': None,
+            # Recipients of one domain addressed in a single transaction (RCPT TO per
+            # message) when the subject and body have no placeholders; 1 disables batching
+            'recipients_per_transaction': 1,
+            # Concurrent transactions allowed per recipient domain (0 = unlimited)
+            'domain_concurrency': 0,
+            # Worker processes, each sending one shard of the recipients with its own
+            # sessions and share of the rate limit (1 = send from this process)
+            'processes': 1,
+            # Prometheus text file with phase timing histograms and counters, rewritten
+            # every metrics_interval seconds during a campaign (None disables it)
+            'metrics_path': None,
+            'metrics_interval': 10,
+            # JSON summary of the phase timings written when a campaign ends
+            'metrics_summary_path': None,
+            # Serve the metrics at http://127.0.0.1:<port>/metrics during a campaign (0 disables it)
+            'metrics_port': 0,
+            # Profile each campaign with cProfile and write the stats here (None disables it)
+            'profile_path': None,
+            # Log file, rotated at log_max_bytes (or by time with log_rotate_when, e.g.
+            # 'midnight'), keeping log_backup_count old files
+            'log_file': 'email_logs.log',
+            'log_max_bytes': 10 * 1024 * 1024,
+            'log_backup_count': 5,
+            'log_rotate_when': None,
+            # 'text' or 'json' (one compact JSON object per line)
+            'log_format': 'text',
+            # Lowest log level echoed to the console; results are printed anyway ('OFF' silences it)
+            'log_console_level': 'WARNING',
+            # Print every Nth successful delivery; failures and retries are always printed
+            'progress_every': 1,
+            # Job store for scheduled campaigns, kept across restarts
+            'scheduler_path': 'scheduled_jobs.db',
+            # Scheduled campaigns allowed to run at the same time
+            'max_concurrent_campaigns': 2
+        }
         self.recipients = []
+        self.recipients_path = None
         self.email_config = {}
-        self.setup_logging()
-    
-    def setup_logging(self):
-        """Setup logging configuration."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('email_logs.log'),
-                logging.StreamHandler()
-            ]
+        # Logging is set up on first use of self.logger
+        self._logger: Optional[logging.Logger] = None
+        self.attachment_cache = AttachmentCache(logging.getLogger(__name__))
+        self.render_cache = self.create_render_cache()
+        self._message_builder = None
+        # Whether the campaign's servers advertise 8BITMIME, checked when a bulk send starts
+        self._server_8bitmime = False
+        self.metrics = CampaignMetrics()
+        # Object with start() and stop() wrapped around each campaign, e.g. a profiler;
+        # profile_path installs a cProfile hook
+        self.profiler_hook = None
+        self.scheduler = None
+        # Shard this tool sends when it runs in a worker of a multi-process campaign
+        self.shard: Optional[int] = None
+    
+    def setup_logging(self, force: bool = False):
+        """
+        Setup logging configuration.
+        
+        Records are queued and written by a background thread to a rotating log
+        file, so logging does not block sending.
+        
+        Args:
+            force (bool): Replace an existing configuration, e.g. after changing
+                the log settings
+        """
+        from log_pipeline import setup_log_pipeline
+        
+        setup_log_pipeline(
+            log_file=self.send_settings['log_file'],
+            max_bytes=self.send_settings['log_max_bytes'],
+            backup_count=self.send_settings['log_backup_count'],
+            rotate_when=self.send_settings['log_rotate_when'],
+            log_format=self.send_settings['log_format'],
+            console_level=self.send_settings['log_console_level'],
+            force=force
         )
-        self.logger = logging.getLogger(__name__)
+        self._logger = logging.getLogger(__name__)
     
-    def load_recipients(self, file_path: str) -> bool:
+    @property
+    def logger(self) -> logging.Logger:
+        """Logger of the tool, setting up logging on first use."""
+        if self._logger is None:
+            self.setup_logging()
+        return self._logger
+    
+    def load_recipients(self, file_path: str, stream: bool = False) -> bool:
         """
-        Load recipients from CSV or JSON file.
+        Load recipients from CSV, JSON or JSON Lines file.
         
         Args:
             file_path (str): Path to the recipients file
+            stream (bool): Keep a lazy recipient source instead of reading every row
+                into memory; rows are then validated as they are sent
             
         Returns:
             bool: True if successful, False otherwise
         """
         try:
-            if not os.path.exists(file_path):
-                print(f"❌ File not found: {file_path}")
-                return False
+            source = RecipientSource(file_path)
+            self.recipients_path = os.path.abspath(file_path)
             
-            self.recipients = []
-            
-            if file_path.endswith('.csv'):
-                with open(file_path, 'r', newline='', encoding='utf-8') as file:
-                    reader = csv.DictReader(file)
-                    for row in reader:
-                        if 'Name' in row and 'Email' in row:
-                            self.recipients.append({
-                                'name': row['Name'].strip(),
-                                'email': row['Email'].strip()
-                            })
-                        else:
-                            print("❌ CSV file must contain 'Name' and 'Email' columns")
-                            return False
-            
-            elif file_path.endswith('.json'):
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    if isinstance(data, list):
-                        for recipient in data:
-                            if 'name' in recipient and 'email' in recipient:
-                                self.recipients.append({
-                                    'name': recipient['name'].strip(),
-                                    'email': recipient['email'].strip()
-                                })
-                            else:
-                                print("❌ JSON file must contain 'name' and 'email' fields")
-                                return False
-                    else:
-                        print("❌ JSON file must contain a list of recipients")
-                        return False
+            if stream:
+                self.release_recipients()
+                self.recipients = source
+                print(f"✅ Streaming recipients from {file_path}")
+                self.logger.info(f"Streaming recipients from {file_path}")
+                return True
             
-            else:
-                print("❌ Unsupported file format. Please use CSV or JSON files.")
-                return False
+            recipients = create_recipient_store(self.send_settings['recipient_store'], source,
+                                                self.send_settings['recipient_store_dir'])
+            # The previous list stays in place if the new one cannot be loaded
+            self.release_recipients()
+            self.recipients = recipients
+            self.report_invalid_recipients(source)
             
             print(f"✅ Successfully loaded {len(self.recipients)} recipients")
             self.logger.info(f"Loaded {len(self.recipients)} recipients from {file_path}")
             return True
             
+        except FileNotFoundError:
+            print(f"❌ File not found: {file_path}")
+            return False
+        except ValueError as e:
+            print(f"❌ {str(e)}")
+            self.logger.error(f"Error loading recipients: {str(e)}")
+            return False
         except Exception as e:
             print(f"❌ Error loading recipients: {str(e)}")
             self.logger.error(f"Error loading recipients: {str(e)}")
             return False
     
+    def release_recipients(self) -> None:
+        """Drop the loaded recipients, deleting the temporary files of an mmap store."""
+        if isinstance(self.recipients, MappedRecipientStore):
+            self.recipients.close()
+        self.recipients = []
+    
+    def report_invalid_recipients(self, source: RecipientSource, limit: int = 10) -> None:
+        """
+        Print and log the rows a recipient source rejected.
+        
+        Args:
+            source (RecipientSource): Source that has been iterated
+            limit (int): Maximum number of rows to list
+        """
+        if not source.invalid_rows:
+            return
+        
+        print(f"⚠️ Skipped {source.invalid_rows} invalid rows in {source.file_path}")
+        for line_number, reason in source.errors[:limit]:
+            print(f"   Line {line_number}: {reason}")
+        if source.invalid_rows > limit:
+            print(f"   ... and {source.invalid_rows - limit} more")
+        self.logger.warning(f"Skipped {source.invalid_rows} invalid rows in {source.file_path}")
+    
     def configure_email(self) -> bool:
         """
         Configure email settings for SMTP.
@@ -170,11 +334,13 @@ class EmailAutomationTool:
         Returns:
             bool: True if connection successful, False otherwise
         """
+        from smtp_pool import PooledSMTPSession
+        
         try:
-            server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
-            server.starttls()
-            server.login(self.email_config['email'], self.email_config['password'])
-            server.quit()
+            session = PooledSMTPSession(self.email_config)
+            session.connect()
+            self.logger.info(f"SMTP server extensions: {', '.join(session.extensions) or 'none'}")
+            session.close()
             return True
         except Exception as e:
             self.logger.error(f"SMTP connection test failed: {str(e)}")
@@ -211,7 +377,7 @@ class EmailAutomationTool:
                 print("❌ Invalid choice. Please enter 1 or 2.")
         
         print(f"\nEnter email body ({email_format} format):")
-        print("Use {Name} for personalization (e.g., Hello {Name}!)")
+        print("Use {Name}, {Email} or any recipient column for personalization (e.g., Hello {FirstName|there}!)")
         print("Press Ctrl+Z (Windows) or Ctrl+D (Mac/Linux) when finished:")
         
         body_lines = []
@@ -250,22 +416,26 @@ class EmailAutomationTool:
             'attachments': attachments
         }
     
-    def personalize_message(self, message: str, recipient: Dict[str, str]) -> str:
+    def personalize_message(self, message: str, recipient: Dict[str, str], escape_html: bool = False) -> str:
         """
         Personalize message with recipient data.
         
+        Any recipient column can be used as a placeholder ({Name}, {Email},
+        {Company}, ...), with an optional default for missing values, e.g.
+        {FirstName|there}. Templates are compiled once, and the output is
+        cached per combination of the values the template references.
+        
         Args:
             message (str): Original message
             recipient (Dict[str, str]): Recipient data
+            escape_html (bool): HTML-escape substituted values
             
         Returns:
             str: Personalized message
         """
-        personalized = message.replace('{Name}', recipient['name'])
-        personalized = personalized.replace('{Email}', recipient['email'])
-        return personalized
+        return self.render_cache.get(compile_template(message, escape_html), recipient)
     
-    def create_email_message(self, recipient: Dict[str, str], email_data: Dict[str, str]) -> MIMEMultipart:
+    def create_email_message(self, recipient: Dict[str, str], email_data: Dict[str, str]) -> 'MIMEMultipart':
         """
         Create email message with personalization and attachments.
         
@@ -276,113 +446,1090 @@ class EmailAutomationTool:
         Returns:
             MIMEMultipart: Email message object
         """
-        msg = MIMEMultipart()
-        msg['From'] = self.email_config['email']
-        msg['To'] = recipient['email']
-        msg['Subject'] = email_data['subject']
+        from email.mime.multipart import MIMEMultipart
+        from message_builder import RawHeaderValue, address_value
         
-        # Personalize body
-        personalized_body = self.personalize_message(email_data['body'], recipient)
+        msg = MIMEMultipart()
+        # Addresses must not become encoded-words, which the default header encoding would make them
+        msg['From'] = RawHeaderValue(address_value(self.email_config['email']))
+        msg['To'] = RawHeaderValue(address_value(recipient['email']))
+        msg['Subject'] = self.personalize_message(email_data['subject'], recipient)
         
-        # Add body
-        if email_data['format'] == 'html':
-            msg.attach(MIMEText(personalized_body, 'html'))
+        # Personalize body; recipients with the same field values share one part
+        policy = self.encoding_policy()
+        subtype = 'html' if email_data['format'] == 'html' else 'plain'
+        kind = f"mime/{subtype}/{'/'.join(map(str, policy))}"
+        if subtype == 'html' and policy.html_alternative:
+            body_template = compile_template(minify_html(email_data['body']), escape_html=True)
+            text_template = compile_template(html_to_text(email_data['body']))
+            
+            def alternative(body: str) -> MIMEMultipart:
+                part = MIMEMultipart('alternative')
+                part.attach(mime_text_part(text_template.render(recipient), 'plain', policy))
+                part.attach(mime_text_part(body, 'html', policy))
+                return part
+            msg.attach(self.render_cache.get(body_template, recipient, kind, alternative))
         else:
-            msg.attach(MIMEText(personalized_body, 'plain'))
+            body_template = compile_template(email_data['body'], escape_html=subtype == 'html')
+            msg.attach(self.render_cache.get(body_template, recipient, kind,
+                                             lambda body: mime_text_part(body, subtype, policy)))
         
-        # Add attachments
+        # Add attachments, encoded once and shared by every message
         for attachment_path in email_data['attachments']:
             try:
-                with open(attachment_path, 'rb') as attachment:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(attachment.read())
-                    encoders.encode_base64(part)
-                    part.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename= {os.path.basename(attachment_path)}'
-                    )
-                    msg.attach(part)
+                msg.attach(self.attachment_cache.get_part(attachment_path, policy.transfer_encoding))
             except Exception as e:
                 self.logger.error(f"Failed to attach {attachment_path}: {str(e)}")
         
         return msg
     
-    def send_email(self, recipient: Dict[str, str], email_data: Dict[str, str]) -> Tuple[bool, str]:
+    def serialize_message(self, recipient: Dict[str, str], email_data: Dict[str, str],
+                          to_header: Optional[str] = None) -> Union[str, bytes]:
+        """
+        Produce the wire form of the message for one recipient.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient data
+            email_data (Dict[str, str]): Email composition data
+            to_header (Optional[str]): To header value; the recipient's address when omitted
+            
+        Returns:
+            Union[str, bytes]: Serialized message ready for sendmail
+        """
+        if self.send_settings['message_assembly'] != 'splice':
+            msg = self.create_email_message(recipient, email_data)
+            if to_header:
+                from message_builder import RawHeaderValue, address_value
+                msg.replace_header('To', RawHeaderValue(address_value(to_header)))
+            return msg.as_string()
+        
+        from message_builder import SplicedMessageBuilder
+        
+        policy = self.encoding_policy()
+        builder = self._message_builder
+        if builder is None or not builder.matches(email_data, self.email_config['email'], policy):
+            builder = SplicedMessageBuilder(email_data, self.email_config['email'], self.attachment_cache,
+                                            self.render_cache, policy)
+            self._message_builder = builder
+        return builder.build(recipient, to_header)
+    
+    def encoding_policy(self) -> EncodingPolicy:
+        """
+        Build the encoding policy for message parts from the send settings.
+        
+        Returns:
+            EncodingPolicy: Transfer encoding, 8bit and HTML alternative options
+        """
+        mime_8bit = self.send_settings['mime_8bit']
+        return EncodingPolicy(
+            self.send_settings['transfer_encoding'],
+            self._server_8bitmime if mime_8bit == 'auto' else bool(mime_8bit),
+            self.send_settings['html_alternative']
+        )
+    
+    def create_render_cache(self) -> RenderCache:
+        """
+        Create a render cache bounded by the send settings.
+        
+        Returns:
+            RenderCache: Empty cache
+        """
+        return RenderCache(self.send_settings['render_cache_entries'], self.send_settings['render_cache_bytes'])
+    
+    def create_connection_pool(self, email_config: Optional[Dict[str, str]] = None) -> 'SMTPConnectionPool':
+        """
+        Create an SMTP connection pool from the current email and send settings.
+        
+        Args:
+            email_config (Optional[Dict[str, str]]): Account to connect as; the
+                configured account when omitted
+        
+        Returns:
+            SMTPConnectionPool: Pool of reusable authenticated sessions
+        """
+        from smtp_pool import SMTPConnectionPool
+        
+        return SMTPConnectionPool(
+            email_config or self.email_config,
+            pool_size=max(self.send_settings['pool_size'], self.send_settings['workers']),
+            max_messages_per_connection=self.send_settings['max_messages_per_connection'],
+            max_connection_age=self.send_settings['max_connection_age'],
+            noop_interval=self.send_settings['noop_interval'],
+            logger=self.logger,
+            metrics=self.metrics,
+            pipelining=self.send_settings['smtp_pipelining'],
+            chunking=self.send_settings['smtp_chunking'],
+            chunk_size=self.send_settings['bdat_chunk_size']
+        )
+    
+    def create_sender_pool(self) -> 'SenderPool':
+        """
+        Create a pool balancing bulk sends over the configured senders.
+        
+        Each sender gets its own sessions and its own rate limiter built from
+        its provider's profile, the rate_limit setting and its own limits.
+        
+        Returns:
+            SenderPool: Pool with the send() interface of SMTPConnectionPool
+        
+        Raises:
+            ValueError: If a sender or the sender_selection setting is invalid
+        """
+        from rate_limiter import TokenBucketRateLimiter
+        from sender_pool import Sender, SenderPool, resolve_senders, sender_rate_profile
+        
+        senders = []
+        for config in resolve_senders(self.email_config, self.send_settings['senders'], self.smtp_config):
+            profile = sender_rate_profile(config, self.send_settings['rate_limit'],
+                                          self.send_settings['delay_between_emails'])
+            limiter = TokenBucketRateLimiter(profile['messages_per_second'], burst=profile['burst'],
+                                             messages_per_day=profile['messages_per_day'])
+            senders.append(Sender(config, self.create_connection_pool(config), limiter,
+                                  weight=config.get('weight', 1)))
+        return SenderPool(senders, strategy=self.send_settings['sender_selection'],
+                          cooldown=self.send_settings['sender_cooldown'],
+                          logger=self.logger, metrics=self.metrics)
+    
+    def report_senders(self, pool: 'SenderPool') -> None:
+        """Print and log how many messages each sender delivered and its remaining quota."""
+        for stats in pool.stats():
+            remaining = '' if stats['remaining_today'] is None else f", {stats['remaining_today']} left today"
+            state = ' (quota used up)' if stats['exhausted'] else ''
+            print(f"📮 {stats['name']}: {stats['sent']} sent, {stats['failed']} failed{remaining}{state}")
+        self.logger.info(f"Senders: {pool.stats()}")
+    
+    def create_rate_limiter(self) -> 'TokenBucketRateLimiter':
+        """
+        Create a rate limiter from the provider's profile and the send settings.
+        
+        Returns:
+            TokenBucketRateLimiter: Limiter shared by all send workers
+        """
+        from rate_limiter import TokenBucketRateLimiter
+        
+        return TokenBucketRateLimiter.for_provider(
+            self.email_config.get('provider', 'default'),
+            overrides=self.send_settings['rate_limit'],
+            delay_between_emails=self.send_settings['delay_between_emails']
+        )
+    
+    def send_email(self, recipient: Dict[str, str], email_data: Dict[str, str],
+                   pool: Optional[Union['SMTPConnectionPool', 'SenderPool']] = None,
+                   rate_limiter: Optional['TokenBucketRateLimiter'] = None) -> Tuple[bool, str]:
         """
         Send email to a single recipient.
         
         Args:
             recipient (Dict[str, str]): Recipient data
             email_data (Dict[str, str]): Email composition data
+            pool (Optional[Union[SMTPConnectionPool, SenderPool]]): Pool to reuse sessions from; a
+                one-off connection is opened when omitted
+            rate_limiter (Optional[TokenBucketRateLimiter]): Limiter to wait on before sending
             
         Returns:
             Tuple[bool, str]: Success status and message
         """
+        success, message, _ = self.attempt_send(recipient, email_data, pool, rate_limiter)
+        return success, message
+    
+    def attempt_send(self, recipient: Dict[str, str], email_data: Dict[str, str],
+                     pool: Optional[Union['SMTPConnectionPool', 'SenderPool']] = None,
+                     rate_limiter: Optional['TokenBucketRateLimiter'] = None) -> Tuple[bool, str, Optional[Exception]]:
+        """
+        Make one delivery attempt and keep the error for classification.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient data
+            email_data (Dict[str, str]): Email composition data
+            pool (Optional[Union[SMTPConnectionPool, SenderPool]]): Pool to reuse sessions from
+            rate_limiter (Optional[TokenBucketRateLimiter]): Limiter to wait on before sending
+            
+        Returns:
+            Tuple[bool, str, Optional[Exception]]: Success status, message and the
+                error raised by the attempt, if any
+        """
+        if rate_limiter is not None and not rate_limiter.acquire():
+            error_msg = f"Daily sending limit reached, not sent to {recipient['name']} ({recipient['email']})"
+            self.logger.warning(error_msg)
+            return False, error_msg, None
+        
+        # Time spent waiting for the limiter is not part of the message
+        with self.metrics.timer(MESSAGE):
+            return self._attempt_send(recipient, email_data, pool, rate_limiter)
+    
+    def _attempt_send(self, recipient: Dict[str, str], email_data: Dict[str, str],
+                      pool: Optional[Union['SMTPConnectionPool', 'SenderPool']],
+                      rate_limiter: Optional['TokenBucketRateLimiter']) -> Tuple[bool, str, Optional[Exception]]:
+        """Body of attempt_send once the limiter let it through, timed as a whole by the caller."""
         try:
             # Create email message
-            msg = self.create_email_message(recipient, email_data)
+            with self.metrics.timer(RENDER):
+                text = self.serialize_message(recipient, email_data)
             
-            # Connect to SMTP server
-            server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
-            server.starttls()
-            server.login(self.email_config['email'], self.email_config['password'])
+            if pool is not None:
+                pool.send(self.email_config['email'], recipient['email'], text)
+            else:
+                # One-off session: connect, send and close
+                from smtp_pool import PooledSMTPSession
+                session = PooledSMTPSession(self.email_config, metrics=self.metrics,
+                                            pipelining=self.send_settings['smtp_pipelining'],
+                                            chunking=self.send_settings['smtp_chunking'],
+                                            chunk_size=self.send_settings['bdat_chunk_size'])
+                session.connect()
+                try:
+                    session.sendmail(self.email_config['email'], recipient['email'], text)
+                finally:
+                    session.close()
             
-            # Send email
-            text = msg.as_string()
-            server.sendmail(self.email_config['email'], recipient['email'], text)
-            server.quit()
+            if rate_limiter is not None:
+                rate_limiter.report_success()
             
             success_msg = f"Email sent successfully to {recipient['name']} ({recipient['email']})"
             self.logger.info(success_msg)
-            return True, success_msg
+            return True, success_msg, None
             
         except Exception as e:
+            from rate_limiter import is_throttling_error
+            if rate_limiter is not None and is_throttling_error(e):
+                rate_limiter.report_throttled()
             error_msg = f"Failed to send email to {recipient['name']} ({recipient['email']}): {str(e)}"
             self.logger.error(error_msg)
-            return False, error_msg
+            return False, error_msg, e
+    
+    def attempt_send_batch(self, batch: List[Dict[str, str]], email_data: Optional[Dict[str, str]],
+                           pool: Union['SMTPConnectionPool', 'SenderPool'],
+                           rate_limiter: Optional['TokenBucketRateLimiter'] = None,
+                           message: Optional[bytes] = None
+                           ) -> List[Tuple[Dict[str, str], bool, str, Optional[Exception]]]:
+        """
+        Send one identical message to several recipients in a single transaction.
+        
+        Only valid for compositions without placeholders, unless the message was
+        rendered beforehand. Rendered here, recipients are kept out of the To
+        header, as with Bcc.
+        
+        Args:
+            batch (List[Dict[str, str]]): Recipients, usually of one domain
+            email_data (Optional[Dict[str, str]]): Email composition data; unused when message is given
+            pool (Union[SMTPConnectionPool, SenderPool]): Pool to reuse sessions from
+            rate_limiter (Optional[TokenBucketRateLimiter]): Limiter to wait on, once per recipient
+            message (Optional[bytes]): Message already rendered, e.g. read from the outbox
+            
+        Returns:
+            List[Tuple[Dict[str, str], bool, str, Optional[Exception]]]: Recipient,
+                success status, message and error for every recipient in the batch
+        """
+        import smtplib
+        from rate_limiter import is_throttling_error
+        
+        outcomes = []
+        accepted = []
+        for recipient in batch:
+            if rate_limiter is not None and not rate_limiter.acquire():
+                error_msg = f"Daily sending limit reached, not sent to {recipient['name']} ({recipient['email']})"
+                self.logger.warning(error_msg)
+                outcomes.append((recipient, False, error_msg, None))
+            else:
+                accepted.append(recipient)
+        if not accepted:
+            return outcomes
+        
+        try:
+            with self.metrics.timer(MESSAGE):
+                if message is None:
+                    with self.metrics.timer(RENDER):
+                        message = self.serialize_message(accepted[0], email_data,
+                                                         to_header='undisclosed-recipients:;')
+                refused = pool.send(self.email_config['email'], [r['email'] for r in accepted], message)
+        except Exception as e:
+            if rate_limiter is not None and is_throttling_error(e):
+                rate_limiter.report_throttled()
+            refused_all = e.recipients if isinstance(e, smtplib.SMTPRecipientsRefused) else {}
+            for recipient in accepted:
+                reply = refused_all.get(recipient['email'])
+                error = smtplib.SMTPRecipientsRefused({recipient['email']: reply}) if reply else e
+                error_msg = f"Failed to send email to {recipient['name']} ({recipient['email']}): {str(reply or e)}"
+                self.logger.error(error_msg)
+                outcomes.append((recipient, False, error_msg, error))
+            return outcomes
+        
+        if rate_limiter is not None:
+            rate_limiter.report_success()
+        for recipient in accepted:
+            reply = refused.get(recipient['email'])
+            if reply:
+                error = smtplib.SMTPRecipientsRefused({recipient['email']: reply})
+                error_msg = f"Failed to send email to {recipient['name']} ({recipient['email']}): {str(reply)}"
+                self.logger.error(error_msg)
+                outcomes.append((recipient, False, error_msg, error))
+            else:
+                success_msg = f"Email sent successfully to {recipient['name']} ({recipient['email']})"
+                self.logger.info(success_msg)
+                outcomes.append((recipient, True, success_msg, None))
+        return outcomes
+    
+    def create_retry_queue(self) -> 'RetryQueue':
+        """
+        Create the retry queue for transient delivery failures.
+        
+        Returns:
+            RetryQueue: Queue using the retry settings
+        """
+        from retry_queue import RetryQueue
+        
+        return RetryQueue(
+            max_retries=self.send_settings['max_retries'],
+            base_delay=self.send_settings['retry_base_delay'],
+            max_delay=self.send_settings['retry_max_delay']
+        )
     
-    def send_bulk_emails(self, email_data: Dict[str, str]) -> None:
+    def open_journal(self, email_data: Dict[str, str], campaign_id: Optional[str] = None) -> Optional['SendJournal']:
+        """
+        Open the send journal for a campaign, if journaling is enabled.
+        
+        Args:
+            email_data (Dict[str, str]): Email composition data
+            campaign_id (Optional[str]): Campaign id; derived from the composition
+                and recipients file when omitted
+            
+        Returns:
+            Optional[SendJournal]: Journal, or None when journal_path is not set
+        """
+        if not self.send_settings['journal_path']:
+            return None
+        
+        from send_journal import SendJournal, make_campaign_id
+        
+        campaign_id = campaign_id or make_campaign_id(email_data, self.recipients_path)
+        journal = SendJournal(
+            self.send_settings['journal_path'],
+            campaign_id,
+            batch_size=self.send_settings['journal_batch_size'],
+            flush_interval=self.send_settings['journal_flush_interval']
+        )
+        journal.start_campaign(email_data, self.recipients_path)
+        return journal
+    
+    def open_sent_index(self, email_data: Dict[str, str], campaign_id: Optional[str] = None) -> Optional['SentIndex']:
+        """
+        Open the index of addresses a campaign already sent to, if sent_index_dir is set.
+        
+        Args:
+            email_data (Dict[str, str]): Email composition data
+            campaign_id (Optional[str]): Campaign id; derived from the composition
+                and recipients file when omitted
+            
+        Returns:
+            Optional[SentIndex]: Index, or None when sent_index_dir is not set
+        
+        Raises:
+            OSError: If the index cannot be read
+            ValueError: If the index files are not a sent index
+        """
+        if not self.send_settings['sent_index_dir']:
+            return None
+        
+        from send_journal import make_campaign_id
+        from sent_index import SentIndex
+        
+        campaign_id = campaign_id or make_campaign_id(email_data, self.recipients_path)
+        return SentIndex(os.path.join(self.send_settings['sent_index_dir'], campaign_id))
+    
+    def close_sent_index(self, sent_index: 'SentIndex') -> None:
+        """
+        Close a campaign's sent index, folding this run's addresses into it.
+        
+        Shards of a multi-process campaign only write their logs; the parent
+        compacts once every shard has finished.
+        
+        Args:
+            sent_index (SentIndex): Index opened by open_sent_index()
+        """
+        try:
+            sent_index.close(compact=self.shard is None)
+        except OSError as e:
+            # The run's log is kept, so its addresses are still found next time
+            print(f"⚠️ Could not compact the sent index: {str(e)}")
+            self.logger.warning(f"Could not compact sent index {sent_index.directory}: {str(e)}")
+            sent_index.close(compact=False)
+        if self.shard is None:
+            print(f"📇 Sent index: {len(sent_index)} addresses, {sent_index.added} added by this run")
+    
+    def send_bulk_emails(self, email_data: Dict[str, str], campaign_id: Optional[str] = None,
+                         resume: bool = False) -> Optional[Dict[str, int]]:
         """
         Send bulk emails to all recipients.
         
+        With outbox_path set, messages are rendered into that spool on a
+        background thread while the SMTP sessions send what is already rendered.
+        
         Args:
             email_data (Dict[str, str]): Email composition data
+            campaign_id (Optional[str]): Journal campaign id; derived when omitted
+            resume (bool): Skip recipients the journal already records as sent
+            
+        Returns:
+            Optional[Dict[str, int]]: Successful, failed, skipped and filtered counts,
+                or None if the campaign could not start or its recipients could not be read
         """
         if not self.recipients:
             print("❌ No recipients loaded. Please load recipients first.")
-            return
+            return None
         
         if not self.email_config:
             print("❌ Email not configured. Please configure email first.")
-            return
+            return None
+        
+        if self.send_settings['senders']:
+            try:
+                # Sessions open lazily, so this only checks the settings
+                self.create_sender_pool().close()
+            except ValueError as e:
+                print(f"❌ Invalid sender settings: {str(e)}")
+                return None
         
-        print(f"\n📤 Sending emails to {len(self.recipients)} recipients...")
+        if self.send_settings['processes'] > 1:
+            return self.send_sharded(email_data, campaign_id, resume)
+        
+        workers = self.send_settings['workers']
+        streaming = isinstance(self.recipients, RecipientSource)
+        total = None if streaming else len(self.recipients)
+        if streaming:
+            print(f"\n📤 Sending emails to recipients in {self.recipients.file_path} using {workers} worker(s)...")
+        else:
+            print(f"\n📤 Sending emails to {total} recipients using {workers} worker(s)...")
         print("=" * 50)
         
+        skipped = 0
+        
+        try:
+            recipients, validator = self._validated_recipients(total)
+        except OSError as e:
+            print(f"❌ Could not load suppression list: {str(e)}")
+            return None
+        
+        journal = self.open_journal(email_data, campaign_id)
+        if journal is not None:
+            print(f"📒 Campaign ID: {journal.campaign_id}")
+            self.logger.info(f"Campaign {journal.campaign_id} started (resume={resume})")
+        
+        try:
+            sent_index = self.open_sent_index(email_data, journal.campaign_id if journal is not None else campaign_id)
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not open sent index: {str(e)}")
+            if journal is not None:
+                journal.close()
+            return None
+        if sent_index is not None:
+            if len(sent_index):
+                print(f"📇 Skipping the {len(sent_index)} addresses this campaign already sent to")
+            def not_sent_before(candidates):
+                nonlocal skipped
+                for candidate in candidates:
+                    if candidate['email'] in sent_index:
+                        skipped += 1
+                    else:
+                        yield candidate
+            recipients = not_sent_before(recipients)
+        
+        if resume and journal is not None:
+            def unsent(candidates):
+                nonlocal skipped
+                for candidate in candidates:
+                    if journal.is_sent(candidate['email']):
+                        skipped += 1
+                    else:
+                        yield candidate
+            recipients = unsent(recipients)
+        
+        # Encode attachments once per campaign
+        self.attachment_cache = AttachmentCache(self.logger)
+        self.render_cache = self.create_render_cache()
+        self._message_builder = None
+        self._server_8bitmime = False
+        self.metrics = CampaignMetrics()
+        batches = self._campaign_batches(email_data, recipients)
+        
+        outbox = None
+        if self.send_settings['outbox_path']:
+            from outbox_spool import OutboxSpool, RenderStage
+            
+            try:
+                outbox = OutboxSpool(self.send_settings['outbox_path'], 'w')
+            except OSError as e:
+                print(f"❌ Could not create outbox: {str(e)}")
+                if journal is not None:
+                    journal.close()
+                if sent_index is not None:
+                    sent_index.close(compact=False)
+                return None
+            print(f"🗂️ Rendering into outbox {outbox.path} while sending")
+            batches = RenderStage(batches, lambda batch: self.render_for_outbox(batch, email_data),
+                                  outbox, self.send_settings['outbox_queue_size'])
+        
+        try:
+            successful, failed = self._deliver_batches(batches, email_data, total, journal, outbox, sent_index)
+            if outbox is not None:
+                outbox.finish(campaign_id=journal.campaign_id if journal is not None else campaign_id,
+                              email_data=email_data, recipients_path=self.recipients_path)
+        except ValueError as e:
+            # A streamed recipients file that turns out to be malformed part-way through
+            print(f"❌ Could not read recipients: {str(e)}")
+            self.logger.error(f"Campaign stopped, could not read recipients: {str(e)}")
+            return None
+        finally:
+            if journal is not None:
+                journal.close()
+            if sent_index is not None:
+                self.close_sent_index(sent_index)
+            if outbox is not None:
+                outbox.close()
+        
+        if streaming:
+            self.report_invalid_recipients(self.recipients)
+        self._report_filtered(validator)
+        
+        print(f"\n📊 Summary:")
+        print(f"✅ Successful: {successful}")
+        print(f"❌ Failed: {failed}")
+        if skipped:
+            print(f"⏭️ Skipped (already sent): {skipped}")
+        print(f"📝 Total: {successful + failed + skipped}")
+        if self.render_cache.hits:
+            print(f"♻️ Render cache: {self.render_cache.hits} reused, {self.render_cache.misses} rendered")
+        self.report_metrics()
+        
+        self.logger.info(f"Bulk email completed: {successful} successful, {failed} failed, {skipped} skipped")
+        return {
+            'successful': successful,
+            'failed': failed,
+            'skipped': skipped,
+            'filtered': validator.rejected if validator is not None else 0
+        }
+    
+    def _validated_recipients(self, total: Optional[int]
+                              ) -> Tuple[Iterable[Dict[str, str]], Optional['RecipientValidator']]:
+        """
+        Wrap the recipients in the validator when validation is enabled.
+        
+        Args:
+            total (Optional[int]): Number of recipients, if known
+        
+        Returns:
+            Tuple[Iterable[Dict[str, str]], Optional[RecipientValidator]]: Recipients
+                to send to, and the validator (None when validation is off)
+        
+        Raises:
+            OSError: If the suppression list cannot be read
+        """
+        if not self.send_settings['validate_recipients']:
+            return self.recipients, None
+        
+        from recipient_validation import create_validator
+        
+        validator = create_validator(
+            self.send_settings['suppression_list'],
+            self.send_settings['check_domains'],
+            expected_recipients=total or 1024
+        )
+        return validator.filter(self.recipients), validator
+    
+    def _report_filtered(self, validator: Optional['RecipientValidator']) -> None:
+        """Print and log what recipient validation filtered out."""
+        if validator is not None and validator.rejected:
+            stats = validator.stats
+            print(f"🧹 Filtered out {validator.rejected} of {stats['checked']} recipients: "
+                  f"{stats['invalid_syntax']} invalid, {stats['duplicate']} duplicate, "
+                  f"{stats['suppressed']} suppressed, {stats['bad_domain']} bad domain")
+            self.logger.info(f"Recipient validation: {stats}")
+    
+    def _campaign_batches(self, email_data: Dict[str, str], recipients) -> Iterator[List[Dict[str, str]]]:
+        """Group recipients into the batches that share one message and transaction."""
+        from domain_batching import DomainBatcher, is_personalized
+        
+        # Identical messages can share a transaction: group their recipients by domain
+        batch_size = self.send_settings['recipients_per_transaction']
+        if batch_size > 1 and not is_personalized(email_data):
+            print(f"📦 Batching up to {batch_size} recipients per domain in each transaction")
+            return DomainBatcher(batch_size).batches(recipients)
+        return ([recipient] for recipient in recipients)
+    
+    def _deliver_batches(self, batches, email_data: Optional[Dict[str, str]], total: Optional[int],
+                         journal: Optional['SendJournal'], outbox: Optional['OutboxSpool'],
+                         sent_index: Optional['SentIndex'] = None) -> Tuple[int, int]:
+        """
+        Send every batch through the pooled sessions, retrying transient failures.
+        
+        Args:
+            batches: Recipient lists, or spool entries when outbox is given
+            email_data (Optional[Dict[str, str]]): Email composition data; unused
+                when the messages come from the outbox
+            total (Optional[int]): Number of recipients for progress, if known
+            journal (Optional[SendJournal]): Journal recording each delivery state
+            outbox (Optional[OutboxSpool]): Spool the messages are read from
+            sent_index (Optional[SentIndex]): Index recording the addresses delivered to
+        
+        Returns:
+            Tuple[int, int]: Successful and failed deliveries
+        """
+        from send_engine import ConcurrentSender
+        from send_journal import PENDING, SENT, FAILED, RETRYING
+        from domain_batching import DomainLimiter, recipient_domain
+        
         successful = 0
         failed = 0
+        senders = bool(self.send_settings['senders'])
+        # With several senders each one is paced by its own limiter inside the sender pool
+        rate_limiter = None if senders else self.create_rate_limiter()
+        retry_queue = self.create_retry_queue()
+        metrics_path = self.send_settings['metrics_path']
+        progress_every = max(1, self.send_settings['progress_every'])
+        next_metrics_write = time.monotonic() + self.send_settings['metrics_interval']
+        domain_limiter = DomainLimiter(self.send_settings['domain_concurrency'])
         
-        for i, recipient in enumerate(self.recipients, 1):
-            print(f"[{i}/{len(self.recipients)}] Sending to {recipient['name']}...")
+        metrics_server = self.start_metrics_server()
+        profiler_hook = self.start_profiler()
+        try:
+            with (self.create_sender_pool() if senders else self.create_connection_pool()) as pool:
+                if self.send_settings['mime_8bit'] == 'auto':
+                    # Checked on a session the campaign then goes on to use
+                    try:
+                        self._server_8bitmime = pool.supports('8BITMIME')
+                    except Exception as e:
+                        self.logger.warning(f"Could not check the server for 8BITMIME: {str(e)}")
+                def deliver(item: Tuple[List[Dict[str, str]], int]
+                            ) -> List[Tuple[Dict[str, str], bool, str, Optional[Exception]]]:
+                    batch, attempt = item
+                    recipients = batch.recipients if outbox is not None else batch
+                    if journal is not None and attempt == 1:
+                        for recipient in recipients:
+                            journal.record(recipient['email'], PENDING)
+                    with domain_limiter.slot(recipient_domain(recipients[0])):
+                        if outbox is not None:
+                            return self.attempt_send_batch(recipients, email_data, pool, rate_limiter,
+                                                           message=outbox.read(batch))
+                        if len(batch) > 1:
+                            return self.attempt_send_batch(batch, email_data, pool, rate_limiter)
+                        return [(batch[0],) + self.attempt_send(batch[0], email_data, pool, rate_limiter)]
+                
+                def first_attempts():
+                    for batch in batches:
+                        # Retries that have come due go out between fresh recipients
+                        yield from retry_queue.pop_due()
+                        yield batch, 1
+                
+                sender = ConcurrentSender(
+                    deliver,
+                    workers=self.send_settings['workers'],
+                    max_in_flight=self.send_settings['max_in_flight']
+                )
+                attempts = first_attempts()
+                while True:
+                    for _, (batch, attempt), outcomes in sender.run(attempts):
+                        for recipient, success, message, error in outcomes:
+                            if not success:
+                                # Retried recipients go out on their own
+                                retry = batch._replace(recipients=[recipient]) if outbox is not None else [recipient]
+                                delay = retry_queue.schedule(retry, attempt, error)
+                                if delay is not None:
+                                    self.metrics.increment('retried')
+                                    print(f"🔁 {message} (retry {attempt} in {delay:.0f}s)")
+                                    if journal is not None:
+                                        journal.record(recipient['email'], RETRYING, message)
+                                    continue
+                            
+                            done = successful + failed + 1
+                            progress = f"[{done}/{total}]" if total is not None else f"[{done}]"
+                            if success:
+                                if done % progress_every == 0 or done == total:
+                                    print(f"{progress} ✅ {message}")
+                                successful += 1
+                            else:
+                                print(f"{progress} ❌ {message}")
+                                failed += 1
+                            self.metrics.increment('sent' if success else 'failed')
+                            if journal is not None:
+                                journal.record(recipient['email'], SENT if success else FAILED,
+                                               None if success else message)
+                            if success and sent_index is not None:
+                                sent_index.add(recipient['email'])
+                            if metrics_path and time.monotonic() >= next_metrics_write:
+                                self.metrics.write_prometheus(metrics_path)
+                                next_metrics_write = time.monotonic() + self.send_settings['metrics_interval']
+                    
+                    if not len(retry_queue):
+                        break
+                    # Wait for the remaining retries once every recipient had a first attempt
+                    attempts = retry_queue.drain()
+                if senders:
+                    self.report_senders(pool)
+        finally:
+            if profiler_hook is not None:
+                profiler_hook.stop()
+            if metrics_server is not None:
+                metrics_server.stop()
+        return successful, failed
+    
+    def render_for_outbox(self, batch: List[Dict[str, str]], email_data: Dict[str, str]) -> bytes:
+        """
+        Render the message for a batch as it is spooled: bytes with CRLF line endings.
+        
+        Args:
+            batch (List[Dict[str, str]]): Recipients sharing the message
+            email_data (Dict[str, str]): Email composition data
+        
+        Returns:
+            bytes: Message ready for sendmail
+        """
+        with self.metrics.timer(RENDER):
+            if len(batch) > 1:
+                message = self.serialize_message(batch[0], email_data, to_header='undisclosed-recipients:;')
+            else:
+                message = self.serialize_message(batch[0], email_data)
+        if isinstance(message, bytes):
+            return message
+        # Full MIME assembly produces text with bare newlines
+        return message.replace('\r\n', '\n').replace('\n', '\r\n').encode('utf-8')
+    
+    def render_outbox(self, email_data: Dict[str, str], path: Optional[str] = None,
+                      campaign_id: Optional[str] = None) -> Optional[int]:
+        """
+        Render every message of a campaign into an outbox spool without sending.
+        
+        The spool can be sent later, e.g. in the send window, with send_outbox().
+        
+        Args:
+            email_data (Dict[str, str]): Email composition data
+            path (Optional[str]): Spool directory; outbox_path when omitted
+            campaign_id (Optional[str]): Journal campaign id the spool is sent
+                under; derived when omitted
             
-            success, message = self.send_email(recipient, email_data)
+        Returns:
+            Optional[int]: Messages rendered, or None if the spool could not be written
+        """
+        path = path or self.send_settings['outbox_path']
+        if not path:
+            print("❌ No outbox directory. Set outbox_path in the send settings.")
+            return None
+        if not self.recipients:
+            print("❌ No recipients loaded. Please load recipients first.")
+            return None
+        if not self.email_config:
+            print("❌ Email not configured. Please configure email first.")
+            return None
+        
+        from outbox_spool import OutboxSpool
+        
+        streaming = isinstance(self.recipients, RecipientSource)
+        try:
+            recipients, validator = self._validated_recipients(None if streaming else len(self.recipients))
+        except OSError as e:
+            print(f"❌ Could not load suppression list: {str(e)}")
+            return None
+        
+        self.attachment_cache = AttachmentCache(self.logger)
+        self.render_cache = self.create_render_cache()
+        self._message_builder = None
+        self._server_8bitmime = False
+        self.metrics = CampaignMetrics()
+        if campaign_id is None and (self.send_settings['journal_path'] or self.send_settings['sent_index_dir']):
+            from send_journal import make_campaign_id
+            campaign_id = make_campaign_id(email_data, self.recipients_path)
+        
+        print(f"\n🗂️ Rendering messages into outbox {path}...")
+        try:
+            with OutboxSpool(path, 'w') as outbox:
+                for batch in self._campaign_batches(email_data, recipients):
+                    outbox.append(batch, self.render_for_outbox(batch, email_data))
+                outbox.finish(campaign_id=campaign_id, email_data=email_data,
+                              recipients_path=self.recipients_path)
+        except OSError as e:
+            print(f"❌ Could not write outbox: {str(e)}")
+            self.logger.error(f"Could not write outbox {path}: {str(e)}")
+            return None
+        
+        if streaming:
+            self.report_invalid_recipients(self.recipients)
+        self._report_filtered(validator)
+        print(f"✅ Rendered {outbox.messages} messages for {outbox.recipients} recipients")
+        self.logger.info(f"Rendered {outbox.messages} messages for {outbox.recipients} recipients into {path}")
+        return outbox.messages
+    
+    def send_outbox(self, path: Optional[str] = None, resume: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Send the messages of an outbox spool rendered earlier.
+        
+        Nothing is rendered: the sessions only stream the spooled bytes. The
+        campaign id stored in the spool keeps the journal and resume working.
+        
+        Args:
+            path (Optional[str]): Spool directory; outbox_path when omitted
+            resume (bool): Skip recipients the journal already records as sent
             
-            if success:
-                print(f"✅ {message}")
-                successful += 1
+        Returns:
+            Optional[Dict[str, int]]: Successful, failed, skipped and filtered counts,
+                or None if the outbox could not be sent
+        """
+        path = path or self.send_settings['outbox_path']
+        if not path:
+            print("❌ No outbox directory. Set outbox_path in the send settings.")
+            return None
+        if not self.email_config:
+            print("❌ Email not configured. Please configure email first.")
+            return None
+        
+        from outbox_spool import OutboxSpool
+        
+        try:
+            outbox = OutboxSpool(path, 'r')
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not open outbox: {str(e)}")
+            return None
+        
+        with outbox:
+            if outbox.complete:
+                print(f"\n📤 Sending {outbox.messages} messages to {outbox.recipients} recipients from outbox {path}...")
             else:
-                print(f"❌ {message}")
-                failed += 1
+                print(f"\n⚠️ Outbox {path} was not rendered completely; sending the messages it holds...")
+            print("=" * 50)
+            
+            skipped = 0
+            entries = outbox.entries()
+            journal = None
+            email_data = outbox.manifest.get('email_data')
+            if email_data:
+                # The journal and sent index derive the campaign id from it when the spool has none
+                self.recipients_path = outbox.manifest.get('recipients_path')
+            if email_data and self.send_settings['journal_path']:
+                journal = self.open_journal(email_data, outbox.manifest.get('campaign_id'))
+                print(f"📒 Campaign ID: {journal.campaign_id}")
+                self.logger.info(f"Campaign {journal.campaign_id} sending from outbox {path} (resume={resume})")
+            
+            sent_index = None
+            if email_data:
+                try:
+                    sent_index = self.open_sent_index(email_data, outbox.manifest.get('campaign_id'))
+                except (OSError, ValueError) as e:
+                    print(f"❌ Could not open sent index: {str(e)}")
+                    if journal is not None:
+                        journal.close()
+                    return None
+            if sent_index is not None:
+                def not_sent_before(candidates):
+                    nonlocal skipped
+                    for entry in candidates:
+                        pending = [r for r in entry.recipients if r['email'] not in sent_index]
+                        skipped += len(entry.recipients) - len(pending)
+                        if pending:
+                            yield entry._replace(recipients=pending)
+                entries = not_sent_before(entries)
+            
+            if resume and journal is not None:
+                def unsent(candidates):
+                    nonlocal skipped
+                    for entry in candidates:
+                        pending = [r for r in entry.recipients if not journal.is_sent(r['email'])]
+                        skipped += len(entry.recipients) - len(pending)
+                        if pending:
+                            yield entry._replace(recipients=pending)
+                entries = unsent(entries)
             
-            # Add delay to avoid rate limiting
-            time.sleep(1)
+            self.metrics = CampaignMetrics()
+            try:
+                successful, failed = self._deliver_batches(entries, email_data, outbox.recipients or None,
+                                                           journal, outbox, sent_index)
+            finally:
+                if journal is not None:
+                    journal.close()
+                if sent_index is not None:
+                    self.close_sent_index(sent_index)
         
         print(f"\n📊 Summary:")
         print(f"✅ Successful: {successful}")
         print(f"❌ Failed: {failed}")
-        print(f"📝 Total: {len(self.recipients)}")
+        if skipped:
+            print(f"⏭️ Skipped (already sent): {skipped}")
+        print(f"📝 Total: {successful + failed + skipped}")
+        self.report_metrics()
         
-        self.logger.info(f"Bulk email completed: {successful} successful, {failed} failed")
+        self.logger.info(f"Outbox {path} sent: {successful} successful, {failed} failed, {skipped} skipped")
+        return {
+            'successful': successful,
+            'failed': failed,
+            'skipped': skipped,
+            'filtered': 0
+        }
+    
+    def send_sharded(self, email_data: Dict[str, str], campaign_id: Optional[str] = None,
+                     resume: bool = False) -> Optional[Dict[str, int]]:
+        """
+        Send bulk emails from several worker processes.
+        
+        Recipients are split by a stable hash of their address; each process
+        sends its shard with its own SMTP sessions and share of the rate limit.
+        Per-recipient results go to the log, which all processes share.
+        
+        Args:
+            email_data (Dict[str, str]): Email composition data
+            campaign_id (Optional[str]): Journal campaign id; derived when omitted
+            resume (bool): Skip recipients the journal already records as sent
+            
+        Returns:
+            Optional[Dict[str, int]]: Counts added up over all shards, or None if
+                no shard ran
+        """
+        from sharded_runner import run_sharded_campaign, SUMMARY_KEYS
+        from send_journal import make_campaign_id
+        
+        processes = self.send_settings['processes']
+        if self.send_settings['journal_path'] or self.send_settings['sent_index_dir']:
+            campaign_id = campaign_id or make_campaign_id(email_data, self.recipients_path)
+            print(f"📒 Campaign ID: {campaign_id}")
+        print(f"\n📤 Sending emails from {processes} processes...")
+        print("=" * 50)
+        
+        results = run_sharded_campaign(
+            self.email_config, self.send_settings, email_data, self.recipients,
+            self.recipients_path, processes, campaign_id=campaign_id, resume=resume, logger=self.logger
+        )
+        # The shards only logged the addresses they sent; fold the logs in now that none is running
+        try:
+            sent_index = self.open_sent_index(email_data, campaign_id)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not compact the sent index: {str(e)}")
+            self.logger.warning(f"Could not open sent index: {str(e)}")
+        else:
+            if sent_index is not None:
+                self.close_sent_index(sent_index)
+        completed = [result for result in results if result is not None]
+        if not completed:
+            print("❌ No shard could be sent. See the log for details.")
+            return None
+        
+        summary = {key: sum(result[key] for result in completed) for key in SUMMARY_KEYS}
+        for shard, result in enumerate(results):
+            if result is None:
+                print(f"❌ Shard {shard + 1} of {processes} did not run")
+            else:
+                print(f"[shard {shard + 1}/{processes}] ✅ {result['successful']} sent, ❌ {result['failed']} failed")
+        
+        print(f"\n📊 Summary:")
+        print(f"✅ Successful: {summary['successful']}")
+        print(f"❌ Failed: {summary['failed']}")
+        if summary['skipped']:
+            print(f"⏭️ Skipped (already sent): {summary['skipped']}")
+        if summary['filtered']:
+            print(f"🧹 Filtered out: {summary['filtered']}")
+        print(f"📝 Total: {summary['successful'] + summary['failed'] + summary['skipped']}")
+        
+        self.metrics = CampaignMetrics()
+        for result in completed:
+            self.metrics.merge(result['metrics'])
+        self.report_metrics()
+        
+        self.logger.info(f"Sharded bulk email completed over {processes} processes: {summary}")
+        return summary
+    
+    def start_metrics_server(self) -> Optional['MetricsServer']:
+        """
+        Start serving the campaign metrics over HTTP if metrics_port is set.
+        
+        Returns:
+            Optional[MetricsServer]: Running server, or None
+        """
+        port = self.send_settings['metrics_port']
+        if not port:
+            return None
+        from metrics import MetricsServer
+        
+        try:
+            server = MetricsServer(lambda: self.metrics, port=port).start()
+        except OSError as e:
+            print(f"⚠️ Could not serve metrics on port {port}: {str(e)}")
+            self.logger.warning(f"Could not serve metrics on port {port}: {str(e)}")
+            return None
+        print(f"📈 Metrics at http://127.0.0.1:{server.port}/metrics")
+        return server
+    
+    def start_profiler(self):
+        """
+        Start the profiler hook for a campaign, installing a cProfile hook when profile_path is set.
+        
+        Returns:
+            The started hook, or None when profiling is off
+        """
+        hook = self.profiler_hook
+        if hook is None and self.send_settings['profile_path']:
+            from metrics import CProfileHook
+            hook = CProfileHook(self.send_settings['profile_path'])
+        if hook is not None:
+            hook.start()
+        return hook
+    
+    def report_metrics(self) -> None:
+        """Print the phase timings of the last campaign and write the metrics files."""
+        summary = self.metrics.summary()
+        if summary['phases']:
+            print("⏱️ Phase timings (p50 / p99 ms):")
+            for phase, stats in summary['phases'].items():
+                print(f"   {phase:<9} {stats['p50_ms']:>9.2f} / {stats['p99_ms']:>9.2f}  ({stats['count']}x)")
+        wire_bytes = summary['counters'].get('bytes', 0)
+        transactions = summary['phases'].get(SENDMAIL, {}).get('count', 0)
+        if wire_bytes and transactions:
+            print(f"📦 Bytes on the wire: {wire_bytes / 1024:.1f} KB, {wire_bytes // transactions} per message")
+        
+        try:
+            if self.send_settings['metrics_path']:
+                self.metrics.write_prometheus(self.send_settings['metrics_path'])
+            if self.send_settings['metrics_summary_path']:
+                with open(self.send_settings['metrics_summary_path'], 'w', encoding='utf-8') as file:
+                    json.dump(summary, file, indent=2)
+                print(f"📈 Metrics summary written to {self.send_settings['metrics_summary_path']}")
+        except OSError as e:
+            print(f"⚠️ Could not write metrics: {str(e)}")
+            self.logger.warning(f"Could not write metrics: {str(e)}")
+        self.logger.info(f"Campaign metrics: {json.dumps(summary)}")
+    
+    def resume_campaign(self, campaign_id: str) -> bool:
+        """
+        Resume an interrupted campaign, skipping recipients already sent.
+        
+        The composition and recipients file are restored from the journal.
+        
+        Args:
+            campaign_id (str): Campaign id shown when the campaign started
+            
+        Returns:
+            bool: True if the campaign was resumed, False otherwise
+        """
+        campaign = next((c for c in self.list_campaigns() if c['campaign_id'] == campaign_id), None)
+        if campaign is None:
+            print(f"❌ Campaign not found: {campaign_id}")
+            return False
+        
+        if campaign['recipients_path']:
+            if not self.load_recipients(campaign['recipients_path'], stream=True):
+                return False
+        elif not self.recipients:
+            print("❌ The campaign's recipients file is unknown. Please load recipients first.")
+            return False
+        
+        self._current_email_data = campaign['email_data']
+        self.send_bulk_emails(campaign['email_data'], campaign_id=campaign_id, resume=True)
+        return True
+    
+    def list_campaigns(self) -> List[Dict]:
+        """
+        List the campaigns recorded in the send journal.
+        
+        Returns:
+            List[Dict]: Campaign details and per-state counts, most recent first
+        """
+        path = self.send_settings['journal_path']
+        if not path or not os.path.exists(path):
+            return []
+        from send_journal import SendJournal
+        return SendJournal.list_campaigns(path)
     
     def preview_email(self, email_data: Dict[str, str]) -> None:
         """
@@ -391,64 +1538,217 @@ class EmailAutomationTool:
         Args:
             email_data (Dict[str, str]): Email composition data
         """
-        if not self.recipients:
+        try:
+            recipient = next(iter(self.recipients), None)
+        except ValueError as e:
+            # A streamed file whose first row is malformed
+            print(f"❌ Could not read recipients: {str(e)}")
+            return
+        if recipient is None:
             print("❌ No recipients loaded.")
             return
         
         print("\n👀 Email Preview")
         print("=" * 50)
-        print(f"To: {self.recipients[0]['name']} ({self.recipients[0]['email']})")
-        print(f"Subject: {email_data['subject']}")
+        print(f"To: {recipient['name']} ({recipient['email']})")
+        print(f"Subject: {self.personalize_message(email_data['subject'], recipient)}")
         print(f"Format: {email_data['format'].upper()}")
         print("\nBody:")
         print("-" * 30)
-        preview_body = self.personalize_message(email_data['body'], self.recipients[0])
+        preview_body = self.personalize_message(email_data['body'], recipient,
+                                                escape_html=email_data['format'] == 'html')
         print(preview_body)
         print("-" * 30)
         
         if email_data['attachments']:
             print(f"\nAttachments: {', '.join([os.path.basename(f) for f in email_data['attachments']])}")
     
-    def schedule_email(self, email_data: Dict[str, str], delay_minutes: int) -> None:
+    def get_scheduler(self) -> 'CampaignScheduler':
+        """
+        Open the scheduled job store and start running due campaigns.
+        
+        Returns:
+            CampaignScheduler: Running scheduler
+        """
+        if self.scheduler is None:
+            from campaign_scheduler import CampaignScheduler
+            self.scheduler = CampaignScheduler(
+                self.send_settings['scheduler_path'],
+                self.run_scheduled_job,
+                max_concurrent=self.send_settings['max_concurrent_campaigns']
+            )
+            self.scheduler.start()
+        return self.scheduler
+    
+    def schedule_campaign(self, email_data: Dict[str, str], run_at: Optional[datetime] = None,
+                          rule: Optional[str] = None) -> Optional[str]:
+        """
+        Schedule a campaign to run in the background at a time or on a recurring rule.
+        
+        The job is stored, so it survives a restart of the tool. The recipients
+        file is read again when the campaign runs.
+        
+        Args:
+            email_data (Dict[str, str]): Email composition data
+            run_at (Optional[datetime]): Time of the (first) run
+            rule (Optional[str]): Cron expression, e.g. '0 9 * * 1-5' for 9:00 on weekdays
+            
+        Returns:
+            Optional[str]: Job id, or None if the campaign could not be scheduled
+        """
+        if not self.recipients_path:
+            print("❌ Load recipients from a file before scheduling a campaign.")
+            return None
+        
+        import sqlite3
+        
+        try:
+            scheduler = self.get_scheduler()
+            job_id = scheduler.add_job(email_data, self.recipients_path,
+                                       run_at.timestamp() if run_at else None, rule)
+        except (ValueError, sqlite3.Error) as e:
+            print(f"❌ Could not schedule campaign: {str(e)}")
+            return None
+        
+        job = next(job for job in scheduler.list_jobs() if job['job_id'] == job_id)
+        when = datetime.fromtimestamp(job['next_run']).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"📅 Campaign {job_id} scheduled for {when}" + (f" (repeats: {rule})" if rule else ""))
+        self.logger.info(f"Scheduled campaign {job_id} for {when} (rule={rule})")
+        return job_id
+    
+    def schedule_email(self, email_data: Dict[str, str], delay_minutes: int) -> Optional[str]:
         """
         Schedule email to be sent after specified delay.
         
         Args:
             email_data (Dict[str, str]): Email composition data
             delay_minutes (int): Delay in minutes
+            
+        Returns:
+            Optional[str]: Job id, or None if the campaign could not be scheduled
         """
         print(f"\n⏰ Scheduling email to be sent in {delay_minutes} minutes...")
+        return self.schedule_campaign(email_data, run_at=datetime.now() + timedelta(minutes=delay_minutes))
+    
+    def load_email_config_file(self) -> Dict[str, str]:
+        """
+        Read the account from EMAIL_CONFIG in config.py, as the headless runner does.
         
-        def send_scheduled():
-            self.send_bulk_emails(email_data)
+        Returns:
+            Dict[str, str]: Email configuration, or an empty dict when config.py
+                is missing or incomplete
+        """
+        from campaign_cli import SpecError, build_email_config, load_config_module
+        
+        try:
+            smtp = load_config_module()['smtp']
+            return build_email_config(smtp, self.smtp_config) if smtp else {}
+        except (SpecError, ImportError, SyntaxError) as e:
+            self.logger.warning(f"Could not read EMAIL_CONFIG from config.py: {str(e)}")
+            return {}
+    
+    def load_settings_file(self, module_name: str = 'config') -> bool:
+        """
+        Apply EMAIL_SETTINGS from config.py to the send settings, as the headless runner does.
         
-        schedule_time = datetime.now() + timedelta(minutes=delay_minutes)
-        schedule.every().day.at(schedule_time.strftime("%H:%M")).do(send_scheduled)
+        Args:
+            module_name (str): Module holding EMAIL_SETTINGS
         
-        print(f"📅 Email scheduled for {schedule_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print("⏳ Waiting for scheduled time... (Press Ctrl+C to cancel)")
+        Returns:
+            bool: True if settings were applied, False when the module is missing,
+                has no EMAIL_SETTINGS or cannot be imported
+        """
+        from campaign_cli import load_config_module
         
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("\n❌ Email scheduling cancelled.")
-            schedule.clear()
+            settings = load_config_module(module_name)['settings']
+        except (ImportError, SyntaxError) as e:
+            self.logger.warning(f"Could not read EMAIL_SETTINGS from {module_name}.py: {str(e)}")
+            return False
+        unknown = set(settings) - set(self.send_settings)
+        self.send_settings.update({key: value for key, value in settings.items() if key not in unknown})
+        if unknown:
+            print(f"⚠️ Ignoring unknown settings in {module_name}.py: {', '.join(sorted(unknown))}")
+            self.logger.warning(f"Unknown settings in {module_name}.py ignored: {', '.join(sorted(unknown))}")
+        return bool(settings)
+    
+    def run_scheduled_job(self, job: Dict) -> Dict[str, int]:
+        """
+        Run a scheduled campaign with its own tool instance, so several can run at once.
+        
+        Args:
+            job (Dict): Job from the scheduler
+            
+        Returns:
+            Dict[str, int]: Campaign counts
+            
+        Raises:
+            JobDeferred: If email is not configured yet; the job waits and is tried again
+            RuntimeError: If the campaign could not start
+        """
+        from campaign_scheduler import JobDeferred
+        
+        # Jobs left from an earlier session can come due before email is configured
+        email_config = self.email_config or self.load_email_config_file()
+        if not email_config:
+            raise JobDeferred("Email not configured")
+        
+        tool = EmailAutomationTool()
+        tool.email_config = dict(email_config)
+        tool.send_settings = dict(self.send_settings)
+        if not tool.load_recipients(job['recipients_path'], stream=True):
+            raise RuntimeError(f"Could not load recipients from {job['recipients_path']}")
+        
+        self.logger.info(f"Running scheduled campaign {job['job_id']}")
+        result = tool.send_bulk_emails(job['email_data'], resume=job['interrupted'])
+        if result is None:
+            raise RuntimeError("Campaign could not start")
+        return result
+    
+    def show_scheduled_jobs(self) -> None:
+        """List pending scheduled campaigns and offer to cancel one."""
+        from campaign_scheduler import RUNNING
+        
+        jobs = self.get_scheduler().list_jobs()
+        if not jobs:
+            print("📭 No scheduled campaigns.")
+            return
+        
+        print("\n📅 Scheduled Campaigns")
+        for index, job in enumerate(jobs, 1):
+            when = datetime.fromtimestamp(job['next_run']).strftime('%Y-%m-%d %H:%M')
+            state = "running" if job['status'] == RUNNING else f"next run {when}"
+            repeat = f", repeats {job['rule']}" if job['rule'] else ""
+            print(f"{index}. {job['job_id']} - {job['email_data']['subject']} ({state}{repeat})")
+        
+        choice = input("Enter a number to cancel that campaign, or press Enter to go back: ").strip()
+        if not choice:
+            return
+        try:
+            selected = int(choice)
+            if 1 <= selected <= len(jobs):
+                if self.scheduler.cancel(jobs[selected - 1]['job_id']):
+                    print(f"✅ Campaign {jobs[selected - 1]['job_id']} cancelled")
+            else:
+                print("❌ Invalid campaign number.")
+        except ValueError:
+            print("❌ Invalid campaign number. Please enter a number.")
     
     def show_menu(self) -> None:
         """Display the main menu."""
         print("\n" + "=" * 60)
         print("📧 EMAIL AUTOMATION TOOL")
         print("=" * 60)
-        print("1. Load Recipients (CSV/JSON)")
+        print("1. Load Recipients (CSV/JSON/JSONL)")
         print("2. Configure Email Settings")
         print("3. Compose Email")
         print("4. Preview Email")
         print("5. Send Bulk Emails")
         print("6. Schedule Email")
         print("7. View Email Logs")
-        print("8. Exit")
+        print("8. Resume Interrupted Campaign")
+        print("9. Scheduled Campaigns")
+        print("10. Exit")
         print("=" * 60)
     
     def view_logs(self) -> None:
@@ -456,13 +1756,12 @@ class EmailAutomationTool:
         print("\n📋 Recent Email Logs")
         print("=" * 50)
         
+        from log_pipeline import tail_lines
+        
         try:
-            with open('email_logs.log', 'r') as file:
-                lines = file.readlines()
-                # Show last 20 lines
-                recent_lines = lines[-20:] if len(lines) > 20 else lines
-                for line in recent_lines:
-                    print(line.strip())
+            # Show last 20 lines, reading only the end of the file
+            for line in tail_lines(self.send_settings['log_file'], 20):
+                print(line.strip())
         except FileNotFoundError:
             print("No logs found.")
     
@@ -470,12 +1769,23 @@ class EmailAutomationTool:
         """Run the main application loop."""
         print("🚀 Welcome to Email Automation Tool!")
         
+        if self.load_settings_file():
+            print("⚙️ Settings loaded from config.py")
+        
+        # Pick up campaigns scheduled in an earlier session
+        if os.path.exists(self.send_settings['scheduler_path']):
+            pending = len(self.get_scheduler().list_jobs())
+            if pending:
+                print(f"⏰ {pending} scheduled campaign(s) pending")
+                if not self.email_config and not self.load_email_config_file():
+                    print("⚠️ They wait until email is configured (option 2)")
+        
         while True:
             self.show_menu()
-            choice = input("\nEnter your choice (1-8): ").strip()
+            choice = input("\nEnter your choice (1-10): ").strip()
             
             if choice == '1':
-                file_path = input("Enter path to recipients file (CSV/JSON): ").strip()
+                file_path = input("Enter path to recipients file (CSV/JSON/JSONL): ").strip()
                 self.load_recipients(file_path)
             
             elif choice == '2':
@@ -506,24 +1816,67 @@ class EmailAutomationTool:
                 if not hasattr(self, '_current_email_data'):
                     print("❌ No email composed yet. Please compose an email first.")
                     continue
-                try:
-                    delay = int(input("Enter delay in minutes: ").strip())
-                    if delay > 0:
-                        self.schedule_email(self._current_email_data, delay)
+                print("Enter minutes from now (e.g. 30), a date and time (YYYY-MM-DD HH:MM),")
+                when = input("or a cron rule for a recurring campaign (e.g. 0 9 * * 1-5): ").strip()
+                if when.isdigit():
+                    if int(when) > 0:
+                        self.schedule_email(self._current_email_data, int(when))
                     else:
                         print("❌ Delay must be positive.")
-                except ValueError:
-                    print("❌ Invalid delay. Please enter a number.")
+                else:
+                    try:
+                        run_at = datetime.strptime(when, '%Y-%m-%d %H:%M')
+                    except ValueError:
+                        run_at = None
+                    if run_at is not None:
+                        self.schedule_campaign(self._current_email_data, run_at=run_at)
+                    else:
+                        from campaign_scheduler import CronRule
+                        try:
+                            CronRule(when)
+                        except ValueError as e:
+                            print(f"❌ {str(e)}")
+                            continue
+                        self.schedule_campaign(self._current_email_data, rule=when)
             
             elif choice == '7':
                 self.view_logs()
             
             elif choice == '8':
+                if not self.email_config:
+                    print("❌ Email not configured. Please configure email first.")
+                    continue
+                campaigns = self.list_campaigns()
+                if not campaigns:
+                    print("❌ No campaigns found in the send journal.")
+                    continue
+                print("\n📒 Campaigns")
+                for index, campaign in enumerate(campaigns, 1):
+                    counts = campaign['counts']
+                    print(f"{index}. {campaign['campaign_id']} - {campaign['email_data']['subject']} "
+                          f"(sent {counts['sent']}, failed {counts['failed']}, pending {counts['pending']})")
+                try:
+                    selected = int(input("Select campaign to resume: ").strip())
+                    if 1 <= selected <= len(campaigns):
+                        self.resume_campaign(campaigns[selected - 1]['campaign_id'])
+                    else:
+                        print("❌ Invalid campaign number.")
+                except ValueError:
+                    print("❌ Invalid campaign number. Please enter a number.")
+            
+            elif choice == '9':
+                self.show_scheduled_jobs()
+            
+            elif choice == '10':
+                if self.scheduler is not None:
+                    if self.scheduler.running:
+                        print(f"⏳ Waiting for {self.scheduler.running} running campaign(s) to finish...")
+                    self.scheduler.close()
                 print("👋 Thank you for using Email Automation Tool!")
                 break
             
             else:
-                print("❌ Invalid choice. Please enter 1-8.")
+                print("❌ Invalid choice. Please enter 1-10.")
             
             # Store composed email data for reuse
             if choice == '3' and 'email_data' in locals():
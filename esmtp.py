@@ -0,0 +1,194 @@
+"""
+ESMTP Transactions
+Sends messages with PIPELINING, CHUNKING (BDAT), 8BITMIME and SMTPUTF8 when the server offers them.
+"""
+
+import re
+import smtplib
+from typing import Dict, List, Tuple, Union
+
+
+# Bytes of message sent per BDAT command
+BDAT_CHUNK_SIZE = 1024 * 1024
+
+_LINE_ENDINGS = re.compile(r'\r\n|\r|\n')
+_LEADING_DOT = re.compile(br'(?m)^\.')
+
+
+def supported_extensions(server: smtplib.SMTP) -> List[str]:
+    """
+    List the ESMTP extensions a server advertised in its EHLO reply.
+    
+    Args:
+        server (smtplib.SMTP): Connected session
+    
+    Returns:
+        List[str]: Upper-case extension names, e.g. ['PIPELINING', '8BITMIME']
+    """
+    server.ehlo_or_helo_if_needed()
+    return sorted(name.upper() for name in server.esmtp_features) if server.does_esmtp else []
+
+
+def _reply(server: smtplib.SMTP) -> Tuple[int, bytes]:
+    """Read one reply, closing the session when the server announces it is going away."""
+    code, message = server.getreply()
+    if code == 421:
+        server.close()
+    return code, message
+
+
+def _abort(server: smtplib.SMTP) -> None:
+    """Clear the failed transaction so the session can be reused."""
+    if server.sock is not None:
+        try:
+            server.rset()
+        except smtplib.SMTPServerDisconnected:
+            pass
+
+
+def send_message(server: smtplib.SMTP, from_addr: str, to_addrs: Union[str, List[str]],
+                 msg: Union[str, bytes], pipelining: bool = True, chunking: bool = True,
+                 chunk_size: int = BDAT_CHUNK_SIZE, reset: bool = False) -> Dict[str, Tuple[int, bytes]]:
+    """
+    Send one message, using the extensions the server advertised.
+    
+    With PIPELINING the envelope (MAIL FROM and every RCPT TO) goes out in one
+    write and the replies are read afterwards, so a message costs one round
+    trip for the envelope instead of one per command. With CHUNKING the body
+    follows as BDAT chunks (pipelined with the envelope when possible), which
+    needs neither dot-stuffing nor a separate DATA round trip. BODY=8BITMIME
+    is declared for 8-bit messages and SMTPUTF8 for non-ASCII addresses. When
+    the server offers neither PIPELINING nor CHUNKING this is plain
+    smtplib.SMTP.sendmail. Errors are raised as by sendmail.
+    
+    Args:
+        server (smtplib.SMTP): Connected session
+        from_addr (str): Envelope sender
+        to_addrs (Union[str, List[str]]): Envelope recipient(s)
+        msg (Union[str, bytes]): Serialized message
+        pipelining (bool): Use PIPELINING if advertised
+        chunking (bool): Use CHUNKING if advertised
+        chunk_size (int): Bytes per BDAT command
+        reset (bool): Send RSET first (pipelined when possible) to clear a
+            previous transaction
+    
+    Returns:
+        Dict[str, Tuple[int, bytes]]: Refused recipients, as returned by sendmail
+    
+    Raises:
+        smtplib.SMTPSenderRefused: If MAIL FROM was refused
+        smtplib.SMTPRecipientsRefused: If every recipient was refused
+        smtplib.SMTPDataError: If the message was refused
+        smtplib.SMTPNotSupportedError: If the addresses need SMTPUTF8 and the server lacks it
+    """
+    server.ehlo_or_helo_if_needed()
+    if isinstance(to_addrs, str):
+        to_addrs = [to_addrs]
+    if isinstance(msg, str):
+        msg = _LINE_ENDINGS.sub('\r\n', msg).encode('utf-8')
+    
+    options = []
+    if not msg.isascii() and server.has_extn('8bitmime'):
+        options.append('BODY=8BITMIME')
+    utf8 = not (from_addr.isascii() and all(address.isascii() for address in to_addrs))
+    if utf8:
+        if not server.has_extn('smtputf8'):
+            raise smtplib.SMTPNotSupportedError("Non-ASCII addresses need SMTPUTF8, which the server does not support")
+        options.append('SMTPUTF8')
+    
+    pipelining = pipelining and server.has_extn('pipelining')
+    chunking = chunking and server.has_extn('chunking')
+    if not (pipelining or chunking):
+        if reset:
+            server.rset()
+        return server.sendmail(from_addr, to_addrs, msg, options)
+    
+    if server.has_extn('size'):
+        options.append(f'SIZE={len(msg)}')
+    encoding = 'utf-8' if utf8 else 'ascii'
+    commands = [f"MAIL FROM:{smtplib.quoteaddr(from_addr)} {' '.join(options)}".rstrip()]
+    commands += [f"RCPT TO:{smtplib.quoteaddr(address)}" for address in to_addrs]
+    envelope = [f"{command}\r\n".encode(encoding) for command in commands]
+    if reset:
+        envelope.insert(0, b'RSET\r\n')
+    
+    if chunking:
+        view = memoryview(msg)
+        frames = [b'BDAT %d%s\r\n' % (len(view[start:start + chunk_size]),
+                                      b' LAST' if start + chunk_size >= len(msg) else b'')
+                  + view[start:start + chunk_size]
+                  for start in range(0, len(msg) or 1, chunk_size)]
+    else:
+        frames = [b'DATA\r\n']
+    
+    if pipelining:
+        # One write for the envelope and the first frame, so they share a packet
+        server.send(b''.join(envelope) + frames[0])
+        for frame in frames[1:]:
+            server.send(frame)
+        if reset:
+            code, message = _reply(server)
+            if code != 250:
+                # The replies to the rest of the group would be out of step
+                server.close()
+                raise smtplib.SMTPResponseException(code, message)
+        replies = []
+        for _ in commands:
+            replies.append(_reply(server))
+            if replies[-1][0] == 421:
+                break
+    else:
+        if reset:
+            server.rset()
+        replies = []
+        for command in envelope[1 if reset else 0:]:
+            server.send(command)
+            replies.append(_reply(server))
+            if replies[0][0] != 250 or replies[-1][0] == 421:
+                break
+    
+    code, message = replies[0]
+    if code != 250:
+        if pipelining and server.sock is not None:
+            # Commands already sent after MAIL FROM are answered too
+            for _ in frames:
+                _reply(server)
+        _abort(server)
+        raise smtplib.SMTPSenderRefused(code, message, from_addr)
+    
+    refused = {address: reply for address, reply in zip(to_addrs, replies[1:]) if reply[0] not in (250, 251)}
+    if any(code == 421 for code, _ in refused.values()):
+        raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(to_addrs):
+        if pipelining:
+            for _ in frames:
+                code, _ = _reply(server)
+                if code == 354:
+                    # The server accepted DATA anyway; end the empty message
+                    server.send(b'.\r\n')
+                    _reply(server)
+        _abort(server)
+        raise smtplib.SMTPRecipientsRefused(refused)
+    
+    answered = len(frames)
+    if chunking:
+        for answered, frame in enumerate(frames, 1):
+            if not pipelining:
+                server.send(frame)
+            code, message = _reply(server)
+            if code != 250:
+                break
+    else:
+        code, message = _reply(server)
+        if code == 354:
+            body = _LEADING_DOT.sub(b'..', msg)
+            server.send(body + (b'.\r\n' if body.endswith(b'\r\n') else b'\r\n.\r\n'))
+            code, message = _reply(server)
+    if code != 250:
+        if pipelining and chunking and server.sock is not None:
+            # Replies to the chunks after the refused one are still on the way
+            for _ in frames[answered:]:
+                _reply(server)
+        _abort(server)
+        raise smtplib.SMTPDataError(code, message)
+    return refused
@@ -0,0 +1,156 @@
+"""
+Log Pipeline
+Asynchronous logging through a queue, with rotation, optional JSON lines and a fast tail.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional
+
+# logging.handlers is imported when the pipeline is set up, so tail_lines stays cheap
+if TYPE_CHECKING:
+    import logging.handlers
+
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener: Optional['logging.handlers.QueueListener'] = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formats each record as one compact JSON object per line."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+def create_file_handler(log_file: str, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                        rotate_when: Optional[str] = None) -> logging.Handler:
+    """
+    Create a rotating file handler.
+    
+    Args:
+        log_file (str): Path of the active log file
+        max_bytes (int): Rotate when the file reaches this size (0 = never)
+        backup_count (int): Rotated files kept
+        rotate_when (Optional[str]): Rotate by time instead, e.g. 'midnight' or 'H'
+            (see logging.handlers.TimedRotatingFileHandler)
+    
+    Returns:
+        logging.Handler: File handler
+    """
+    from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+    
+    if rotate_when:
+        return TimedRotatingFileHandler(log_file, when=rotate_when, backupCount=backup_count, encoding='utf-8')
+    return RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+
+def setup_log_pipeline(log_file: str = 'email_logs.log', max_bytes: int = 10 * 1024 * 1024,
+                       backup_count: int = 5, rotate_when: Optional[str] = None,
+                       log_format: str = 'text', console_level: str = 'WARNING',
+                       level: int = logging.INFO, force: bool = False) -> bool:
+    """
+    Route the root logger through a queue to a background writer thread.
+    
+    Callers only pay for putting the record on the queue; formatting and file
+    and console I/O happen on the listener thread. Like logging.basicConfig,
+    nothing is changed when the root logger already has handlers, unless force
+    is set.
+    
+    Args:
+        log_file (str): Path of the active log file
+        max_bytes (int): Rotate when the file reaches this size (0 = never)
+        backup_count (int): Rotated files kept
+        rotate_when (Optional[str]): Rotate by time instead of size, e.g. 'midnight'
+        log_format (str): 'text' or 'json' (one JSON object per line)
+        console_level (str): Lowest level echoed to the console ('OFF' disables it)
+        level (int): Lowest level recorded
+        force (bool): Replace existing handlers, including a running pipeline
+    
+    Returns:
+        bool: True if the pipeline was installed
+    """
+    global _listener
+    root = logging.getLogger()
+    if root.handlers and not force:
+        return False
+    from logging.handlers import QueueHandler, QueueListener
+    
+    stop_log_pipeline()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    
+    formatter = JsonLinesFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [create_file_handler(log_file, max_bytes, backup_count, rotate_when)]
+    if console_level.upper() != 'OFF':
+        console = logging.StreamHandler()
+        console.setLevel(console_level.upper())
+        handlers.append(console)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return True
+
+
+def stop_log_pipeline() -> None:
+    """Write out queued records and stop the background writer."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+atexit.register(stop_log_pipeline)
+
+
+def tail_lines(file_path: str, count: int = 20, chunk_size: int = 8192) -> List[str]:
+    """
+    Read the last lines of a file by seeking backwards from its end.
+    
+    Only the blocks holding those lines are read, so the cost does not depend
+    on the size of the file.
+    
+    Args:
+        file_path (str): File to read
+        count (int): Number of lines
+        chunk_size (int): Bytes read per step
+    
+    Returns:
+        List[str]: Up to count lines, oldest first, without line endings
+    
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    with open(file_path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        data = b''
+        # One more line break than lines wanted, since the last line usually ends with one
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(chunk_size, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+    lines = data.decode('utf-8', 'replace').splitlines()
+    return lines[-count:] if count else []
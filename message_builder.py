@@ -0,0 +1,244 @@
+"""
+Message Builder
+Serializes the parts of a campaign message that never change once, then
+splices in the per-recipient headers and body.
+"""
+
+import io
+import random
+import sys
+from email.generator import BytesGenerator
+from email.header import Header
+from email.utils import formatdate, make_msgid, parseaddr
+from typing import Dict, List, Optional, Tuple
+
+from attachment_cache import AttachmentCache
+from mime_encoding import EncodingPolicy, html_to_text, minify_html, text_part
+from template_engine import RenderCache, compile_template
+
+
+CRLF = '\r\n'
+
+
+def make_boundary() -> str:
+    """Create a multipart boundary in the same form as the email package."""
+    return '=' * 15 + f'{random.randrange(sys.maxsize):019d}' + '=='
+
+
+def header_value(value: str) -> str:
+    """
+    Make a value safe for a header line, RFC 2047-encoding non-ASCII text.
+    
+    Args:
+        value (str): Raw header value
+    
+    Returns:
+        str: Encoded, single logical header value
+    """
+    value = value.replace('\r', ' ').replace('\n', ' ')
+    if value.isascii():
+        return value
+    return Header(value, 'utf-8').encode().replace('\n', CRLF)
+
+
+def address_value(value: str) -> str:
+    """
+    Make an address header value (From, To) safe for a header line.
+    
+    RFC 2047 forbids encoded-words inside an address, so a non-ASCII address
+    is kept as raw UTF-8 (RFC 6532), which servers accept over SMTPUTF8; a
+    server without it refuses the recipient. Only a display name is encoded.
+    
+    Args:
+        value (str): Address, optionally with a display name
+    
+    Returns:
+        str: Header value
+    """
+    value = value.replace('\r', ' ').replace('\n', ' ')
+    if value.isascii():
+        return value
+    name, address = parseaddr(value)
+    if not name or not address or name.isascii():
+        return value
+    return f"{header_value(name)} <{address}>"
+
+
+class RawHeaderValue:
+    """Header value written exactly as given by the email package's compat32 generator."""
+    
+    def __init__(self, value: str):
+        self.value = value
+    
+    def encode(self, linesep: str = '\n', maxlinelen: int = 0) -> str:
+        return self.value
+    
+    def __str__(self) -> str:
+        return self.value
+
+
+def serialize_part(part) -> bytes:
+    """
+    Flatten a MIME part to bytes with CRLF line endings.
+    
+    Args:
+        part: Message or MIME part to flatten
+    
+    Returns:
+        bytes: Serialized headers and payload
+    """
+    buffer = io.BytesIO()
+    policy = part.policy.clone(linesep=CRLF)
+    BytesGenerator(buffer, mangle_from_=False, policy=policy).flatten(part)
+    return buffer.getvalue()
+
+
+class SplicedMessageBuilder:
+    """Builds ready-to-send message bytes for one campaign."""
+    
+    def __init__(self, email_data: Dict, from_addr: str,
+                 attachment_cache: Optional[AttachmentCache] = None,
+                 render_cache: Optional[RenderCache] = None,
+                 policy: EncodingPolicy = EncodingPolicy()):
+        """
+        Prepare the static parts of the campaign message.
+        
+        Args:
+            email_data (Dict): Email composition data (subject, body, format, attachments)
+            from_addr (str): Sender address for the From header
+            attachment_cache (Optional[AttachmentCache]): Cache providing encoded attachments
+            render_cache (Optional[RenderCache]): Cache of encoded subjects and body
+                parts, shared by recipients with the same field values
+            policy (EncodingPolicy): Transfer encodings, 8bit and HTML alternative options
+        """
+        self.email_data = email_data
+        self.from_addr = from_addr
+        self.policy = policy
+        self.key = self.make_key(email_data, from_addr, policy)
+        self.attachment_cache = attachment_cache or AttachmentCache()
+        self.render_cache = render_cache if render_cache is not None else RenderCache()
+        self.subtype = 'html' if email_data['format'] == 'html' else 'plain'
+        self.alternative = self.subtype == 'html' and policy.html_alternative
+        
+        self.subject_template = compile_template(email_data['subject'])
+        if self.alternative:
+            # The text version is derived from the HTML once, placeholders included
+            self.body_template = compile_template(minify_html(email_data['body']), escape_html=True)
+            self.text_template = compile_template(html_to_text(email_data['body']))
+        else:
+            self.body_template = compile_template(email_data['body'], escape_html=self.subtype == 'html')
+        self.body_kind = f"body/{self.subtype}/{'/'.join(map(str, policy))}"
+        
+        self.boundary = make_boundary()
+        self.message_id_domain = from_addr.rpartition('@')[2] or None
+        self.static_headers = f"MIME-Version: 1.0{CRLF}From: {address_value(from_addr)}{CRLF}"
+        self._attachments: List[List] = [[path, None, b''] for path in email_data['attachments']]
+    
+    @staticmethod
+    def make_key(email_data: Dict, from_addr: str, policy: EncodingPolicy) -> tuple:
+        """Identify a composition so a builder can be reused while it is unchanged."""
+        return (email_data['subject'], email_data['body'], email_data['format'],
+                tuple(email_data['attachments']), from_addr, policy)
+    
+    def matches(self, email_data: Dict, from_addr: str, policy: EncodingPolicy = EncodingPolicy()) -> bool:
+        """
+        Check whether this builder was prepared for the given composition.
+        
+        Args:
+            email_data (Dict): Email composition data
+            from_addr (str): Sender address
+            policy (EncodingPolicy): Encoding policy the messages should use
+        
+        Returns:
+            bool: True if build() produces messages for this composition
+        """
+        return self.key == self.make_key(email_data, from_addr, policy)
+    
+    def _attachment_bytes(self) -> List[bytes]:
+        """Serialized attachment parts, refreshed only when the cache re-encodes a file."""
+        chunks = []
+        for entry in self._attachments:
+            path, cached_part, _ = entry
+            part = self.attachment_cache.get_part(path, self.policy.transfer_encoding)
+            if part is not cached_part:
+                entry[1] = part
+                entry[2] = serialize_part(part)
+            chunks.append(entry[2])
+        return chunks
+    
+    def body_part(self, body: str, recipient: Optional[Dict[str, str]] = None) -> bytes:
+        """
+        Serialize the body part the same way MIMEText would, with the policy's encoding.
+        
+        Args:
+            body (str): Personalized body
+            recipient (Optional[Dict[str, str]]): Recipient data, for the text
+                version of a multipart/alternative body
+        
+        Returns:
+            bytes: Part headers and encoded body with CRLF line endings
+        """
+        if not self.alternative:
+            return text_part(body, self.subtype, self.policy)
+        
+        text = text_part(self.text_template.render(recipient or {}), 'plain', self.policy)
+        html = text_part(body, 'html', self.policy)
+        boundary = make_boundary()
+        while boundary.encode('ascii') in text or boundary.encode('ascii') in html:
+            boundary = make_boundary()
+        return b''.join([
+            f'Content-Type: multipart/alternative; boundary="{boundary}"{CRLF}'
+            f'MIME-Version: 1.0{CRLF}{CRLF}--{boundary}{CRLF}'.encode('ascii'),
+            text, f'{CRLF}--{boundary}{CRLF}'.encode('ascii'),
+            html, f'{CRLF}--{boundary}--{CRLF}'.encode('ascii')
+        ])
+    
+    def encoded_body(self, body: str, recipient: Optional[Dict[str, str]] = None) -> Tuple[bytes, str]:
+        """
+        Serialize a personalized body and pick a boundary that does not occur in it.
+        
+        Args:
+            body (str): Personalized body
+            recipient (Optional[Dict[str, str]]): Recipient data, for the text
+                version of a multipart/alternative body
+        
+        Returns:
+            Tuple[bytes, str]: Encoded body part and multipart boundary
+        """
+        body_part = self.body_part(body, recipient)
+        boundary = self.boundary
+        while boundary.encode('ascii') in body_part:
+            boundary = make_boundary()
+        return body_part, boundary
+    
+    def build(self, recipient: Dict[str, str], to_header: Optional[str] = None) -> bytes:
+        """
+        Build the complete message for one recipient.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient data
+            to_header (Optional[str]): To header value; the recipient's address when omitted
+        
+        Returns:
+            bytes: RFC 5322 message with CRLF line endings, ready for sendmail
+        """
+        subject = self.render_cache.get(self.subject_template, recipient, 'subject', header_value)
+        body_part, boundary = self.render_cache.get(self.body_template, recipient, self.body_kind,
+                                                    lambda body: self.encoded_body(body, recipient))
+        attachments = self._attachment_bytes()
+        
+        headers = (f'Content-Type: multipart/mixed; boundary="{boundary}"{CRLF}'
+                   f'{self.static_headers}'
+                   f'To: {address_value(to_header or recipient["email"])}{CRLF}'
+                   f'Subject: {subject}{CRLF}'
+                   f'Date: {formatdate(localtime=True)}{CRLF}'
+                   f'Message-ID: {make_msgid(domain=self.message_id_domain)}{CRLF}'
+                   f'{CRLF}')
+        
+        # UTF-8 only for a non-ASCII address; every other header is ASCII
+        chunks = [headers.encode('utf-8'), f'--{boundary}{CRLF}'.encode('ascii'), body_part]
+        for attachment in attachments:
+            chunks.append(f'{CRLF}--{boundary}{CRLF}'.encode('ascii'))
+            chunks.append(attachment)
+        chunks.append(f'{CRLF}--{boundary}--{CRLF}'.encode('ascii'))
+        return b''.join(chunks)
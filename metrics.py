@@ -0,0 +1,390 @@
+"""
+Send Metrics
+Per-phase timing histograms and counters for campaigns, exported as Prometheus text or JSON.
+"""
+
+import bisect
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+# The HTTP server and profiler are imported when first started
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Phases timed for every message
+RENDER = 'render'
+CONNECT = 'connect'
+TLS = 'tls'
+LOGIN = 'login'
+SENDMAIL = 'sendmail'
+MESSAGE = 'message'
+
+PHASES = (RENDER, CONNECT, TLS, LOGIN, SENDMAIL, MESSAGE)
+
+# From Python 3.12 cProfile runs on sys.monitoring: one profiler sees every thread,
+# and a second one cannot be enabled alongside it
+PROCESS_WIDE_PROFILER = sys.version_info >= (3, 12)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize an empty histogram.
+        
+        Args:
+            buckets (Tuple[float, ...]): Sorted bucket upper bounds in seconds
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float) -> None:
+        """
+        Record one observation. The caller serializes access.
+        
+        Args:
+            value (float): Duration in seconds
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+    
+    def merge(self, other: 'Histogram') -> None:
+        """
+        Add another histogram with the same buckets to this one.
+        
+        Args:
+            other (Histogram): Histogram to add
+        """
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+    
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimate a quantile by interpolating within its bucket.
+        
+        Args:
+            fraction (float): Quantile in the range 0..1
+        
+        Returns:
+            float: Estimated value in seconds (0 when empty)
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+
+class CampaignMetrics:
+    """Thread-safe phase histograms and counters for one campaign."""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize empty metrics.
+        
+        Args:
+            buckets (Tuple[float, ...]): Histogram bucket upper bounds in seconds
+        """
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {phase: Histogram(buckets) for phase in PHASES}
+        self.counters: Dict[str, int] = {
+            'sent': 0,
+            'failed': 0,
+            'retried': 0,
+            'connections': 0,
+            'bytes': 0
+        }
+        self.started = time.time()
+    
+    def observe(self, phase: str, seconds: float) -> None:
+        """
+        Record the duration of a phase.
+        
+        Args:
+            phase (str): One of PHASES
+            seconds (float): Duration
+        """
+        with self._lock:
+            self.histograms[phase].observe(seconds)
+    
+    @contextmanager
+    def timer(self, phase: str):
+        """
+        Time the enclosed block as one observation of a phase.
+        
+        Args:
+            phase (str): One of PHASES
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+    
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """
+        Add to a counter.
+        
+        Args:
+            counter (str): Counter name
+            amount (int): Amount to add
+        """
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+    
+    def merge(self, other: 'CampaignMetrics') -> None:
+        """
+        Add the metrics of another campaign or shard to these.
+        
+        Args:
+            other (CampaignMetrics): Metrics to add
+        """
+        with self._lock:
+            for phase, histogram in other.histograms.items():
+                self.histograms[phase].merge(histogram)
+            for counter, value in other.counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+            self.started = min(self.started, other.started)
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def summary(self) -> Dict:
+        """
+        Summarize the campaign for JSON output.
+        
+        Returns:
+            Dict: Counters, elapsed seconds and, per phase, the count, mean,
+                p50/p90/p99 and max in milliseconds
+        """
+        with self._lock:
+            phases = {}
+            for phase, histogram in self.histograms.items():
+                if not histogram.count:
+                    continue
+                phases[phase] = {
+                    'count': histogram.count,
+                    'mean_ms': round(histogram.sum / histogram.count * 1000, 3),
+                    'p50_ms': round(histogram.quantile(0.50) * 1000, 3),
+                    'p90_ms': round(histogram.quantile(0.90) * 1000, 3),
+                    'p99_ms': round(histogram.quantile(0.99) * 1000, 3),
+                    'max_ms': round(histogram.max * 1000, 3)
+                }
+            return {
+                'elapsed_seconds': round(time.time() - self.started, 3),
+                'counters': dict(self.counters),
+                'phases': phases
+            }
+    
+    def to_prometheus(self) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+        
+        Returns:
+            str: Exposition text
+        """
+        lines: List[str] = [
+            '# HELP email_phase_seconds Time spent in each phase of sending a message.',
+            '# TYPE email_phase_seconds histogram'
+        ]
+        with self._lock:
+            for phase, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'email_phase_seconds_bucket{{phase="{phase}",le="{le}"}} {cumulative}')
+                lines.append(f'email_phase_seconds_sum{{phase="{phase}"}} {histogram.sum:.6f}')
+                lines.append(f'email_phase_seconds_count{{phase="{phase}"}} {histogram.count}')
+            counters = dict(self.counters)
+        
+        lines += [
+            '# HELP email_messages_total Messages finished, by result.',
+            '# TYPE email_messages_total counter',
+            f'email_messages_total{{result="sent"}} {counters["sent"]}',
+            f'email_messages_total{{result="failed"}} {counters["failed"]}',
+            '# HELP email_retries_total Deliveries queued for another attempt.',
+            '# TYPE email_retries_total counter',
+            f'email_retries_total {counters["retried"]}',
+            '# HELP email_connections_total SMTP sessions opened.',
+            '# TYPE email_connections_total counter',
+            f'email_connections_total {counters["connections"]}',
+            '# HELP email_bytes_total Message bytes handed to the server.',
+            '# TYPE email_bytes_total counter',
+            f'email_bytes_total {counters["bytes"]}'
+        ]
+        return '\n'.join(lines) + '\n'
+    
+    def write_prometheus(self, path: str) -> None:
+        """
+        Write the exposition text atomically, e.g. for the node_exporter textfile collector.
+        
+        Args:
+            path (str): Output file
+        """
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(self.to_prometheus())
+        os.replace(temp_path, path)
+
+
+class MetricsServer:
+    """Serves the current metrics at /metrics over HTTP from a background thread."""
+    
+    def __init__(self, metrics_source, host: str = '127.0.0.1', port: int = 9464):
+        """
+        Initialize the server. Call start() to begin serving.
+        
+        Args:
+            metrics_source: Callable returning the CampaignMetrics to expose
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+        """
+        self.metrics_source = metrics_source
+        self.host = host
+        self.requested_port = port
+        self._server = None
+    
+    def start(self) -> 'MetricsServer':
+        """
+        Start serving in a background thread.
+        
+        Returns:
+            MetricsServer: This server
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        metrics_source = self.metrics_source
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics_source().to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._server = ThreadingHTTPServer((self.host, self.requested_port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+    
+    @property
+    def port(self) -> int:
+        """Port the server is listening on."""
+        return self._server.server_address[1]
+    
+    def stop(self) -> None:
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class CProfileHook:
+    """
+    Profiler hook that records one campaign with cProfile.
+    
+    The send workers are profiled along with the calling thread. From Python
+    3.12 a single profiler covers every thread; before that, each thread
+    started while profiling gets a profiler of its own and their stats are
+    merged into one file when profiling stops.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Initialize the hook.
+        
+        Args:
+            path (str): File the stats are written to (open with pstats or snakeviz)
+        """
+        self.path = path
+        self.profiler: Optional['cProfile.Profile'] = None
+        self._lock = threading.Lock()
+        self._thread_profilers: List['cProfile.Profile'] = []
+    
+    def start(self) -> None:
+        """Start profiling the calling thread and the threads it starts."""
+        import cProfile
+        
+        self._thread_profilers = []
+        if not PROCESS_WIDE_PROFILER:
+            threading.setprofile(self._profile_thread)
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+    
+    def _profile_thread(self, frame, event, arg) -> None:
+        """Installed in each new thread: replace itself with a profiler for that thread."""
+        import cProfile
+        
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._thread_profilers.append(profiler)
+        profiler.enable()
+    
+    def stop(self) -> None:
+        """Stop profiling and write the merged stats."""
+        if self.profiler is None:
+            return
+        if not PROCESS_WIDE_PROFILER:
+            threading.setprofile(None)
+        self.profiler.disable()
+        self.merged_stats().dump_stats(self.path)
+        self.profiler = None
+        self._thread_profilers = []
+    
+    def merged_stats(self) -> 'pstats.Stats':
+        """
+        Stats of the calling thread and the profiled threads together.
+        
+        Threads still running at this point contribute the calls finished so far.
+        
+        Returns:
+            pstats.Stats: Merged stats
+        """
+        import pstats
+        
+        stats = pstats.Stats(self.profiler)
+        with self._lock:
+            thread_profilers = list(self._thread_profilers)
+        for profiler in thread_profilers:
+            stats.add(profiler)
+        return stats
@@ -0,0 +1,310 @@
+"""
+MIME Encoding
+Chooses the smallest valid transfer encoding for each part and prepares HTML bodies for the wire.
+"""
+
+import base64
+import binascii
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, NamedTuple, Optional, Tuple
+
+# The MIME stack is imported when the first part object is built
+if TYPE_CHECKING:
+    from email.mime.nonmultipart import MIMENonMultipart
+
+
+SEVEN_BIT = '7bit'
+EIGHT_BIT = '8bit'
+QUOTED_PRINTABLE = 'quoted-printable'
+BASE64 = 'base64'
+
+# 'auto' picks the smallest valid encoding per part; 'base64' is what the email
+# package does: 7bit for ASCII text, base64 for everything else
+TRANSFER_ENCODINGS = ('auto', BASE64)
+
+# Longest line allowed in 7bit and 8bit data, without the CRLF (RFC 5322)
+MAX_LINE_LENGTH = 998
+
+# Bytes quoted-printable keeps as they are; line breaks stay hard breaks in text
+_QP_LITERAL = bytes(byte for byte in range(32, 127) if byte != ord('=')) + b'\t\n'
+
+_LINE_ENDINGS = re.compile(r'\r\n|\r')
+
+
+class EncodingPolicy(NamedTuple):
+    """How the parts of a campaign's messages are encoded."""
+    # 'auto' or 'base64', see TRANSFER_ENCODINGS
+    transfer_encoding: str = 'auto'
+    # 8bit text is allowed (the server advertises 8BITMIME)
+    allow_8bit: bool = False
+    # HTML bodies go out as multipart/alternative with a text version and minified HTML
+    html_alternative: bool = False
+
+
+def _longest_line(data: bytes) -> int:
+    """Length of the longest line in LF-separated data."""
+    return max(map(len, data.split(b'\n'))) if data else 0
+
+
+def choose_encoding(data: bytes, text: bool = True, allow_8bit: bool = False) -> str:
+    """
+    Pick the smallest transfer encoding that can carry data.
+    
+    Text that is ASCII with short lines goes as 7bit, and as 8bit when it is not
+    ASCII but 8bit is allowed. Otherwise quoted-printable is compared with
+    base64 by their encoded size: mostly-ASCII text is far smaller as
+    quoted-printable, binary data as base64.
+    
+    Args:
+        data (bytes): Payload with LF line endings
+        text (bool): Line breaks are significant (a text/* part) rather than binary data
+        allow_8bit (bool): 8bit may be used
+    
+    Returns:
+        str: '7bit', '8bit', 'quoted-printable' or 'base64'
+    """
+    if not text:
+        return BASE64
+    if b'\0' not in data and b'\r' not in data and _longest_line(data) <= MAX_LINE_LENGTH:
+        if data.isascii():
+            return SEVEN_BIT
+        if allow_8bit:
+            return EIGHT_BIT
+    escaped = len(data.translate(None, _QP_LITERAL))
+    # Each escaped byte becomes =XX; soft line breaks add three bytes per 76
+    quoted_size = (len(data) + 2 * escaped) * 79 // 76
+    base64_size = (len(data) + 2) // 3 * 4 * 78 // 76
+    return QUOTED_PRINTABLE if quoted_size <= base64_size else BASE64
+
+
+def encode_payload(data: bytes, encoding: str) -> bytes:
+    """
+    Encode a payload with LF line endings.
+    
+    Args:
+        data (bytes): Payload with LF line endings
+        encoding (str): Transfer encoding from choose_encoding()
+    
+    Returns:
+        bytes: Encoded payload with LF line endings, ending in a line break
+            for the encoded forms
+    """
+    if encoding == BASE64:
+        return base64.encodebytes(data)
+    if encoding == QUOTED_PRINTABLE:
+        return binascii.b2a_qp(data, istext=True)
+    return data
+
+
+def encode_text(text: str, policy: EncodingPolicy) -> Tuple[str, str, bytes]:
+    """
+    Encode the text of a text/* part.
+    
+    Args:
+        text (str): Text with any line endings
+        policy (EncodingPolicy): Encoding policy of the campaign
+    
+    Returns:
+        Tuple[str, str, bytes]: Charset, transfer encoding and encoded payload
+            with LF line endings
+    """
+    charset = 'us-ascii' if text.isascii() else 'utf-8'
+    if policy.transfer_encoding == BASE64:
+        # As MIMEText does it, line endings included
+        if text.isascii():
+            return charset, SEVEN_BIT, text.encode('ascii')
+        return charset, BASE64, base64.encodebytes(text.encode('utf-8'))
+    data = _LINE_ENDINGS.sub('\n', text).encode('utf-8')
+    encoding = choose_encoding(data, allow_8bit=policy.allow_8bit)
+    return charset, encoding, encode_payload(data, encoding)
+
+
+def text_part(text: str, subtype: str, policy: EncodingPolicy) -> bytes:
+    """
+    Serialize a text part the way MIMEText would, with the policy's encoding.
+    
+    Args:
+        text (str): Text of the part
+        subtype (str): 'plain' or 'html'
+        policy (EncodingPolicy): Encoding policy of the campaign
+    
+    Returns:
+        bytes: Part headers and encoded payload with CRLF line endings
+    """
+    charset, encoding, payload = encode_text(text, policy)
+    headers = (f'Content-Type: text/{subtype}; charset="{charset}"\r\n'
+               f'MIME-Version: 1.0\r\n'
+               f'Content-Transfer-Encoding: {encoding}\r\n\r\n')
+    return headers.encode('ascii') + to_crlf_bytes(payload)
+
+
+def mime_text_part(text: str, subtype: str, policy: EncodingPolicy) -> 'MIMENonMultipart':
+    """
+    Build a text part object with the policy's encoding.
+    
+    Args:
+        text (str): Text of the part
+        subtype (str): 'plain' or 'html'
+        policy (EncodingPolicy): Encoding policy of the campaign
+    
+    Returns:
+        MIMENonMultipart: Part ready to attach to a MIMEMultipart
+    """
+    from email.mime.nonmultipart import MIMENonMultipart
+    
+    charset, encoding, payload = encode_text(text, policy)
+    part = MIMENonMultipart('text', subtype, charset=charset)
+    part['Content-Transfer-Encoding'] = encoding
+    part.set_payload(payload.decode('utf-8'))
+    return part
+
+
+def encode_attachment(data: bytes, maintype: str, transfer_encoding: str = BASE64
+                      ) -> Tuple[Optional[str], str, str]:
+    """
+    Encode an attachment's content.
+    
+    Text attachments (text/*) in UTF-8 or ASCII may go as 7bit or
+    quoted-printable under the 'auto' policy; 8bit is not used for
+    attachments, which are shared with messages to servers without
+    8BITMIME. Everything else is base64.
+    
+    Args:
+        data (bytes): File content
+        maintype (str): MIME main type, e.g. 'text' or 'application'
+        transfer_encoding (str): 'auto' or 'base64'
+    
+    Returns:
+        Tuple[Optional[str], str, str]: Charset (None for binary data), transfer
+            encoding and encoded payload
+    """
+    if transfer_encoding == 'auto' and maintype == 'text':
+        try:
+            data.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+        else:
+            data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+            encoding = choose_encoding(data)
+            charset = 'us-ascii' if data.isascii() else 'utf-8'
+            return charset, encoding, encode_payload(data, encoding).decode('ascii')
+    return None, BASE64, base64.encodebytes(data).decode('ascii')
+
+
+def to_crlf_bytes(data: bytes) -> bytes:
+    """Normalize every line ending in data to CRLF."""
+    return data.replace(b'\r\n', b'\n').replace(b'\r', b'\n').replace(b'\n', b'\r\n')
+
+
+# Elements whose whitespace is significant, or that are not HTML
+_VERBATIM = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# Comments, except Outlook's conditional comments
+_COMMENT = re.compile(r'<!--(?!\[if|<!\[endif).*?-->', re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+# Block-level tags, around which whitespace is never rendered
+_BLOCK_TAG = (r'/?(?:html|head|body|meta|link|title|table|thead|tbody|tfoot|tr|td|th|div|p|ul|ol|li|'
+              r'h[1-6]|br|hr|center|blockquote|section|header|footer)\b[^>]*')
+_SPACE_AROUND_BLOCK = re.compile(rf'\s*(<{_BLOCK_TAG}>)\s*', re.IGNORECASE)
+
+
+@lru_cache(maxsize=16)
+def minify_html(source: str) -> str:
+    """
+    Remove the whitespace and comments of an HTML body that a client never renders.
+    
+    Whitespace runs become one space, or one line break when they span lines,
+    so the lines stay short enough for 7bit. Whitespace around block-level
+    tags, comments other than conditional comments, and nothing inside pre,
+    textarea, script or style is touched otherwise.
+    
+    Args:
+        source (str): HTML, possibly with template placeholders
+    
+    Returns:
+        str: Minified HTML
+    """
+    pieces = _VERBATIM.split(source)
+    minified = []
+    # split() yields text, then the verbatim element and its tag name, in turn
+    for index in range(0, len(pieces), 3):
+        text = _COMMENT.sub('', pieces[index])
+        text = _WHITESPACE.sub(lambda match: '\n' if '\n' in match.group() else ' ', text)
+        minified.append(_SPACE_AROUND_BLOCK.sub(r'\1', text))
+        if index + 1 < len(pieces):
+            minified.append(pieces[index + 1])
+    return ''.join(minified).strip()
+
+
+@lru_cache(maxsize=16)
+def html_to_text(source: str) -> str:
+    """
+    Render an HTML body as plain text for a multipart/alternative text part.
+    
+    Paragraphs, headings and table rows become lines, list items get a dash,
+    and links are followed by their address. Template placeholders are text
+    and pass through unchanged.
+    
+    Args:
+        source (str): HTML, possibly with template placeholders
+    
+    Returns:
+        str: Plain text
+    """
+    from html.parser import HTMLParser
+    
+    paragraphs = {'p', 'div', 'table', 'ul', 'ol', 'blockquote', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                  'section', 'header', 'footer', 'center'}
+    lines = {'tr', 'li', 'hr', 'pre'}
+    hidden = {'head', 'title', 'style', 'script', 'template'}
+    
+    class TextExtractor(HTMLParser):
+        def __init__(self):
+            super().__init__(convert_charrefs=True)
+            self.parts: List[str] = []
+            self.links: List[Tuple[Optional[str], int]] = []
+            self.hidden = 0
+            self.preformatted = 0
+        
+        def handle_starttag(self, tag, attrs):
+            if tag in hidden:
+                self.hidden += 1
+            elif tag == 'br':
+                self.parts.append('\n')
+            elif tag in paragraphs or tag in lines:
+                self.parts.append('\n\n' if tag in paragraphs else '\n')
+                if tag == 'li':
+                    self.parts.append('- ')
+                if tag == 'pre':
+                    self.preformatted += 1
+            elif tag in ('td', 'th'):
+                self.parts.append(' ')
+            elif tag == 'a':
+                self.links.append((dict(attrs).get('href'), len(self.parts)))
+        
+        def handle_endtag(self, tag):
+            if tag in hidden:
+                self.hidden = max(0, self.hidden - 1)
+            elif tag in paragraphs:
+                self.parts.append('\n\n')
+            elif tag == 'pre':
+                self.preformatted = max(0, self.preformatted - 1)
+                self.parts.append('\n')
+            elif tag == 'a' and self.links:
+                href, start = self.links.pop()
+                label = ''.join(self.parts[start:]).strip()
+                if href and not href.startswith('#') and href.replace('mailto:', '') != label:
+                    self.parts.append(f' ({href})' if label else href)
+        
+        def handle_data(self, data):
+            if self.hidden:
+                return
+            if not self.preformatted:
+                data = _WHITESPACE.sub(' ', data)
+            self.parts.append(data)
+    
+    extractor = TextExtractor()
+    extractor.feed(source)
+    extractor.close()
+    text = '\n'.join(line.strip() for line in ''.join(extractor.parts).split('\n'))
+    return re.sub(r'\n{3,}', '\n\n', text).strip() + '\n'
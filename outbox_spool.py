@@ -0,0 +1,263 @@
+"""
+Outbox Spool
+On-disk spool of rendered messages, written by the render stage and streamed to SMTP by the sender.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+
+# Rendered messages, back to back; the index holds one JSON line per message
+MESSAGES_FILE = 'messages.seg'
+INDEX_FILE = 'index.jsonl'
+# Written once every message has been rendered
+MANIFEST_FILE = 'manifest.json'
+
+
+class SpoolEntry(NamedTuple):
+    """One spooled message and the recipients it is addressed to."""
+    sequence: int
+    offset: int
+    length: int
+    recipients: List[Dict[str, str]]
+
+
+class OutboxSpool:
+    """
+    Append-only spool of finished RFC 5322 messages.
+    
+    Messages are appended to one segment file and indexed by offset, so a
+    campaign can be rendered well before it is sent and the sender only
+    copies bytes to the SMTP sessions. Each index line is written after its
+    message, so a spool cut off while rendering never points past its data.
+    """
+    
+    def __init__(self, path: str, mode: str = 'r'):
+        """
+        Open a spool directory.
+        
+        Args:
+            path (str): Spool directory
+            mode (str): 'w' to render a new spool (replacing any spool in the
+                directory), 'r' to send an existing one
+        
+        Raises:
+            ValueError: If the mode is unknown
+            FileNotFoundError: If mode is 'r' and the directory holds no spool
+        """
+        if mode not in ('r', 'w'):
+            raise ValueError(f"Spool mode must be 'r' or 'w', not '{mode}'")
+        self.path = path
+        self.mode = mode
+        self.manifest: Dict = {}
+        self.messages = 0
+        self.recipients = 0
+        self._size = 0
+        self._messages_file = None
+        self._index_file = None
+        self._reader = None
+        self._read_lock = threading.Lock()
+        
+        if mode == 'w':
+            os.makedirs(path, exist_ok=True)
+            # The manifest goes first, so a half-replaced spool is never taken as complete
+            for name in (MANIFEST_FILE, INDEX_FILE, MESSAGES_FILE):
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._messages_file = open(self._file(MESSAGES_FILE), 'wb')
+            self._index_file = open(self._file(INDEX_FILE), 'w', encoding='utf-8')
+        else:
+            if not os.path.isfile(self._file(INDEX_FILE)):
+                raise FileNotFoundError(f"No outbox spool in {path}")
+            if os.path.isfile(self._file(MANIFEST_FILE)):
+                with open(self._file(MANIFEST_FILE), 'r', encoding='utf-8') as file:
+                    self.manifest = json.load(file)
+                self.messages = self.manifest.get('messages', 0)
+                self.recipients = self.manifest.get('recipients', 0)
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    @property
+    def complete(self) -> bool:
+        """True once every message of the campaign has been rendered into the spool."""
+        return bool(self.manifest.get('complete'))
+    
+    def append(self, recipients: List[Dict[str, str]], message: bytes) -> SpoolEntry:
+        """
+        Add a rendered message.
+        
+        Args:
+            recipients (List[Dict[str, str]]): Recipients the message is sent to
+                (their 'name' and 'email' are kept)
+            message (bytes): Message with CRLF line endings
+        
+        Returns:
+            SpoolEntry: Entry for reading the message back
+        """
+        entry = SpoolEntry(self.messages, self._size, len(message),
+                           [{'name': r['name'], 'email': r['email']} for r in recipients])
+        self._messages_file.write(message)
+        # The sender reads messages back while the spool is still being written
+        self._messages_file.flush()
+        self._index_file.write(json.dumps([entry.offset, entry.length, entry.recipients]) + '\n')
+        self._size += entry.length
+        self.messages += 1
+        self.recipients += len(entry.recipients)
+        return entry
+    
+    def finish(self, **details) -> None:
+        """
+        Mark the spool complete and close it for writing.
+        
+        Args:
+            **details: Campaign details stored in the manifest, such as
+                campaign_id and email_data
+        """
+        self._index_file.flush()
+        os.fsync(self._index_file.fileno())
+        os.fsync(self._messages_file.fileno())
+        self.manifest = dict(details, complete=True, messages=self.messages,
+                             recipients=self.recipients, created_at=time.time())
+        temporary = self._file(MANIFEST_FILE + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(temporary, self._file(MANIFEST_FILE))
+        self._close_writer()
+    
+    def entries(self) -> Iterator[SpoolEntry]:
+        """
+        Read the index.
+        
+        Yields:
+            SpoolEntry: Every message whose data was written completely
+        """
+        size = os.path.getsize(self._file(MESSAGES_FILE))
+        with open(self._file(INDEX_FILE), 'r', encoding='utf-8') as file:
+            for sequence, line in enumerate(file):
+                try:
+                    offset, length, recipients = json.loads(line)
+                except ValueError:
+                    # Last line of a spool cut off while rendering
+                    return
+                if offset + length > size:
+                    return
+                yield SpoolEntry(sequence, offset, length, recipients)
+    
+    def read(self, entry: SpoolEntry) -> bytes:
+        """
+        Read a spooled message. Safe to call from several threads.
+        
+        Args:
+            entry (SpoolEntry): Entry from append() or entries()
+        
+        Returns:
+            bytes: Rendered message
+        """
+        with self._read_lock:
+            if self._reader is None:
+                self._reader = open(self._file(MESSAGES_FILE), 'rb')
+            self._reader.seek(entry.offset)
+            message = self._reader.read(entry.length)
+        if len(message) != entry.length:
+            raise OSError(f"Outbox spool {self.path} is truncated at message {entry.sequence}")
+        return message
+    
+    def _close_writer(self) -> None:
+        for file in (self._messages_file, self._index_file):
+            if file is not None:
+                file.close()
+        self._messages_file = self._index_file = None
+    
+    def close(self) -> None:
+        """Close the spool files; an unfinished spool stays incomplete."""
+        self._close_writer()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class RenderStage:
+    """
+    Render messages into a spool on a background thread.
+    
+    Entries are handed to the sender through a bounded queue, so rendering
+    runs ahead of the SMTP sessions by at most queue_size messages and a slow
+    server never stalls the CPU work (nor the reverse).
+    """
+    
+    _DONE = object()
+    
+    def __init__(self, batches: Iterable[List[Dict[str, str]]], render: Callable[[List[Dict[str, str]]], bytes],
+                 spool: OutboxSpool, queue_size: int = 256):
+        """
+        Initialize the stage.
+        
+        Args:
+            batches (Iterable[List[Dict[str, str]]]): Recipients of each message
+            render (Callable[[List[Dict[str, str]]], bytes]): Renders the message for a batch
+            spool (OutboxSpool): Spool opened for writing
+            queue_size (int): Rendered messages waiting for the sender at most
+        """
+        self.batches = batches
+        self.render = render
+        self.spool = spool
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _put(self, item) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _run(self) -> None:
+        try:
+            for batch in self.batches:
+                entry = self.spool.append(batch, self.render(batch))
+                if not self._put(entry):
+                    return
+        except BaseException as e:
+            self._put(e)
+            return
+        self._put(self._DONE)
+    
+    def __iter__(self) -> Iterator[SpoolEntry]:
+        """
+        Start rendering and yield entries as they are spooled.
+        
+        Raises:
+            Exception: Whatever the render thread raised
+        """
+        self._thread = threading.Thread(target=self._run, name='outbox-render', daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._DONE:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            self.close()
+    
+    def close(self) -> None:
+        """Stop rendering, e.g. when the sender gives up early."""
+        self._stopped.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
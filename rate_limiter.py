@@ -0,0 +1,188 @@
+"""
+Rate Limiter
+Token-bucket rate limiting with per-provider profiles and adaptive backoff.
+"""
+
+import smtplib
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+# Sending limits for the providers in EmailAutomationTool.smtp_config
+PROVIDER_RATE_LIMITS = {
+    'gmail': {
+        'messages_per_second': 2.0,
+        'messages_per_day': 500,
+        'burst': 10
+    },
+    'outlook': {
+        'messages_per_second': 0.5,
+        'messages_per_day': 300,
+        'burst': 5
+    },
+    'default': {
+        'messages_per_second': 1.0,
+        'messages_per_day': 0,
+        'burst': 1
+    }
+}
+
+# 4xx replies servers use to ask the client to slow down
+THROTTLING_CODES = (421, 450, 451, 452, 454)
+
+
+def get_rate_profile(provider: str, overrides: Optional[Dict] = None,
+                     delay_between_emails: float = 0) -> Dict:
+    """
+    Build the rate profile for a provider.
+    
+    Args:
+        provider (str): Provider name, e.g. 'gmail' or 'outlook'
+        overrides (Optional[Dict]): Profile keys to replace
+        delay_between_emails (float): Minimum seconds between messages (0 = no minimum)
+    
+    Returns:
+        Dict: messages_per_second, messages_per_day and burst
+    """
+    profile = dict(PROVIDER_RATE_LIMITS.get(provider, PROVIDER_RATE_LIMITS['default']))
+    profile.update(overrides or {})
+    if delay_between_emails:
+        profile['messages_per_second'] = min(profile['messages_per_second'], 1.0 / delay_between_emails)
+        profile['burst'] = 1
+    return profile
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """
+    Check whether an SMTP error is a temporary throttling reply.
+    
+    Args:
+        error (Exception): Error raised while sending
+    
+    Returns:
+        bool: True for 4xx throttling codes
+    """
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code in THROTTLING_CODES
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(code in THROTTLING_CODES for code, _ in error.recipients.values())
+    return False
+
+
+class TokenBucketRateLimiter:
+    """Thread-safe token bucket shared by all send workers."""
+    
+    def __init__(self, messages_per_second: float, burst: int = 1, messages_per_day: int = 0,
+                 backoff_factor: float = 0.5, min_rate: float = 0.05, recovery_step: float = 0.05,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """
+        Initialize the limiter with a full bucket.
+        
+        Args:
+            messages_per_second (float): Sustained sending rate
+            burst (int): Messages that may be sent back to back
+            messages_per_day (int): Daily quota (0 = unlimited)
+            backoff_factor (float): Rate multiplier applied on each throttling reply
+            min_rate (float): Lowest rate backoff may reach
+            recovery_step (float): Fraction of the base rate regained per successful send
+            clock (Callable[[], float]): Monotonic time source
+            sleep (Callable[[float], None]): Sleep function
+        """
+        if messages_per_second <= 0:
+            raise ValueError("messages_per_second must be positive")
+        
+        self.base_rate = messages_per_second
+        self.rate = messages_per_second
+        self.burst = max(1, burst)
+        self.messages_per_day = messages_per_day
+        self.backoff_factor = backoff_factor
+        self.min_rate = min(min_rate, messages_per_second)
+        self.recovery_step = recovery_step
+        self.clock = clock
+        self.sleep = sleep
+        
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._day_started = clock()
+        self._sent_today = 0
+        self.throttled = 0
+    
+    @classmethod
+    def for_provider(cls, provider: str, overrides: Optional[Dict] = None,
+                     delay_between_emails: float = 0, **kwargs) -> 'TokenBucketRateLimiter':
+        """
+        Create a limiter from a provider profile.
+        
+        Args:
+            provider (str): Provider name, e.g. 'gmail' or 'outlook'
+            overrides (Optional[Dict]): Profile keys to replace
+            delay_between_emails (float): Minimum seconds between messages (0 = no minimum)
+        
+        Returns:
+            TokenBucketRateLimiter: Configured limiter
+        """
+        profile = get_rate_profile(provider, overrides, delay_between_emails)
+        return cls(
+            profile['messages_per_second'],
+            burst=profile['burst'],
+            messages_per_day=profile['messages_per_day'],
+            **kwargs
+        )
+    
+    def _refill(self, now: float) -> None:
+        """Add the tokens earned since the last update and roll over the daily count."""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if now - self._day_started >= 86400:
+            self._day_started = now
+            self._sent_today = 0
+    
+    def acquire(self, count: int = 1) -> bool:
+        """
+        Wait until a message may be sent.
+        
+        Args:
+            count (int): Messages (recipients) to take from the bucket and the quota
+        
+        Returns:
+            bool: False if the daily quota has fewer than count messages left, True otherwise
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            if self.messages_per_day and self._sent_today + count > self.messages_per_day:
+                return False
+            self._sent_today += count
+            # Reserve tokens now; a negative balance is the wait for our turn
+            self._tokens -= count
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        
+        if wait > 0:
+            self.sleep(wait)
+        return True
+    
+    def report_success(self) -> None:
+        """Let the rate recover towards the profile rate after a successful send."""
+        with self._lock:
+            if self.rate < self.base_rate:
+                self._refill(self.clock())
+                self.rate = min(self.base_rate, self.rate + self.base_rate * self.recovery_step)
+    
+    def report_throttled(self) -> None:
+        """Cut the rate and drain the bucket after the server asked us to slow down."""
+        with self._lock:
+            self._refill(self.clock())
+            self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+            self._tokens = min(self._tokens, 0.0)
+            self.throttled += 1
+    
+    @property
+    def remaining_today(self) -> Optional[int]:
+        """Messages left in today's quota, or None when unlimited."""
+        if not self.messages_per_day:
+            return None
+        with self._lock:
+            self._refill(self.clock())
+            return max(0, self.messages_per_day - self._sent_today)
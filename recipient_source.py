@@ -0,0 +1,244 @@
+"""
+Recipient Source
+Streams recipients lazily from CSV, JSON or JSON Lines files.
+"""
+
+import csv
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
+
+
+SUPPORTED_FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl'
+}
+
+# Number of invalid rows kept for reporting; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# Columns mapped onto the 'name' and 'email' keys of every recipient
+RESERVED_COLUMNS = ('name', 'Name', 'email', 'Email')
+
+CHUNK_SIZE = 64 * 1024
+
+# Largest JSON array element accepted, in characters; a recipient is far smaller
+MAX_ELEMENT_SIZE = 16 * 1024 * 1024
+
+# Farthest back from the end of the text a decode error points when the text is
+# only cut short, e.g. at the start of '-Infinit'
+TRUNCATION_MARGIN = 16
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def _may_be_truncated(error: json.JSONDecodeError, length: int) -> bool:
+    """Whether a decode error may go away once more text is read, rather than being bad JSON."""
+    return error.msg.startswith('Unterminated string') or length - error.pos <= TRUNCATION_MARGIN
+
+
+def _check_csv_header(fieldnames: Optional[List[str]]) -> None:
+    """Raise ValueError unless a CSV header has the 'Name' and 'Email' columns."""
+    if not fieldnames or 'Name' not in fieldnames or 'Email' not in fieldnames:
+        raise ValueError("CSV file must contain 'Name' and 'Email' columns")
+
+
+class RecipientSource:
+    """Re-iterable, constant-memory stream of recipients from a file."""
+    
+    def __init__(self, file_path: str):
+        """
+        Initialize the source. Only the CSV header or the start of a JSON
+        document is read now; rows are read as iteration goes.
+        
+        Args:
+            file_path (str): Path to a .csv, .json, .jsonl or .ndjson file
+        
+        Raises:
+            FileNotFoundError: If the file does not exist
+            ValueError: If the file format is not supported, the CSV file lacks
+                the 'Name' and 'Email' columns or the JSON file is not a list
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension not in SUPPORTED_FORMATS:
+            raise ValueError("Unsupported file format. Please use CSV, JSON or JSON Lines files.")
+        
+        self.file_path = file_path
+        self.format = SUPPORTED_FORMATS[extension]
+        self.errors: List[Tuple[int, str]] = []
+        self.invalid_rows = 0
+        self.valid_rows = 0
+        self._check_structure()
+    
+    def _check_structure(self) -> None:
+        """Fail on a file that cannot hold recipients before any row is sent."""
+        with open(self.file_path, 'r', newline='', encoding='utf-8') as file:
+            if self.format == 'csv':
+                _check_csv_header(csv.DictReader(file).fieldnames)
+            elif self.format == 'json':
+                while True:
+                    chunk = file.read(CHUNK_SIZE)
+                    start = chunk.lstrip(' \t\n\r')[:1]
+                    if start or not chunk:
+                        break
+                if start != '[':
+                    raise ValueError("JSON file must contain a list of recipients")
+    
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        """
+        Yield valid recipients, recording invalid rows as they are found.
+        
+        Yields:
+            Dict[str, str]: Recipient with 'name', 'email' and any other columns
+        
+        Raises:
+            ValueError: If the file structure itself is invalid (missing CSV
+                columns, malformed JSON document)
+        """
+        self.errors = []
+        self.invalid_rows = 0
+        self.valid_rows = 0
+        
+        with open(self.file_path, 'r', newline='', encoding='utf-8') as file:
+            if self.format == 'csv':
+                rows = self._iter_csv(file)
+            elif self.format == 'json':
+                rows = self._iter_json_array(file)
+            else:
+                rows = self._iter_json_lines(file)
+            
+            for line_number, row in rows:
+                recipient = self._validate(line_number, row)
+                if recipient is not None:
+                    self.valid_rows += 1
+                    yield recipient
+    
+    def _record_error(self, line_number: int, reason: str) -> None:
+        """Count an invalid row and keep its details if there is room."""
+        self.invalid_rows += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_number, reason))
+    
+    def _validate(self, line_number: int, row) -> Optional[Dict[str, str]]:
+        """Normalize one parsed row, or record why it was rejected."""
+        if not isinstance(row, dict):
+            self._record_error(line_number, "Row is not an object")
+            return None
+        
+        name = row.get('name', row.get('Name'))
+        email = row.get('email', row.get('Email'))
+        if not isinstance(name, str) or not isinstance(email, str):
+            self._record_error(line_number, "Missing 'name' or 'email'")
+            return None
+        
+        email = email.strip()
+        if not email:
+            self._record_error(line_number, "Empty email address")
+            return None
+        
+        recipient = {'name': name.strip(), 'email': email}
+        # Keep any other columns so templates can use them as fields
+        for key, value in row.items():
+            if key not in RESERVED_COLUMNS and key is not None and value is not None:
+                recipient[key] = value.strip() if isinstance(value, str) else value
+        return recipient
+    
+    def _iter_csv(self, file: TextIO) -> Iterator[Tuple[int, Dict]]:
+        """Yield (line number, row) pairs from a CSV file."""
+        reader = csv.DictReader(file)
+        _check_csv_header(reader.fieldnames)
+        
+        line_number = reader.line_num
+        for row in reader:
+            # line_num is the last physical line read; report where the row starts
+            yield line_number + 1, row
+            line_number = reader.line_num
+    
+    def _iter_json_lines(self, file: TextIO) -> Iterator[Tuple[int, Dict]]:
+        """Yield (line number, object) pairs from a JSON Lines file."""
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                self._record_error(line_number, f"Invalid JSON: {e.msg}")
+    
+    def _iter_json_array(self, file: TextIO) -> Iterator[Tuple[int, Dict]]:
+        """
+        Yield (line number, element) pairs from a top-level JSON array.
+        
+        The document is decoded one element at a time from a sliding buffer, so
+        only the element being parsed is held in memory.
+        """
+        decoder = json.JSONDecoder()
+        buffer = ''
+        pos = 0
+        line_number = 1
+        eof = False
+        
+        def fill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                eof = True
+                return False
+            # Drop the text already consumed before appending the next chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return True
+        
+        def skip_whitespace() -> None:
+            nonlocal pos, line_number
+            while True:
+                end = WHITESPACE.match(buffer, pos).end()
+                line_number += buffer.count('\n', pos, end)
+                pos = end
+                if pos < len(buffer) or not fill():
+                    return
+        
+        skip_whitespace()
+        if buffer[pos:pos + 1] != '[':
+            raise ValueError("JSON file must contain a list of recipients")
+        pos += 1
+        
+        expect_element = True
+        while True:
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise ValueError(f"Unexpected end of JSON file at line {line_number}")
+            if buffer[pos] == ']':
+                return
+            if not expect_element:
+                if buffer[pos] != ',':
+                    raise ValueError(f"Expected ',' or ']' in JSON file at line {line_number}")
+                pos += 1
+                expect_element = True
+                continue
+            
+            while True:
+                try:
+                    element, end = decoder.raw_decode(buffer, pos)
+                    # A value that runs to the end of the buffer may be truncated
+                    if end < len(buffer) or eof:
+                        break
+                except json.JSONDecodeError as e:
+                    # An error well before the end of the buffer is not cured by reading on
+                    if eof or not _may_be_truncated(e, len(buffer)):
+                        error_line = line_number + buffer.count('\n', pos, e.pos)
+                        raise ValueError(f"Invalid JSON at line {error_line}: {e.msg}")
+                if len(buffer) - pos > MAX_ELEMENT_SIZE:
+                    raise ValueError(f"JSON element at line {line_number} is larger than "
+                                     f"{MAX_ELEMENT_SIZE} characters")
+                fill()
+            
+            yield line_number, element
+            line_number += buffer.count('\n', pos, end)
+            pos = end
+            expect_element = False
@@ -0,0 +1,378 @@
+"""
+Recipient Store
+Compact, random-access recipient lists kept in columnar arrays or in a memory-mapped file.
+"""
+
+import json
+import mmap
+from array import array
+from collections.abc import Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+
+# Offsets written to the index file at once by MappedRecipientStore
+INDEX_BATCH_SIZE = 8192
+
+# Set on a PackedColumn end offset when the row has no value (as opposed to an empty one)
+MISSING = 1 << 63
+
+
+def _text(value) -> Optional[str]:
+    """
+    Store values as text; templates render them as text anyway.
+    
+    An empty value stays '' rather than missing, so its placeholder renders as nothing.
+    """
+    if value is None:
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+class InternedColumn:
+    """Column of repeated values: each distinct value is stored once and rows hold 4-byte codes."""
+    
+    __slots__ = ('values', 'codes', '_lookup')
+    
+    def __init__(self, rows: int = 0):
+        """
+        Initialize a column whose first rows are missing.
+        
+        Args:
+            rows (int): Rows already in the store
+        """
+        self.values: List[Optional[str]] = [None]
+        self._lookup: Dict[str, int] = {}
+        self.codes = array('I', bytes(4 * rows))
+    
+    def append(self, value: Optional[str]) -> None:
+        if value is None:
+            self.codes.append(0)
+            return
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self._lookup[value] = code
+        self.codes.append(code)
+    
+    def get(self, row: int) -> Optional[str]:
+        return self.values[self.codes[row]]
+    
+    def __iter__(self) -> Iterator[Optional[str]]:
+        return map(self.values.__getitem__, self.codes)
+    
+    @property
+    def distinct(self) -> int:
+        """Number of distinct values."""
+        return len(self.values) - 1
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used, in bytes."""
+        # Each distinct string, its list and dict slots, and the row codes
+        strings = sum(len(value) + 50 for value in self.values[1:])
+        return strings + 8 * len(self.values) + 100 * len(self._lookup) + self.codes.itemsize * len(self.codes)
+
+
+class PackedColumn:
+    """Column of mostly distinct values stored back to back as UTF-8, with an end offset per row."""
+    
+    __slots__ = ('data', 'offsets')
+    
+    def __init__(self, rows: int = 0):
+        """
+        Initialize a column whose first rows are missing.
+        
+        Args:
+            rows (int): Rows already in the store
+        """
+        self.data = bytearray()
+        self.offsets = array('Q', [0]) + array('Q', [MISSING]) * rows
+    
+    def append(self, value: Optional[str]) -> None:
+        if value is None:
+            self.offsets.append(len(self.data) | MISSING)
+            return
+        self.data += value.encode('utf-8')
+        self.offsets.append(len(self.data))
+    
+    def get(self, row: int) -> Optional[str]:
+        end = self.offsets[row + 1]
+        if end & MISSING:
+            return None
+        return self.data[self.offsets[row] & ~MISSING:end].decode('utf-8')
+    
+    def __iter__(self) -> Iterator[Optional[str]]:
+        data, offsets = self.data, self.offsets
+        for row in range(len(offsets) - 1):
+            end = offsets[row + 1]
+            yield None if end & MISSING else data[offsets[row] & ~MISSING:end].decode('utf-8')
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used, in bytes."""
+        return len(self.data) + self.offsets.itemsize * len(self.offsets)
+
+
+class RecipientStore(Sequence):
+    """
+    In-memory recipient list with a few dozen bytes per recipient instead of a dict each.
+    
+    Every column is held separately. Columns with repeated values (company,
+    city, plan) keep each distinct value once; columns of mostly distinct
+    values (email, name) are packed into one UTF-8 buffer. Recipients are
+    rebuilt as dicts when they are read, so the store can be used wherever a
+    list of recipients is expected.
+    """
+    
+    # Rows seen before deciding whether a column is better packed than interned;
+    # the check is repeated each time the store doubles
+    INTERN_SAMPLE_ROWS = 1024
+    
+    def __init__(self, recipients: Iterable[Dict[str, str]] = ()):
+        """
+        Initialize the store.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to add
+        """
+        self.columns: Dict[str, Union[InternedColumn, PackedColumn]] = {
+            'name': PackedColumn(),
+            'email': PackedColumn()
+        }
+        self._rows = 0
+        self._next_check = self.INTERN_SAMPLE_ROWS
+        self.extend(recipients)
+    
+    def append(self, recipient: Dict[str, str]) -> None:
+        """
+        Add a recipient. Values are stored as text; None values are dropped.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient with 'name', 'email' and any other fields
+        """
+        columns = self.columns
+        for key in recipient.keys() - columns.keys():
+            if key is not None and _text(recipient[key]) is not None:
+                columns[key] = InternedColumn(self._rows)
+        for key, column in columns.items():
+            column.append(_text(recipient.get(key)))
+        self._rows += 1
+        if self._rows >= self._next_check:
+            self._pack_distinct_columns()
+            self._next_check *= 2
+    
+    def extend(self, recipients: Iterable[Dict[str, str]]) -> None:
+        """
+        Add several recipients.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to add
+        """
+        for recipient in recipients:
+            self.append(recipient)
+    
+    def _pack_distinct_columns(self) -> None:
+        """Convert interned columns whose values are mostly distinct to packed columns."""
+        for key, column in self.columns.items():
+            if isinstance(column, InternedColumn) and column.distinct > self._rows // 2:
+                packed = PackedColumn()
+                for code in column.codes:
+                    packed.append(column.values[code])
+                self.columns[key] = packed
+    
+    def __len__(self) -> int:
+        return self._rows
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._rows))]
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("recipient index out of range")
+        recipient = {}
+        for key, column in self.columns.items():
+            value = column.get(index)
+            if value is not None:
+                recipient[key] = value
+        recipient.setdefault('name', '')
+        recipient.setdefault('email', '')
+        return recipient
+    
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        # Walk every column in step rather than indexing each row
+        keys = tuple(self.columns)
+        for values in zip(*self.columns.values()):
+            recipient = {key: value for key, value in zip(keys, values) if value is not None}
+            recipient.setdefault('name', '')
+            recipient.setdefault('email', '')
+            yield recipient
+    
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory used by the columns, in bytes."""
+        return sum(column.nbytes for column in self.columns.values())
+
+
+class MappedRecipientStore(Sequence):
+    """
+    Recipient list kept in a temporary file and read through mmap, for lists larger than RAM.
+    
+    Each recipient is one JSON line; a second file holds the offset of every
+    line, so memory use stays constant however many recipients are added and
+    the operating system pages data in and out as needed.
+    """
+    
+    def __init__(self, recipients: Iterable[Dict[str, str]] = (), directory: Optional[str] = None):
+        """
+        Initialize the store.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to add
+            directory (Optional[str]): Directory for the temporary files (system
+                default when omitted); they are deleted when the store is closed
+        """
+        import tempfile
+        
+        self.columns: List[str] = ['name', 'email']
+        self._column_index = {key: position for position, key in enumerate(self.columns)}
+        self._data = tempfile.TemporaryFile(prefix='recipients-', suffix='.jsonl', dir=directory)
+        self._index = tempfile.TemporaryFile(prefix='recipients-', suffix='.idx', dir=directory)
+        self._pending = array('Q', [0])
+        self._size = 0
+        self._rows = 0
+        self._mapped_rows = 0
+        self._data_map: Optional[mmap.mmap] = None
+        self._index_map: Optional[mmap.mmap] = None
+        self._offsets = None
+        self.extend(recipients)
+    
+    def append(self, recipient: Dict[str, str]) -> None:
+        """
+        Add a recipient. Values are stored as text; None values are dropped.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient with 'name', 'email' and any other fields
+        """
+        values = [None] * len(self.columns)
+        for key, value in recipient.items():
+            value = _text(value)
+            if key is None or value is None:
+                continue
+            position = self._column_index.get(key)
+            if position is None:
+                position = self._column_index[key] = len(self.columns)
+                self.columns.append(key)
+                values.append(None)
+            values[position] = value
+        line = json.dumps(values, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+        self._data.write(line)
+        self._size += len(line)
+        self._pending.append(self._size)
+        self._rows += 1
+        if len(self._pending) >= INDEX_BATCH_SIZE:
+            self._flush_index()
+    
+    def extend(self, recipients: Iterable[Dict[str, str]]) -> None:
+        """
+        Add several recipients.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to add
+        """
+        for recipient in recipients:
+            self.append(recipient)
+    
+    def _flush_index(self) -> None:
+        self._pending.tofile(self._index)
+        self._pending = array('Q')
+    
+    def _map(self) -> None:
+        """Map the files, again if recipients were added since the last read."""
+        self._flush_index()
+        self._data.flush()
+        self._index.flush()
+        self._unmap()
+        self._index_map = mmap.mmap(self._index.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = memoryview(self._index_map).cast('Q')
+        if self._size:
+            self._data_map = mmap.mmap(self._data.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mapped_rows = self._rows
+    
+    def _unmap(self) -> None:
+        if self._offsets is not None:
+            self._offsets.release()
+            self._offsets = None
+        for mapped in (self._data_map, self._index_map):
+            if mapped is not None:
+                mapped.close()
+        self._data_map = self._index_map = None
+    
+    def __len__(self) -> int:
+        return self._rows
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._rows))]
+        if index < 0:
+            index += self._rows
+        if not 0 <= index < self._rows:
+            raise IndexError("recipient index out of range")
+        if index >= self._mapped_rows:
+            self._map()
+        values = json.loads(self._data_map[self._offsets[index]:self._offsets[index + 1]])
+        recipient = {key: value for key, value in zip(self.columns, values) if value is not None}
+        recipient.setdefault('name', '')
+        recipient.setdefault('email', '')
+        return recipient
+    
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for index in range(self._rows):
+            yield self[index]
+    
+    @property
+    def nbytes(self) -> int:
+        """Bytes used in memory; the recipients themselves live in the mapped files."""
+        return self._pending.itemsize * len(self._pending)
+    
+    def close(self) -> None:
+        """Unmap and delete the temporary files."""
+        self._unmap()
+        self._data.close()
+        self._index.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def __getstate__(self):
+        raise TypeError("MappedRecipientStore cannot be pickled; iterate it into a RecipientStore instead")
+
+
+def create_recipient_store(mode: str, recipients: Iterable[Dict[str, str]] = (),
+                           directory: Optional[str] = None) -> Sequence:
+    """
+    Create the recipient list for the configured storage mode.
+    
+    Args:
+        mode (str): 'compact' (columnar, in memory), 'mmap' (temporary file) or
+            'list' (plain list of dicts)
+        recipients (Iterable[Dict[str, str]]): Recipients to add
+        directory (Optional[str]): Directory for the temporary files of 'mmap'
+    
+    Returns:
+        Sequence: Random-access recipient list
+    
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode == 'compact':
+        return RecipientStore(recipients)
+    if mode == 'mmap':
+        return MappedRecipientStore(recipients, directory)
+    if mode == 'list':
+        return list(recipients)
+    raise ValueError(f"Unknown recipient store '{mode}' (use 'compact', 'mmap' or 'list')")
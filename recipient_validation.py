@@ -0,0 +1,361 @@
+"""
+Recipient Validation
+Normalizes, deduplicates and checks recipient addresses before sending.
+"""
+
+import csv
+import hashlib
+import re
+import socket
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+try:
+    import dns.resolver
+except ImportError:
+    dns = None
+
+
+# Dot-atom local part; any non-ASCII character is allowed too (RFC 6531, sent with SMTPUTF8)
+_ATEXT = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~\u0080-\U0010FFFF-]"
+LOCAL_PART_PATTERN = re.compile(rf"^{_ATEXT}+(\.{_ATEXT}+)*$")
+# Checked against the ASCII (IDNA) form of the domain
+DOMAIN_PATTERN = re.compile(r'^([A-Za-z0-9]([A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+([A-Za-z]{2,63}|xn--[A-Za-z0-9-]{1,59})$')
+
+# Reasons a recipient is filtered out
+INVALID_SYNTAX = 'invalid_syntax'
+DUPLICATE = 'duplicate'
+SUPPRESSED = 'suppressed'
+BAD_DOMAIN = 'bad_domain'
+
+
+def normalize_address(address: str) -> str:
+    """
+    Normalize an address for sending and comparison.
+    
+    Surrounding whitespace, angle brackets and a mailto: prefix are removed,
+    the domain is lower-cased and non-ASCII text is put in Unicode NFC form,
+    so differently composed spellings compare equal.
+    
+    Args:
+        address (str): Address as found in the recipients file
+    
+    Returns:
+        str: Normalized address
+    """
+    address = address.strip()
+    if address.lower().startswith('mailto:'):
+        address = address[7:]
+    address = address.strip('<> ')
+    if not address.isascii():
+        address = unicodedata.normalize('NFC', address)
+    local, at, domain = address.rpartition('@')
+    if not at:
+        return address
+    return f"{local}@{domain.lower()}"
+
+
+def ascii_domain(domain: str) -> Optional[str]:
+    """
+    Convert an internationalized domain to its ASCII (IDNA) form for DNS and syntax checks.
+    
+    Args:
+        domain (str): Domain, e.g. 'bücher.example'
+    
+    Returns:
+        Optional[str]: ASCII domain, e.g. 'xn--bcher-kva.example', or None if
+            the domain cannot be encoded
+    """
+    if domain.isascii():
+        return domain
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return None
+
+
+def is_valid_address(address: str) -> bool:
+    """
+    Check the syntax of a normalized address.
+    
+    Internationalized addresses are accepted: UTF-8 local parts (RFC 6531)
+    and IDN domains, which are checked in their IDNA form.
+    
+    Args:
+        address (str): Normalized address
+    
+    Returns:
+        bool: True for addresses of the form local@domain.tld within RFC 5321 limits
+    """
+    local, at, domain = address.rpartition('@')
+    domain = ascii_domain(domain)
+    if not at or not local or domain is None:
+        return False
+    # Limits are in octets of the UTF-8 form
+    local_length = len(local.encode('utf-8'))
+    if local_length > 64 or local_length + 1 + len(domain) > 254:
+        return False
+    return bool(LOCAL_PART_PATTERN.match(local)) and bool(DOMAIN_PATTERN.match(domain))
+
+
+def fingerprint(address: str) -> int:
+    """
+    Hash an address to a non-zero 64-bit fingerprint, ignoring case.
+    
+    Args:
+        address (str): Normalized address
+    
+    Returns:
+        int: Fingerprint in the range 1..2**64-1
+    """
+    digest = hashlib.blake2b(address.lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class FingerprintSet:
+    """
+    Open-addressing set of 64-bit fingerprints stored in a flat array (8 bytes per slot).
+    
+    Compact rather than bounded: the table doubles as entries are added, so it
+    takes about 11 to 23 bytes per distinct address, a fraction of a set of strings.
+    """
+    
+    def __init__(self, expected: int = 1024, max_load: float = 0.7):
+        """
+        Initialize an empty set.
+        
+        Args:
+            expected (int): Number of entries to size the table for
+            max_load (float): Fill ratio at which the table doubles
+        """
+        capacity = 16
+        while capacity * max_load < expected:
+            capacity *= 2
+        self.max_load = max_load
+        self._slots = array('Q', bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes used by the slot table."""
+        return len(self._slots) * self._slots.itemsize
+    
+    def _find(self, value: int) -> int:
+        """Index of the slot holding value, or of the empty slot where it belongs."""
+        slots = self._slots
+        mask = self._mask
+        index = value & mask
+        while True:
+            current = slots[index]
+            if current == value or current == 0:
+                return index
+            index = (index + 1) & mask
+    
+    def __contains__(self, value: int) -> bool:
+        return self._slots[self._find(value)] == value
+    
+    def __iter__(self) -> Iterator[int]:
+        return filter(None, self._slots)
+    
+    def add(self, value: int) -> bool:
+        """
+        Add a fingerprint.
+        
+        Args:
+            value (int): Non-zero 64-bit fingerprint
+        
+        Returns:
+            bool: True if it was not already present
+        """
+        index = self._find(value)
+        if self._slots[index] == value:
+            return False
+        self._slots[index] = value
+        self._size += 1
+        if self._size > len(self._slots) * self.max_load:
+            self._grow()
+        return True
+    
+    def _grow(self) -> None:
+        """Double the table and re-insert every fingerprint."""
+        old_slots = self._slots
+        self._slots = array('Q', bytes(16 * len(old_slots)))
+        self._mask = len(self._slots) - 1
+        for value in old_slots:
+            if value:
+                self._slots[self._find(value)] = value
+
+
+def load_suppression_list(file_path: str) -> FingerprintSet:
+    """
+    Load addresses that must never be sent to.
+    
+    Accepts a text file with one address per line or a CSV file with an
+    'Email' or 'email' column.
+    
+    Args:
+        file_path (str): Path to the suppression list
+    
+    Returns:
+        FingerprintSet: Fingerprints of the suppressed addresses
+    """
+    suppressed = FingerprintSet()
+    with open(file_path, 'r', newline='', encoding='utf-8') as file:
+        if file_path.lower().endswith('.csv'):
+            addresses = (row.get('Email') or row.get('email') or '' for row in csv.DictReader(file))
+        else:
+            addresses = (line for line in file if not line.startswith('#'))
+        for address in addresses:
+            address = normalize_address(address)
+            if address:
+                suppressed.add(fingerprint(address))
+    return suppressed
+
+
+def dns_domain_resolver(domain: str) -> bool:
+    """
+    Check that a domain can receive mail.
+    
+    Uses an MX lookup when dnspython is installed, otherwise checks that the
+    domain resolves at all.
+    
+    Args:
+        domain (str): Domain to check
+    
+    Returns:
+        bool: True if the domain looks deliverable
+    """
+    if dns is not None:
+        try:
+            dns.resolver.resolve(domain, 'MX')
+            return True
+        except dns.resolver.NoAnswer:
+            # No MX record: mail falls back to the A/AAAA record
+            pass
+        except Exception:
+            return False
+    try:
+        socket.getaddrinfo(domain, None)
+        return True
+    except OSError:
+        return False
+
+
+class RecipientValidator:
+    """Pre-send filter that drops malformed, duplicate, suppressed and undeliverable recipients."""
+    
+    def __init__(self, suppression: Optional[FingerprintSet] = None,
+                 resolver: Optional[Callable[[str], bool]] = None,
+                 expected_recipients: int = 1024, domain_cache_size: int = 10000):
+        """
+        Initialize the validator.
+        
+        Args:
+            suppression (Optional[FingerprintSet]): Suppressed address fingerprints
+            resolver (Optional[Callable[[str], bool]]): Domain check, e.g.
+                dns_domain_resolver; domain checks are skipped when omitted
+            expected_recipients (int): Size hint for the deduplication index
+            domain_cache_size (int): Domains whose lookup result is remembered
+        """
+        self.suppression = suppression
+        self.resolver = resolver
+        self.domain_cache_size = domain_cache_size
+        self._seen = FingerprintSet(expected_recipients)
+        self._domains: 'OrderedDict[str, bool]' = OrderedDict()
+        self.stats: Dict[str, int] = {
+            'checked': 0,
+            'accepted': 0,
+            INVALID_SYNTAX: 0,
+            DUPLICATE: 0,
+            SUPPRESSED: 0,
+            BAD_DOMAIN: 0
+        }
+    
+    def _domain_ok(self, domain: str) -> bool:
+        """Look up a domain through the resolver, caching the most recent results."""
+        cached = self._domains.get(domain)
+        if cached is not None:
+            self._domains.move_to_end(domain)
+            return cached
+        result = bool(self.resolver(domain))
+        self._domains[domain] = result
+        if len(self._domains) > self.domain_cache_size:
+            self._domains.popitem(last=False)
+        return result
+    
+    def check(self, recipient: Dict[str, str]) -> Optional[str]:
+        """
+        Validate one recipient.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient with a normalized 'email'
+        
+        Returns:
+            Optional[str]: Reason the recipient is rejected, or None if accepted
+        """
+        address = recipient['email']
+        if not is_valid_address(address):
+            return INVALID_SYNTAX
+        value = fingerprint(address)
+        if self.suppression is not None and value in self.suppression:
+            return SUPPRESSED
+        if value in self._seen:
+            return DUPLICATE
+        if self.resolver is not None and not self._domain_ok(ascii_domain(address.rpartition('@')[2])):
+            return BAD_DOMAIN
+        self._seen.add(value)
+        return None
+    
+    def filter(self, recipients: Iterable[Dict[str, str]]) -> Iterator[Dict[str, str]]:
+        """
+        Yield the recipients that pass validation, with normalized addresses.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to check
+        
+        Yields:
+            Dict[str, str]: Accepted recipient
+        """
+        for recipient in recipients:
+            self.stats['checked'] += 1
+            address = normalize_address(recipient['email'])
+            if address != recipient['email']:
+                recipient = dict(recipient, email=address)
+            reason = self.check(recipient)
+            if reason is None:
+                self.stats['accepted'] += 1
+                yield recipient
+            else:
+                self.stats[reason] += 1
+    
+    @property
+    def rejected(self) -> int:
+        """Number of recipients filtered out."""
+        return self.stats['checked'] - self.stats['accepted']
+
+
+def create_validator(suppression_list: Optional[str] = None, check_domains: bool = False,
+                     expected_recipients: int = 1024) -> RecipientValidator:
+    """
+    Build a validator from settings.
+    
+    Args:
+        suppression_list (Optional[str]): Path to a suppression list file
+        check_domains (bool): Check domains with dns_domain_resolver
+        expected_recipients (int): Size hint for the deduplication index
+    
+    Returns:
+        RecipientValidator: Configured validator
+    
+    Raises:
+        OSError: If the suppression list cannot be read
+    """
+    suppression = load_suppression_list(suppression_list) if suppression_list else None
+    resolver = dns_domain_resolver if check_domains else None
+    return RecipientValidator(suppression, resolver, expected_recipients)
@@ -0,0 +1,143 @@
+"""
+Retry Queue
+Classifies delivery failures and schedules transient ones for retry with
+jittered exponential backoff.
+"""
+
+import heapq
+import itertools
+import random
+import smtplib
+import socket
+import time
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+
+TRANSIENT = 'transient'
+PERMANENT = 'permanent'
+
+
+def classify_error(error: Optional[Exception]) -> str:
+    """
+    Decide whether a failed delivery is worth retrying.
+    
+    4xx replies, dropped connections and timeouts are transient; 5xx replies
+    and errors raised before talking to the server are permanent.
+    
+    Args:
+        error (Optional[Exception]): Error raised while sending
+    
+    Returns:
+        str: 'transient' or 'permanent'
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return TRANSIENT if codes and all(400 <= code < 500 for code in codes) else PERMANENT
+    if isinstance(error, smtplib.SMTPResponseException):
+        return TRANSIENT if 400 <= error.smtp_code < 500 else PERMANENT
+    if isinstance(error, (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)):
+        return TRANSIENT
+    if isinstance(error, smtplib.SMTPNotSupportedError):
+        # e.g. a non-ASCII address and no SMTPUTF8; the server will not change its mind
+        return PERMANENT
+    if isinstance(error, OSError) and not isinstance(error, FileNotFoundError):
+        # Network-level failures such as unreachable hosts or reset connections
+        return TRANSIENT
+    return PERMANENT
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float,
+                  rand: Callable[[], float] = random.random) -> float:
+    """
+    Compute the wait before the next attempt.
+    
+    The delay doubles with every attempt up to max_delay; half of it is
+    randomized so retries from many recipients do not arrive together.
+    
+    Args:
+        attempt (int): Number of the attempt that just failed (1-based)
+        base_delay (float): Delay after the first failure
+        max_delay (float): Upper bound on the delay
+        rand (Callable[[], float]): Random source returning values in [0, 1)
+    
+    Returns:
+        float: Seconds to wait
+    """
+    delay = min(max_delay, base_delay * (2 ** (attempt - 1)))
+    return delay / 2 + rand() * delay / 2
+
+
+class RetryQueue:
+    """Min-heap of items waiting for their next delivery attempt."""
+    
+    def __init__(self, max_retries: int = 3, base_delay: float = 5.0, max_delay: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep,
+                 rand: Callable[[], float] = random.random):
+        """
+        Initialize an empty queue.
+        
+        Args:
+            max_retries (int): Retries allowed after the first attempt
+            base_delay (float): Delay after the first failure
+            max_delay (float): Upper bound on the delay
+            clock (Callable[[], float]): Monotonic time source
+            sleep (Callable[[float], None]): Sleep function
+            rand (Callable[[], float]): Random source returning values in [0, 1)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.rand = rand
+        self._heap: List[Tuple[float, int, Any, int]] = []
+        self._counter = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def schedule(self, item: Any, attempt: int, error: Optional[Exception]) -> Optional[float]:
+        """
+        Queue an item for retry if its failure is transient and retries remain.
+        
+        Args:
+            item (Any): Item to retry
+            attempt (int): Number of the attempt that just failed (1-based)
+            error (Optional[Exception]): Error raised by that attempt
+        
+        Returns:
+            Optional[float]: Seconds until the retry, or None if the item was dropped
+        """
+        if attempt > self.max_retries or classify_error(error) != TRANSIENT:
+            return None
+        delay = backoff_delay(attempt, self.base_delay, self.max_delay, self.rand)
+        heapq.heappush(self._heap, (self.clock() + delay, next(self._counter), item, attempt + 1))
+        return delay
+    
+    def pop_due(self) -> Iterator[Tuple[Any, int]]:
+        """
+        Remove and yield the items whose retry time has come, without waiting.
+        
+        Yields:
+            Tuple[Any, int]: Item and the number of the attempt to make
+        """
+        now = self.clock()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, item, attempt = heapq.heappop(self._heap)
+            yield item, attempt
+    
+    def drain(self) -> Iterator[Tuple[Any, int]]:
+        """
+        Yield every queued item, sleeping until each one is due.
+        
+        Items scheduled while draining are yielded as well.
+        
+        Yields:
+            Tuple[Any, int]: Item and the number of the attempt to make
+        """
+        while self._heap:
+            wait = self._heap[0][0] - self.clock()
+            if wait > 0:
+                self.sleep(wait)
+            _, _, item, attempt = heapq.heappop(self._heap)
+            yield item, attempt
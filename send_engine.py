@@ -0,0 +1,65 @@
+"""
+Concurrent Send Engine
+Delivers messages to many recipients in parallel with a bounded number in flight.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+
+class ConcurrentSender:
+    """Feeds recipients to a pool of worker threads and yields results in order."""
+    
+    def __init__(self, send_func: Callable[[Dict[str, str]], Any], workers: int = 1,
+                 max_in_flight: Optional[int] = None):
+        """
+        Initialize the sender.
+        
+        Args:
+            send_func (Callable[[Dict[str, str]], Any]): Called once per recipient in a worker
+            workers (int): Number of worker threads (1 sends inline)
+            max_in_flight (Optional[int]): Recipients submitted but not yet reported;
+                defaults to four per worker
+        """
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        
+        self.send_func = send_func
+        self.workers = workers
+        self.max_in_flight = max(max_in_flight or workers * 4, workers)
+    
+    def run(self, recipients: Iterable[Dict[str, str]]) -> Iterator[Tuple[int, Dict[str, str], Any]]:
+        """
+        Send to every recipient.
+        
+        Recipients are pulled from the iterable only as slots free up, so memory
+        stays bounded by max_in_flight regardless of the list size.
+        
+        Args:
+            recipients (Iterable[Dict[str, str]]): Recipients to send to
+        
+        Yields:
+            Tuple[int, Dict[str, str], Any]: 1-based position, recipient and send_func result
+        """
+        if self.workers == 1:
+            for i, recipient in enumerate(recipients, 1):
+                yield i, recipient, self.send_func(recipient)
+            return
+        
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='email-sender') as executor:
+            try:
+                for i, recipient in enumerate(recipients, 1):
+                    pending.append((i, recipient, executor.submit(self.send_func, recipient)))
+                    if len(pending) >= self.max_in_flight:
+                        position, sent_to, future = pending.popleft()
+                        yield position, sent_to, future.result()
+                
+                while pending:
+                    position, sent_to, future = pending.popleft()
+                    yield position, sent_to, future.result()
+            finally:
+                # Do not start queued work if the caller stops early
+                for _, _, future in pending:
+                    future.cancel()
@@ -0,0 +1,249 @@
+"""
+Send Journal
+Durable per-campaign record of each recipient's delivery state, used to
+resume interrupted campaigns without re-sending.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+RETRYING = 'retrying'
+
+STATES = (PENDING, SENT, FAILED, RETRYING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    campaign_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    email_data TEXT NOT NULL,
+    recipients_path TEXT
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+    campaign_id TEXT NOT NULL,
+    email TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign_id, email)
+) WITHOUT ROWID;
+"""
+
+
+def make_campaign_id(email_data: Dict, recipients_path: Optional[str] = None) -> str:
+    """
+    Derive a stable campaign id from the composition and recipient file.
+    
+    Args:
+        email_data (Dict): Email composition data
+        recipients_path (Optional[str]): File the recipients were loaded from
+    
+    Returns:
+        str: 16-character hexadecimal id
+    """
+    fingerprint = json.dumps([
+        email_data['subject'], email_data['body'], email_data['format'],
+        list(email_data['attachments']), recipients_path
+    ])
+    return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:16]
+
+
+class SendJournal:
+    """SQLite-backed journal with batched, thread-safe writes."""
+    
+    def __init__(self, path: str, campaign_id: str, batch_size: int = 200, flush_interval: float = 1.0):
+        """
+        Open (or create) the journal for a campaign.
+        
+        Args:
+            path (str): SQLite database file
+            campaign_id (str): Campaign the records belong to
+            batch_size (int): Records buffered before they are written
+            flush_interval (float): Maximum seconds a record stays buffered
+        """
+        self.path = path
+        self.campaign_id = campaign_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        
+        self._lock = threading.Lock()
+        self._buffer: Dict[str, Tuple[str, Optional[str], float]] = {}
+        self._last_flush = time.monotonic()
+        
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+    
+    def start_campaign(self, email_data: Dict, recipients_path: Optional[str] = None) -> None:
+        """
+        Store the composition so the campaign can be resumed later.
+        
+        Args:
+            email_data (Dict): Email composition data
+            recipients_path (Optional[str]): File the recipients were loaded from
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO campaigns (campaign_id, created_at, updated_at, email_data, recipients_path) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(campaign_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (self.campaign_id, now, now, json.dumps(email_data), recipients_path)
+            )
+    
+    def record(self, email: str, state: str, error: Optional[str] = None) -> None:
+        """
+        Buffer a state change for a recipient.
+        
+        Args:
+            email (str): Recipient address
+            state (str): One of pending, sent, failed or retrying
+            error (Optional[str]): Failure reason, if any
+        """
+        if state not in STATES:
+            raise ValueError(f"Unknown delivery state: {state}")
+        
+        with self._lock:
+            self._buffer[email] = (state, error, time.time())
+            if (len(self._buffer) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+    
+    def _flush_locked(self) -> None:
+        """Write buffered records in one transaction. The caller holds the lock."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows = [
+            (self.campaign_id, email, state, 1 if state != PENDING else 0, error, updated_at)
+            for email, (state, error, updated_at) in self._buffer.items()
+        ]
+        self._buffer.clear()
+        with self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "INSERT INTO deliveries (campaign_id, email, state, attempts, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(campaign_id, email) DO UPDATE SET "
+                "state = excluded.state, attempts = attempts + excluded.attempts, "
+                "last_error = excluded.last_error, updated_at = excluded.updated_at",
+                rows
+            )
+    
+    def flush(self) -> None:
+        """Write every buffered record."""
+        with self._lock:
+            self._flush_locked()
+    
+    def is_sent(self, email: str) -> bool:
+        """
+        Check whether a recipient was already delivered in this campaign.
+        
+        Args:
+            email (str): Recipient address
+        
+        Returns:
+            bool: True if the recipient's state is 'sent'
+        """
+        with self._lock:
+            buffered = self._buffer.get(email)
+            if buffered is not None:
+                return buffered[0] == SENT
+            row = self._connection.execute(
+                "SELECT state FROM deliveries WHERE campaign_id = ? AND email = ?",
+                (self.campaign_id, email)
+            ).fetchone()
+        return row is not None and row[0] == SENT
+    
+    def counts(self) -> Dict[str, int]:
+        """
+        Count recipients in each state.
+        
+        Returns:
+            Dict[str, int]: Number of recipients per state
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, COUNT(*) FROM deliveries WHERE campaign_id = ? GROUP BY state",
+                (self.campaign_id,)
+            ).fetchall()
+        counts = {state: 0 for state in STATES}
+        counts.update(dict(rows))
+        return counts
+    
+    def recipients_in_state(self, state: str) -> Iterator[str]:
+        """
+        Iterate over the addresses currently in a state.
+        
+        Args:
+            state (str): One of pending, sent, failed or retrying
+        
+        Yields:
+            str: Recipient address
+        """
+        self.flush()
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT email FROM deliveries WHERE campaign_id = ? AND state = ? ORDER BY email",
+                (self.campaign_id, state)
+            ).fetchall()
+        for (email,) in rows:
+            yield email
+    
+    def close(self) -> None:
+        """Flush outstanding records and close the database."""
+        with self._lock:
+            self._flush_locked()
+            self._connection.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @staticmethod
+    def list_campaigns(path: str) -> List[Dict]:
+        """
+        List the campaigns stored in a journal file with their progress.
+        
+        Args:
+            path (str): SQLite database file
+        
+        Returns:
+            List[Dict]: campaign_id, updated_at, email_data, recipients_path and
+                per-state counts, most recent first
+        """
+        connection = sqlite3.connect(path)
+        try:
+            connection.executescript(SCHEMA)
+            campaigns = []
+            for campaign_id, updated_at, email_data, recipients_path in connection.execute(
+                    "SELECT campaign_id, updated_at, email_data, recipients_path "
+                    "FROM campaigns ORDER BY updated_at DESC"):
+                counts = {state: 0 for state in STATES}
+                counts.update(dict(connection.execute(
+                    "SELECT state, COUNT(*) FROM deliveries WHERE campaign_id = ? GROUP BY state",
+                    (campaign_id,)
+                ).fetchall()))
+                campaigns.append({
+                    'campaign_id': campaign_id,
+                    'updated_at': updated_at,
+                    'email_data': json.loads(email_data),
+                    'recipients_path': recipients_path,
+                    'counts': counts
+                })
+            return campaigns
+        finally:
+            connection.close()
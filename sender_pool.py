@@ -0,0 +1,394 @@
+"""
+Sender Pool
+Spreads a campaign over several accounts and relays, each with its own sessions, rate and daily quota.
+"""
+
+import logging
+import re
+import smtplib
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Union
+
+from metrics import CampaignMetrics
+from rate_limiter import TokenBucketRateLimiter, get_rate_profile, is_throttling_error
+from smtp_pool import SMTPConnectionPool
+
+
+# Ways of choosing the sender for the next message
+WEIGHTED = 'weighted'
+LEAST_LOADED = 'least_loaded'
+STRATEGIES = (WEIGHTED, LEAST_LOADED)
+
+# Sender keys that override the provider's rate profile
+RATE_KEYS = ('messages_per_second', 'messages_per_day', 'burst')
+
+# Reply text of providers refusing a sender that used up its sending quota
+QUOTA_MARKERS = (b'5.4.5', b'quota')
+
+# Reply text of servers refusing to send as an address the account does not own
+# (Exchange '5.2.0 SendAsDenied', Gmail and others '5.7.1 ... not allowed to send as')
+SEND_AS_MARKERS = (b'sendasdenied', b'send as', b'send mail as', b'sender address rejected')
+
+# The From header and its folded continuation lines
+_FROM_HEADER = re.compile(rb'^From:[^\r\n]*(?:\r?\n[ \t][^\r\n]*)*', re.IGNORECASE | re.MULTILINE)
+_HEADER_END = re.compile(rb'\r?\n\r?\n')
+
+
+class SendersExhaustedError(Exception):
+    """Raised when every sender has used up its daily quota; not worth retrying today."""
+
+
+def resolve_senders(email_config: Dict[str, str], senders: List[Dict],
+                    provider_servers: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+    """
+    Complete sender entries from the primary email configuration.
+    
+    Args:
+        email_config (Dict[str, str]): Primary account; supplies every key a sender leaves out
+        senders (List[Dict]): Accounts and relays, each an email_config-style dict
+            optionally with name, weight and rate profile keys
+        provider_servers (Optional[Dict[str, Dict]]): Server and port per provider,
+            used for senders that name a provider but no server
+    
+    Returns:
+        List[Dict]: One complete configuration per sender
+    
+    Raises:
+        ValueError: If a weight is not positive or two senders share a name
+    """
+    resolved = []
+    for entry in senders:
+        config = dict(email_config)
+        if 'provider' in entry and 'smtp_server' not in entry and provider_servers:
+            config.update(provider_servers.get(entry['provider'], {}))
+        config.update(entry)
+        config.setdefault('name', f"{config['email']}@{config['smtp_server']}")
+        if config.get('weight', 1) <= 0:
+            raise ValueError(f"Sender {config['name']} needs a positive weight")
+        resolved.append(config)
+    names = [config['name'] for config in resolved]
+    if len(set(names)) != len(names):
+        raise ValueError("Sender names must be unique; set 'name' on senders sharing an account and server")
+    return resolved
+
+
+def sender_rate_profile(sender: Dict, overrides: Optional[Dict] = None,
+                        delay_between_emails: float = 0) -> Dict:
+    """
+    Build a sender's rate profile from its provider and its own limits.
+    
+    Args:
+        sender (Dict): Resolved sender configuration
+        overrides (Optional[Dict]): Campaign-wide profile overrides (the rate_limit setting)
+        delay_between_emails (float): Minimum seconds between messages (0 = no minimum)
+    
+    Returns:
+        Dict: messages_per_second, messages_per_day and burst
+    """
+    overrides = dict(overrides or {})
+    overrides.update({key: sender[key] for key in RATE_KEYS if key in sender})
+    return get_rate_profile(sender.get('provider', 'default'), overrides, delay_between_emails)
+
+
+def is_quota_error(error: Exception) -> bool:
+    """
+    Check whether the server refused a message because the sender's quota is used up.
+    
+    Args:
+        error (Exception): Error raised while sending
+    
+    Returns:
+        bool: True for replies such as Gmail's '5.4.5 Daily user sending limit exceeded'
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        replies = [text for _, text in error.recipients.values()]
+    elif isinstance(error, smtplib.SMTPResponseException):
+        replies = [error.smtp_error]
+    else:
+        return False
+    return any(marker in text.lower() for text in replies for marker in QUOTA_MARKERS)
+
+
+def is_send_as_error(error: Exception) -> bool:
+    """
+    Check whether the server refused the message because the account may not send as its From address.
+    
+    Args:
+        error (Exception): Error raised while sending
+    
+    Returns:
+        bool: True for replies such as Exchange's '5.2.0 SendAsDenied'
+    """
+    if not isinstance(error, smtplib.SMTPResponseException):
+        return False
+    return any(marker in error.smtp_error.lower() for marker in SEND_AS_MARKERS)
+
+
+def with_from_address(msg: Union[str, bytes], from_addr: str, address: str) -> Union[str, bytes]:
+    """
+    Rewrite a serialized message's From header to another sender's address.
+    
+    The address is replaced where it appears, keeping any display name; a
+    From header without it is replaced whole.
+    
+    Args:
+        msg (Union[str, bytes]): Serialized message
+        from_addr (str): Address the message was rendered with
+        address (str): Address of the sender sending it
+    
+    Returns:
+        Union[str, bytes]: Message with the sender's From header
+    """
+    if address == from_addr:
+        return msg
+    data = msg.encode('utf-8') if isinstance(msg, str) else msg
+    header_end = _HEADER_END.search(data)
+    match = _FROM_HEADER.search(data, 0, header_end.start() if header_end else len(data))
+    if match is None:
+        return msg
+    header = match.group()
+    if from_addr.encode('utf-8') in header:
+        header = header.replace(from_addr.encode('utf-8'), address.encode('utf-8'))
+    else:
+        header = b'From: ' + address.encode('utf-8')
+    data = data[:match.start()] + header + data[match.end():]
+    return data.decode('utf-8') if isinstance(msg, str) else data
+
+
+def is_sender_error(error: Exception) -> bool:
+    """
+    Check whether a failure is down to the sender rather than the recipients.
+    
+    Such messages are worth trying through another sender: dropped or refused
+    connections, failed logins, a refused MAIL FROM, throttling, quota and
+    send-as replies.
+    
+    Args:
+        error (Exception): Error raised while sending
+    
+    Returns:
+        bool: True if another sender may succeed
+    """
+    if isinstance(error, (smtplib.SMTPAuthenticationError, smtplib.SMTPSenderRefused,
+                          smtplib.SMTPConnectError, smtplib.SMTPHeloError)):
+        return True
+    if (SMTPConnectionPool.is_connection_error(error) or is_throttling_error(error) or is_quota_error(error)
+            or is_send_as_error(error)):
+        return True
+    # Other SMTP errors are about the message or its recipients; plain OSErrors are network failures
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class Sender:
+    """One account or relay: its sessions, rate limiter and counters."""
+    
+    def __init__(self, config: Dict, pool: SMTPConnectionPool, limiter: TokenBucketRateLimiter,
+                 weight: float = 1.0):
+        """
+        Initialize the sender.
+        
+        Args:
+            config (Dict): Resolved sender configuration
+            pool (SMTPConnectionPool): Sessions to the sender's server
+            limiter (TokenBucketRateLimiter): Rate and daily quota of the sender
+            weight (float): Share of the messages relative to the other senders
+        """
+        self.config = config
+        self.name = config['name']
+        self.pool = pool
+        self.limiter = limiter
+        self.weight = weight
+        self.sent = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.exhausted = False
+        self.cooling_until = 0.0
+        # Running score of the smooth weighted round-robin
+        self._current_weight = 0.0
+    
+    @property
+    def remaining_today(self) -> Optional[int]:
+        """Messages left in the sender's daily quota, or None when unlimited."""
+        return 0 if self.exhausted else self.limiter.remaining_today
+    
+    def stats(self) -> Dict:
+        """
+        Describe the sender's progress.
+        
+        Returns:
+            Dict: name, sent, failed, remaining_today and whether it is exhausted
+        """
+        return {
+            'name': self.name,
+            'sent': self.sent,
+            'failed': self.failed,
+            'remaining_today': self.remaining_today,
+            'exhausted': self.exhausted
+        }
+
+
+class SenderPool:
+    """
+    Thread-safe load balancer over several senders.
+    
+    Each message goes to one sender, chosen by smooth weighted round-robin or
+    by the fewest messages in flight per unit of weight. A sender that fails
+    for reasons of its own (lost connection, throttling, a refused login or
+    sender) rests for a cooldown and the message moves to the next sender; one
+    that runs out of daily quota is skipped for the rest of the campaign.
+    Recipient refusals are raised without failover, as every sender would get
+    them. The pool has the send() and close() interface of SMTPConnectionPool.
+    """
+    
+    def __init__(self, senders: List[Sender], strategy: str = WEIGHTED, cooldown: float = 60.0,
+                 logger: Optional[logging.Logger] = None, metrics: Optional[CampaignMetrics] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the pool.
+        
+        Args:
+            senders (List[Sender]): Senders to spread messages over
+            strategy (str): 'weighted' (round-robin in proportion to the weights)
+                or 'least_loaded' (fewest messages in flight per unit of weight)
+            cooldown (float): Seconds a failing sender is passed over
+            logger (Optional[logging.Logger]): Logger for failovers
+            metrics (Optional[CampaignMetrics]): Metrics receiving failover counts
+            clock (Callable[[], float]): Monotonic time source
+        
+        Raises:
+            ValueError: If there are no senders or the strategy is unknown
+        """
+        if not senders:
+            raise ValueError("A sender pool needs at least one sender")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown sender selection '{strategy}', expected one of {', '.join(STRATEGIES)}")
+        self.senders = senders
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.logger = logger or logging.getLogger(__name__)
+        self.metrics = metrics or CampaignMetrics()
+        self.clock = clock
+        self._lock = threading.Lock()
+    
+    def _select(self, tried: Set[str], count: int) -> Optional[Sender]:
+        """Pick a sender with quota left that was not tried yet. The caller holds the lock."""
+        candidates = [sender for sender in self.senders if sender.name not in tried and not sender.exhausted
+                      and (sender.remaining_today is None or sender.remaining_today >= count)]
+        now = self.clock()
+        # Resting senders are used only when nothing else is left; that attempt is their health check
+        candidates = [sender for sender in candidates if sender.cooling_until <= now] or candidates
+        if not candidates:
+            return None
+        if self.strategy == LEAST_LOADED:
+            return min(candidates, key=lambda sender: ((sender.in_flight + 1) / sender.weight,
+                                                       sender.sent / sender.weight))
+        total = sum(sender.weight for sender in candidates)
+        for sender in candidates:
+            sender._current_weight += sender.weight
+        chosen = max(candidates, key=lambda sender: sender._current_weight)
+        chosen._current_weight -= total
+        return chosen
+    
+    def send(self, from_addr: str, to_addrs: Union[str, List[str]], msg: Union[str, bytes],
+             max_attempts: int = 2) -> Dict:
+        """
+        Send a message through the next sender, failing over to the others.
+        
+        The envelope sender and the From header are the chosen sender's
+        address, so the message is aligned with the account it is sent from.
+        
+        Args:
+            from_addr (str): Address of the primary account the message was rendered with
+            to_addrs (Union[str, List[str]]): Envelope recipient(s)
+            msg (Union[str, bytes]): Serialized message
+            max_attempts (int): Attempts per sender when its connection fails
+        
+        Returns:
+            Dict: Refused recipients, as returned by smtplib
+        
+        Raises:
+            SendersExhaustedError: If no sender has quota left for the message
+            Exception: The last sender's error when every sender failed, or a
+                recipient refusal
+        """
+        count = 1 if isinstance(to_addrs, str) else len(to_addrs)
+        tried: Set[str] = set()
+        last_error: Optional[Exception] = None
+        while True:
+            with self._lock:
+                sender = self._select(tried, count)
+                if sender is not None:
+                    sender.in_flight += 1
+            if sender is None:
+                if last_error is not None:
+                    raise last_error
+                raise SendersExhaustedError("Every sender has used its daily quota")
+            tried.add(sender.name)
+            
+            try:
+                if not sender.limiter.acquire(count):
+                    with self._lock:
+                        sender.exhausted = True
+                    self.logger.warning(f"Sender {sender.name} reached its daily quota")
+                    continue
+                try:
+                    refused = sender.pool.send(sender.config['email'], to_addrs,
+                                               with_from_address(msg, from_addr, sender.config['email']),
+                                               max_attempts)
+                except Exception as e:
+                    if is_throttling_error(e):
+                        sender.limiter.report_throttled()
+                    if not is_sender_error(e):
+                        raise
+                    with self._lock:
+                        sender.failed += 1
+                        if is_quota_error(e):
+                            sender.exhausted = True
+                        else:
+                            sender.cooling_until = self.clock() + self.cooldown
+                    self.metrics.increment('sender_failovers')
+                    self.logger.warning(f"Sender {sender.name} failed ({str(e)}), trying another sender")
+                    last_error = e
+                    continue
+                sender.limiter.report_success()
+                with self._lock:
+                    sender.sent += count
+                    sender.cooling_until = 0.0
+                return refused
+            finally:
+                with self._lock:
+                    sender.in_flight -= 1
+    
+    def supports(self, extension: str) -> bool:
+        """
+        Check whether every sender with quota left advertises an ESMTP extension.
+        
+        Args:
+            extension (str): Extension name, e.g. '8BITMIME'
+        
+        Returns:
+            bool: True if all of their servers list the extension
+        """
+        return all(sender.pool.supports(extension) for sender in self.senders if not sender.exhausted)
+    
+    def stats(self) -> List[Dict]:
+        """
+        Describe every sender's progress.
+        
+        Returns:
+            List[Dict]: Sender.stats() of each sender
+        """
+        with self._lock:
+            return [sender.stats() for sender in self.senders]
+    
+    def close(self) -> None:
+        """Close every sender's sessions."""
+        for sender in self.senders:
+            sender.pool.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,326 @@
+"""
+Sent Index
+Persistent per-campaign record of the addresses already sent to, checked in constant time across runs.
+"""
+
+import glob
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from typing import List, Optional, Tuple
+
+from recipient_validation import FingerprintSet, fingerprint
+
+
+INDEX_FILE = 'index.bin'
+LOG_SUFFIX = '.log'
+
+# magic, version, byte order (1 = little-endian), Bloom hash count, Bloom bits, table slots, entries
+HEADER = struct.Struct('<4sBBHQQQ')
+MAGIC = b'SNTX'
+VERSION = 1
+
+# Fill ratio of the fingerprint table; the Bloom filter is sized for a full table
+MAX_LOAD = 0.7
+# Smallest table created, in slots
+MIN_SLOTS = 1024
+
+# Addresses buffered before they are appended to the run's log
+LOG_BATCH_SIZE = 256
+
+
+def _probe(slots, mask: int, value: int) -> int:
+    """Index of the slot holding value, or of the empty slot where it belongs (linear probing)."""
+    index = value & mask
+    while True:
+        current = slots[index]
+        if current == value or current == 0:
+            return index
+        index = (index + 1) & mask
+
+
+def _bloom_positions(value: int, hashes: int, bits: int) -> List[int]:
+    """Bit positions of a fingerprint, by double hashing its two halves."""
+    low = value & 0xFFFFFFFF
+    high = (value >> 32) | 1
+    return [(low + i * high) % bits for i in range(hashes)]
+
+
+def _layout(entries: int, false_positive_rate: float) -> Tuple[int, int, int]:
+    """
+    Size a table and Bloom filter for a number of entries.
+    
+    Returns:
+        Tuple[int, int, int]: Table slots (a power of two), Bloom bits (a
+            multiple of 64) and Bloom hash count
+    """
+    slots = MIN_SLOTS
+    while slots * MAX_LOAD < entries:
+        slots *= 2
+    capacity = int(slots * MAX_LOAD)
+    bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+    bits = (bits + 63) // 64 * 64
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return slots, bits, hashes
+
+
+class SentIndex:
+    """
+    Addresses already sent to in one campaign, kept in a directory across runs.
+    
+    index.bin holds a Bloom filter and an open-addressing table of 64-bit
+    address fingerprints; it is memory-mapped, so opening costs the same for
+    ten addresses or ten million. Each run appends the addresses it sends to
+    a log of its own, so a crash loses at most the last LOG_BATCH_SIZE
+    addresses and concurrent shards never write the same file. A lookup
+    checks the logged addresses in memory, then the Bloom filter, and only
+    for Bloom hits the table: new addresses are turned away by a few bit
+    tests, known ones cost one probe of the table. compact() folds the logs
+    into the table, in place while it has room and by rebuilding it at twice
+    the size when it fills up.
+    
+    Addresses are compared case-insensitively, as recipient validation does.
+    """
+    
+    def __init__(self, directory: str, false_positive_rate: float = 0.01):
+        """
+        Open (or create) the index in a directory.
+        
+        Args:
+            directory (str): Directory of the campaign's index, created if missing
+            false_positive_rate (float): Bloom filter false positives, used when
+                the table is (re)built
+        
+        Raises:
+            OSError: If the directory or its files cannot be read
+            ValueError: If index.bin is not a sent index of this version
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.false_positive_rate = false_positive_rate
+        self._lock = threading.Lock()
+        self._map: Optional[mmap.mmap] = None
+        self._bloom = None
+        self._slots = None
+        self._hashes = 0
+        self._bits = 0
+        self._mask = 0
+        self.entries = 0
+        self._open_index()
+        
+        # Addresses logged since the last compaction, by this run or by earlier ones
+        self._recent = FingerprintSet()
+        self._logs = sorted(glob.glob(os.path.join(glob.escape(directory), '*' + LOG_SUFFIX)))
+        for log_path in self._logs:
+            self._load_log(log_path)
+        self._buffer = array('Q')
+        self._log = None
+        self.added = 0
+    
+    def _open_index(self) -> None:
+        """Map index.bin read-only, if a compaction has written it."""
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._read_header()
+    
+    def _read_header(self) -> None:
+        """Point the Bloom filter and table views into the mapped file."""
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{INDEX_FILE} in {self.directory} is truncated")
+        magic, version, little, self._hashes, self._bits, slots, self.entries = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{INDEX_FILE} in {self.directory} is not a sent index of version {VERSION}")
+        if bool(little) != (sys.byteorder == 'little'):
+            raise ValueError(f"{INDEX_FILE} in {self.directory} was written on a machine of the other byte order")
+        view = memoryview(self._map)
+        self._bloom = view[HEADER.size:HEADER.size + self._bits // 8]
+        self._slots = view[HEADER.size + self._bits // 8:].cast('Q')
+        self._mask = len(self._slots) - 1
+    
+    def _release(self) -> None:
+        """Unmap index.bin; the views must go first."""
+        if self._map is None:
+            return
+        self._bloom.release()
+        self._slots.release()
+        self._map.close()
+        self._map = self._bloom = self._slots = None
+    
+    def _load_log(self, log_path: str) -> None:
+        """Add a log's fingerprints to the in-memory set; a torn last record is ignored."""
+        with open(log_path, 'rb') as file:
+            data = file.read()
+        logged = array('Q')
+        logged.frombytes(data[:len(data) - len(data) % logged.itemsize])
+        for value in logged:
+            if not self._in_table(value):
+                self._recent.add(value)
+    
+    def _in_table(self, value: int) -> bool:
+        """Check the Bloom filter, then the table."""
+        if self._map is None:
+            return False
+        bloom = self._bloom
+        for position in _bloom_positions(value, self._hashes, self._bits):
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        return self._slots[_probe(self._slots, self._mask, value)] == value
+    
+    def __len__(self) -> int:
+        return self.entries + len(self._recent)
+    
+    def __contains__(self, address: str) -> bool:
+        value = fingerprint(address)
+        with self._lock:
+            return value in self._recent or self._in_table(value)
+    
+    def add(self, address: str) -> bool:
+        """
+        Record that an address was sent to.
+        
+        Args:
+            address (str): Normalized recipient address
+        
+        Returns:
+            bool: True if it was not in the index yet
+        """
+        value = fingerprint(address)
+        with self._lock:
+            if value in self._recent or self._in_table(value):
+                return False
+            self._recent.add(value)
+            self._buffer.append(value)
+            self.added += 1
+            if len(self._buffer) >= LOG_BATCH_SIZE:
+                self._flush_locked()
+        return True
+    
+    def _flush_locked(self) -> None:
+        """Append buffered fingerprints to this run's log. The caller holds the lock."""
+        if not self._buffer:
+            return
+        if self._log is None:
+            fd, log_path = tempfile.mkstemp(prefix='run-', suffix=LOG_SUFFIX, dir=self.directory)
+            self._log = os.fdopen(fd, 'ab')
+            self._logs.append(log_path)
+        self._buffer.tofile(self._log)
+        self._log.flush()
+        self._buffer = array('Q')
+    
+    def flush(self) -> None:
+        """Write every buffered address to the log."""
+        with self._lock:
+            self._flush_locked()
+    
+    def compact(self) -> None:
+        """
+        Fold the logged addresses into index.bin and delete the logs.
+        
+        Only logs that existed when the index was opened, and this run's own,
+        are folded in; a campaign's shards must not compact while others run.
+        
+        Raises:
+            OSError: If index.bin cannot be written
+        """
+        with self._lock:
+            self._flush_locked()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if len(self._recent):
+                if self._map is not None and self.entries + len(self._recent) <= len(self._slots) * MAX_LOAD:
+                    self._insert_in_place()
+                else:
+                    self._rebuild()
+            for log_path in self._logs:
+                os.remove(log_path)
+            self._logs = []
+            self._recent = FingerprintSet()
+    
+    def _insert_in_place(self) -> None:
+        """Add the logged fingerprints to the existing table and Bloom filter."""
+        path = os.path.join(self.directory, INDEX_FILE)
+        self._release()
+        with open(path, 'r+b') as file:
+            self._map = mmap.mmap(file.fileno(), 0)
+        self._read_header()
+        # Each slot is written whole, so a crash leaves a valid table; the logs are
+        # only deleted afterwards and would be folded in again
+        self._insert(self._recent)
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, sys.byteorder == 'little', self._hashes, self._bits,
+                         len(self._slots), self.entries)
+        self._map.flush()
+        self._release()
+        self._open_index()
+    
+    def _rebuild(self) -> None:
+        """Write a table of twice the needed size with every fingerprint, then swap it in."""
+        entries = self.entries + len(self._recent)
+        slots, bits, hashes = _layout(2 * entries, self.false_positive_rate)
+        fd, temp_path = tempfile.mkstemp(prefix='index-', suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'r+b') as file:
+                file.truncate(HEADER.size + bits // 8 + 8 * slots)
+                new_map = mmap.mmap(file.fileno(), 0)
+            HEADER.pack_into(new_map, 0, MAGIC, VERSION, sys.byteorder == 'little', hashes, bits, slots, entries)
+            old = (self._map, self._bloom, self._slots)
+            self._map = new_map
+            self._read_header()
+            self.entries = 0
+            if old[0] is not None:
+                self._insert(filter(None, old[2]))
+                old[1].release()
+                old[2].release()
+                old[0].close()
+            self._insert(self._recent)
+            new_map.flush()
+            self._release()
+            os.replace(temp_path, os.path.join(self.directory, INDEX_FILE))
+        except BaseException:
+            self._release()
+            os.remove(temp_path)
+            raise
+        self._open_index()
+    
+    def _insert(self, values) -> None:
+        """Set the table slots and Bloom bits of fingerprints in the writable map."""
+        bloom, slots, mask = self._bloom, self._slots, self._mask
+        hashes, bits = self._hashes, self._bits
+        for value in values:
+            index = _probe(slots, mask, value)
+            if slots[index] == value:
+                continue
+            slots[index] = value
+            self.entries += 1
+            for position in _bloom_positions(value, hashes, bits):
+                bloom[position >> 3] |= 1 << (position & 7)
+    
+    def close(self, compact: bool = True) -> None:
+        """
+        Write buffered addresses and unmap the index.
+        
+        Args:
+            compact (bool): Fold the logs into index.bin first
+        """
+        if compact:
+            self.compact()
+        with self._lock:
+            self._flush_locked()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            self._release()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
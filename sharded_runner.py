@@ -0,0 +1,205 @@
+"""
+Sharded Campaign Runner
+Splits a campaign across worker processes by a stable hash of each address.
+"""
+
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import sys
+from typing import Dict, Iterator, List, Optional
+
+from metrics import CampaignMetrics
+from rate_limiter import get_rate_profile
+from recipient_source import RecipientSource
+from recipient_store import RecipientStore
+from recipient_validation import fingerprint, normalize_address
+from sender_pool import sender_rate_profile
+
+
+# Counters returned by every shard and added up for the campaign summary; shards
+# also return their CampaignMetrics under 'metrics'
+SUMMARY_KEYS = ('successful', 'failed', 'skipped', 'filtered')
+
+
+def shard_of(address: str, shards: int) -> int:
+    """
+    Pick the shard an address belongs to.
+    
+    Addresses that normalize to the same value (including case) always land in
+    the same shard, so deduplication still works within each shard.
+    
+    Args:
+        address (str): Recipient address
+        shards (int): Number of shards
+    
+    Returns:
+        int: Shard index in the range 0..shards-1
+    """
+    return fingerprint(normalize_address(address)) % shards
+
+
+def split_rate_profile(profile: Dict, shards: int, shard: int) -> Dict:
+    """
+    Give one shard its share of a rate profile.
+    
+    Args:
+        profile (Dict): messages_per_second, messages_per_day and burst for the campaign
+        shards (int): Number of shards
+        shard (int): Shard index
+    
+    Returns:
+        Dict: Rate profile for the shard
+    """
+    share = {
+        'messages_per_second': profile['messages_per_second'] / shards,
+        'burst': max(1, profile['burst'] // shards)
+    }
+    messages_per_day = profile.get('messages_per_day')
+    if messages_per_day:
+        # Spread the remainder so the shards add up to the full daily quota
+        base, remainder = divmod(messages_per_day, shards)
+        share['messages_per_day'] = max(1, base + (1 if shard < remainder else 0))
+    else:
+        share['messages_per_day'] = messages_per_day
+    return share
+
+
+class ShardedRecipientSource(RecipientSource):
+    """Recipient source that only yields the rows of one shard."""
+    
+    def __init__(self, file_path: str, shard: int, shards: int):
+        """
+        Initialize the source.
+        
+        Args:
+            file_path (str): Path to a .csv, .json, .jsonl or .ndjson file
+            shard (int): Shard index to keep
+            shards (int): Number of shards
+        """
+        super().__init__(file_path)
+        self.shard = shard
+        self.shards = shards
+    
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for recipient in super().__iter__():
+            if shard_of(recipient['email'], self.shards) == self.shard:
+                yield recipient
+
+
+def _init_worker(log_queue: multiprocessing.Queue) -> None:
+    """Route a worker's log records to the parent and silence its console output."""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+
+def _run_shard(task: Dict) -> Optional[Dict[str, int]]:
+    """Send one shard of a campaign in a worker process."""
+    # Imported here so the tool module can import this one
+    from email_automation_tool import EmailAutomationTool
+    
+    try:
+        tool = EmailAutomationTool()
+        tool.shard = task['shard']
+        tool.email_config = task['email_config']
+        tool.send_settings.update(task['send_settings'])
+        tool.recipients_path = task['recipients_path']
+        if task['source_path']:
+            tool.recipients = ShardedRecipientSource(task['source_path'], task['shard'], task['shards'])
+        elif task['recipients']:
+            tool.recipients = task['recipients']
+        else:
+            return dict({key: 0 for key in SUMMARY_KEYS}, metrics=CampaignMetrics())
+        result = tool.send_bulk_emails(task['email_data'], campaign_id=task['campaign_id'], resume=task['resume'])
+        if result is not None:
+            result['metrics'] = tool.metrics
+        return result
+    except Exception as e:
+        logging.getLogger(__name__).error(f"Shard {task['shard']} failed: {str(e)}")
+        return None
+
+
+def run_sharded_campaign(email_config: Dict[str, str], send_settings: Dict, email_data: Dict,
+                         recipients, recipients_path: Optional[str], processes: int,
+                         campaign_id: Optional[str] = None, resume: bool = False,
+                         logger: Optional[logging.Logger] = None) -> List[Optional[Dict[str, int]]]:
+    """
+    Send a campaign from several processes, one shard each.
+    
+    Streamed recipient files are read by every worker, each keeping its own
+    shard; in-memory lists are partitioned by the parent into compact
+    RecipientStores, which pickle to a fraction of a list of dicts. Every
+    worker opens its own SMTP sessions and gets an equal share of the rate
+    profile and of every sender's rate and quota. Log records from the
+    workers are written through the parent's handlers.
+    
+    Args:
+        email_config (Dict[str, str]): SMTP server, port and credentials
+        send_settings (Dict): Send settings applied to every worker
+        email_data (Dict): Email composition data
+        recipients: List of recipients, or a RecipientSource to stream
+        recipients_path (Optional[str]): File the recipients were loaded from
+        processes (int): Number of worker processes (shards)
+        campaign_id (Optional[str]): Journal campaign id shared by all shards
+        resume (bool): Skip recipients the journal already records as sent
+        logger (Optional[logging.Logger]): Logger used for the parent's messages
+    
+    Returns:
+        List[Optional[Dict[str, int]]]: Summary of each shard, None for shards that did not run
+    """
+    logger = logger or logging.getLogger(__name__)
+    profile = get_rate_profile(email_config.get('provider', 'default'), send_settings['rate_limit'],
+                               send_settings['delay_between_emails'])
+    streaming = isinstance(recipients, RecipientSource)
+    
+    tasks = []
+    for shard in range(processes):
+        # Metrics are merged and written by the parent; each shard gets its own profile and outbox
+        profile_path = send_settings.get('profile_path')
+        outbox_path = send_settings.get('outbox_path')
+        # Every sender's rate and daily quota is split between the shards as well
+        senders = [dict(sender, **split_rate_profile(
+                       sender_rate_profile(dict(email_config, **sender), send_settings['rate_limit'],
+                                           send_settings['delay_between_emails']), processes, shard))
+                   for sender in send_settings.get('senders') or []]
+        settings = dict(send_settings, processes=1, delay_between_emails=0, senders=senders,
+                        rate_limit=split_rate_profile(profile, processes, shard),
+                        metrics_path=None, metrics_summary_path=None, metrics_port=0,
+                        profile_path=f"{profile_path}.shard{shard}" if profile_path else None,
+                        outbox_path=os.path.join(outbox_path, f"shard{shard}") if outbox_path else None)
+        tasks.append({
+            'shard': shard,
+            'shards': processes,
+            'email_config': email_config,
+            'send_settings': settings,
+            'email_data': email_data,
+            'source_path': recipients.file_path if streaming else None,
+            'recipients': None if streaming else RecipientStore(),
+            'recipients_path': recipients_path,
+            'campaign_id': campaign_id,
+            'resume': resume
+        })
+    if not streaming:
+        for recipient in recipients:
+            tasks[shard_of(recipient['email'], processes)]['recipients'].append(recipient)
+    
+    context = multiprocessing.get_context()
+    log_queue = context.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers,
+                                              respect_handler_level=True)
+    listener.start()
+    try:
+        with context.Pool(processes, initializer=_init_worker, initargs=(log_queue,)) as pool:
+            results = pool.map(_run_shard, tasks, chunksize=1)
+    finally:
+        listener.stop()
+    
+    for shard, result in enumerate(results):
+        if result is None:
+            logger.error(f"Shard {shard} of {processes} did not run")
+    return results
@@ -0,0 +1,378 @@
+"""
+SMTP Connection Pool
+Keeps authenticated SMTP sessions open and reuses them for many messages.
+"""
+
+import smtplib
+import socket
+import threading
+import time
+import queue
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Union
+
+from esmtp import BDAT_CHUNK_SIZE, send_message, supported_extensions
+from metrics import CampaignMetrics, CONNECT, TLS, LOGIN, SENDMAIL
+
+
+# Reply codes after which the server has closed (or is about to close) the session
+RECONNECT_CODES = (421,)
+
+
+class PooledSMTPSession:
+    """A single authenticated SMTP session managed by the pool."""
+    
+    def __init__(self, email_config: Dict[str, str], timeout: float = 30.0,
+                 metrics: Optional[CampaignMetrics] = None, pipelining: bool = True,
+                 chunking: bool = True, chunk_size: int = BDAT_CHUNK_SIZE):
+        """
+        Initialize an unconnected session.
+        
+        Args:
+            email_config (Dict[str, str]): SMTP server, port and credentials
+            timeout (float): Socket timeout in seconds
+            metrics (Optional[CampaignMetrics]): Metrics receiving connect, TLS,
+                login and sendmail timings
+            pipelining (bool): Pipeline commands if the server offers PIPELINING
+            chunking (bool): Send bodies with BDAT if the server offers CHUNKING
+            chunk_size (int): Bytes per BDAT command
+        """
+        self.email_config = email_config
+        self.timeout = timeout
+        self.metrics = metrics or CampaignMetrics()
+        self.pipelining = pipelining
+        self.chunking = chunking
+        self.chunk_size = chunk_size
+        self.server = None
+        # RSET waiting to go out in front of the next pipelined transaction
+        self._reset_pending = False
+        self.created_at = 0.0
+        self.last_used = 0.0
+        self.message_count = 0
+    
+    def connect(self) -> None:
+        """Open the connection, upgrade to TLS and authenticate."""
+        with self.metrics.timer(CONNECT):
+            server = smtplib.SMTP(
+                self.email_config['smtp_server'],
+                self.email_config['smtp_port'],
+                timeout=self.timeout
+            )
+        self.metrics.increment('connections')
+        try:
+            if self.email_config.get('use_tls', True):
+                with self.metrics.timer(TLS):
+                    server.starttls()
+            if self.email_config.get('password'):
+                with self.metrics.timer(LOGIN):
+                    server.login(self.email_config['email'], self.email_config['password'])
+        except Exception:
+            server.close()
+            raise
+        
+        self.server = server
+        self._reset_pending = False
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.message_count = 0
+    
+    def close(self) -> None:
+        """Close the session, sending QUIT when the connection is still usable."""
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+    
+    def is_connected(self) -> bool:
+        """Return True if the session holds an open connection."""
+        return self.server is not None and self.server.sock is not None
+    
+    def is_expired(self, max_messages: int, max_age: float) -> bool:
+        """
+        Check whether the session has reached its message or age limit.
+        
+        Args:
+            max_messages (int): Messages allowed per session (0 disables the limit)
+            max_age (float): Session lifetime in seconds (0 disables the limit)
+        
+        Returns:
+            bool: True if the session should be retired
+        """
+        if max_messages and self.message_count >= max_messages:
+            return True
+        if max_age and time.monotonic() - self.created_at >= max_age:
+            return True
+        return False
+    
+    def is_alive(self) -> bool:
+        """
+        Probe the session with NOOP.
+        
+        Returns:
+            bool: True if the server answered 250
+        """
+        if not self.is_connected():
+            return False
+        try:
+            code, _ = self.server.noop()
+            return code == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+    
+    def reset(self) -> None:
+        """Clear any envelope state left over from the previous transaction."""
+        if self.pipelining and self.server.has_extn('pipelining'):
+            # Sent with the next envelope instead of costing a round trip of its own
+            self._reset_pending = True
+        else:
+            self.server.rset()
+    
+    @property
+    def extensions(self) -> List[str]:
+        """ESMTP extensions the server advertised, e.g. ['8BITMIME', 'PIPELINING']."""
+        return supported_extensions(self.server) if self.is_connected() else []
+    
+    def sendmail(self, from_addr: str, to_addrs: Union[str, List[str]], msg: Union[str, bytes]) -> Dict:
+        """
+        Send one message over this session.
+        
+        Args:
+            from_addr (str): Envelope sender
+            to_addrs (Union[str, List[str]]): Envelope recipient(s)
+            msg (Union[str, bytes]): Serialized message
+        
+        Returns:
+            Dict: Refused recipients, as returned by smtplib
+        """
+        reset, self._reset_pending = self._reset_pending, False
+        with self.metrics.timer(SENDMAIL):
+            refused = send_message(self.server, from_addr, to_addrs, msg, self.pipelining,
+                                   self.chunking, self.chunk_size, reset=reset)
+        self.metrics.increment('bytes', len(msg))
+        self.message_count += 1
+        self.last_used = time.monotonic()
+        return refused
+
+
+class SMTPConnectionPool:
+    """Thread-safe pool of reusable, authenticated SMTP sessions."""
+    
+    def __init__(self, email_config: Dict[str, str], pool_size: int = 1,
+                 max_messages_per_connection: int = 100, max_connection_age: float = 300.0,
+                 noop_interval: float = 30.0, timeout: float = 30.0,
+                 logger: Optional[logging.Logger] = None, metrics: Optional[CampaignMetrics] = None,
+                 pipelining: bool = True, chunking: bool = True, chunk_size: int = BDAT_CHUNK_SIZE):
+        """
+        Initialize the pool. Sessions are opened lazily on first use.
+        
+        Args:
+            email_config (Dict[str, str]): SMTP server, port and credentials
+            pool_size (int): Maximum number of open sessions
+            max_messages_per_connection (int): Messages sent before a session is recycled
+            max_connection_age (float): Seconds before a session is recycled
+            noop_interval (float): Idle seconds after which a session is checked with NOOP
+            timeout (float): Socket timeout in seconds
+            logger (Optional[logging.Logger]): Logger for connection events
+            metrics (Optional[CampaignMetrics]): Metrics receiving session timings
+            pipelining (bool): Pipeline commands on servers that offer PIPELINING
+            chunking (bool): Send bodies with BDAT on servers that offer CHUNKING
+            chunk_size (int): Bytes per BDAT command
+        """
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1")
+        
+        self.email_config = email_config
+        self.pool_size = pool_size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_connection_age = max_connection_age
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.metrics = metrics or CampaignMetrics()
+        self.pipelining = pipelining
+        self.chunking = chunking
+        self.chunk_size = chunk_size
+        
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self.connections_opened = 0
+    
+    def _open_session(self) -> PooledSMTPSession:
+        """Create and connect a new session."""
+        session = PooledSMTPSession(self.email_config, self.timeout, self.metrics,
+                                    self.pipelining, self.chunking, self.chunk_size)
+        session.connect()
+        with self._lock:
+            self.connections_opened += 1
+        self.logger.debug(f"Opened SMTP session to {self.email_config['smtp_server']} "
+                          f"(extensions: {', '.join(session.extensions) or 'none'})")
+        return session
+    
+    def _prepare(self, session: PooledSMTPSession) -> PooledSMTPSession:
+        """Make sure a session taken from the pool is fit for another message."""
+        if session.is_connected() and not session.is_expired(
+                self.max_messages_per_connection, self.max_connection_age):
+            idle_for = time.monotonic() - session.last_used
+            if idle_for < self.noop_interval or session.is_alive():
+                try:
+                    if session.message_count:
+                        session.reset()
+                    return session
+                except (smtplib.SMTPException, OSError):
+                    pass
+        
+        session.close()
+        session.connect()
+        with self._lock:
+            self.connections_opened += 1
+        return session
+    
+    def acquire(self) -> PooledSMTPSession:
+        """
+        Take a session from the pool, opening one if the pool is not full.
+        
+        Returns:
+            PooledSMTPSession: A connected session ready for a new transaction
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._open_session()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            session = self._idle.get()
+        
+        try:
+            return self._prepare(session)
+        except Exception:
+            self._discard(session)
+            raise
+    
+    def release(self, session: PooledSMTPSession) -> None:
+        """
+        Return a session to the pool.
+        
+        Args:
+            session (PooledSMTPSession): Session obtained from acquire()
+        """
+        if self._closed:
+            session.close()
+            return
+        if session.is_expired(self.max_messages_per_connection, self.max_connection_age):
+            session.close()
+        self._idle.put(session)
+    
+    def _discard(self, session: PooledSMTPSession) -> None:
+        """Drop a broken session and free its slot."""
+        session.close()
+        with self._lock:
+            self._created -= 1
+    
+    @contextmanager
+    def session(self):
+        """Context manager that acquires a session and always releases it."""
+        session = self.acquire()
+        try:
+            yield session
+        except Exception:
+            self._discard(session)
+            raise
+        else:
+            self.release(session)
+    
+    def supports(self, extension: str) -> bool:
+        """
+        Check whether the server advertises an ESMTP extension, opening a session if needed.
+        
+        Args:
+            extension (str): Extension name, e.g. '8BITMIME'
+        
+        Returns:
+            bool: True if the server's EHLO reply lists the extension
+        """
+        with self.session() as session:
+            return extension.upper() in session.extensions
+    
+    @staticmethod
+    def is_connection_error(error: Exception) -> bool:
+        """
+        Check whether an error means the session is no longer usable.
+        
+        Args:
+            error (Exception): Error raised while talking to the server
+        
+        Returns:
+            bool: True for dropped connections and 421 replies
+        """
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        if isinstance(error, smtplib.SMTPResponseException):
+            return error.smtp_code in RECONNECT_CODES
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return any(code in RECONNECT_CODES for code, _ in error.recipients.values())
+        return isinstance(error, (ConnectionError, socket.timeout))
+    
+    def send(self, from_addr: str, to_addrs: Union[str, List[str]], msg: Union[str, bytes],
+             max_attempts: int = 2) -> Dict:
+        """
+        Send a message, reconnecting if the session was dropped.
+        
+        Args:
+            from_addr (str): Envelope sender
+            to_addrs (Union[str, List[str]]): Envelope recipient(s)
+            msg (Union[str, bytes]): Serialized message
+            max_attempts (int): Attempts made when the connection fails
+        
+        Returns:
+            Dict: Refused recipients, as returned by smtplib
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            session = self.acquire()
+            try:
+                refused = session.sendmail(from_addr, to_addrs, msg)
+            except Exception as e:
+                if self.is_connection_error(e):
+                    self._discard(session)
+                    if attempt < max_attempts:
+                        self.logger.warning(f"SMTP session lost ({str(e)}), reconnecting")
+                        continue
+                else:
+                    self.release(session)
+                raise
+            self.release(session)
+            return refused
+    
+    def close(self) -> None:
+        """Close every idle session and refuse further use."""
+        self._closed = True
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
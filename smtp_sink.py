@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Local SMTP Sink
+Accepts and discards mail on a local port, with configurable latency and error injection.
+"""
+
+import argparse
+import random
+import socketserver
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DATA_END = b'\r\n.\r\n'
+
+# ESMTP extensions the sink can advertise
+EXTENSIONS = ('PIPELINING', 'CHUNKING', '8BITMIME', 'SMTPUTF8', 'SIZE')
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """SMTP dialogue for one client connection."""
+    
+    def reply(self, line: str, delay: float = 0.0) -> None:
+        if self.server.sink.pipelining:
+            # Replies to a pipelined group go out together, after one delay
+            self.pending.append(line)
+            self.pending_delay = max(self.pending_delay, delay)
+            return
+        if delay:
+            time.sleep(delay)
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+    
+    def flush_replies(self) -> None:
+        """Send the replies held back while the client was still pipelining commands."""
+        if not self.pending:
+            return
+        if self.pending_delay:
+            time.sleep(self.pending_delay)
+        self.wfile.write(''.join(f'{line}\r\n' for line in self.pending).encode('ascii'))
+        self.pending = []
+        self.pending_delay = 0.0
+    
+    def input_waiting(self) -> bool:
+        """Check without blocking whether the client has sent more than was read."""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except BlockingIOError:
+            return False
+        finally:
+            self.connection.setblocking(True)
+    
+    def read_data(self, keep: bool) -> Optional[Tuple[int, bytes]]:
+        """
+        Read message data up to the terminating dot line, in large chunks.
+        
+        Args:
+            keep (bool): Return the data instead of only counting it
+        
+        Returns:
+            Optional[Tuple[int, bytes]]: Size and data (empty unless kept), or None
+                if the client disconnected
+        """
+        chunks = []
+        size = 0
+        # DATA follows a line break, so a message may also end with a leading '.\r\n'
+        tail = b'\r\n'
+        while True:
+            buffered = self.rfile.peek(65536)
+            if not buffered:
+                return None
+            end = (tail + buffered).find(DATA_END)
+            if end >= 0:
+                chunk = self.rfile.read(end + len(DATA_END) - len(tail))[:-3]
+            else:
+                chunk = self.rfile.read(len(buffered))
+            size += len(chunk)
+            if keep:
+                chunks.append(chunk)
+            if end >= 0:
+                return size, b''.join(chunks)
+            tail = (tail + chunk)[-4:]
+    
+    def deliver(self, data: bytes, size: int, recipients: int) -> None:
+        """Count a received message and keep it if the sink keeps messages."""
+        sink = self.server.sink
+        with sink.lock:
+            sink.message_count += 1
+            sink.recipient_count += recipients
+            sink.bytes_received += size
+            if sink.keep_messages:
+                sink.messages.append(data)
+    
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+        self.pending = []
+        self.pending_delay = 0.0
+        try:
+            self.converse(sink)
+        finally:
+            if not self.wfile.closed:
+                try:
+                    self.flush_replies()
+                except OSError:
+                    pass
+    
+    def converse(self, sink: 'SMTPSink') -> None:
+        """Answer commands until the client quits or disconnects."""
+        delivered = 0
+        accepted = 0
+        chunks = []
+        chunked_size = 0
+        self.reply('220 localhost SMTP sink ready', sink.latency)
+        while True:
+            if self.pending and not self.input_waiting():
+                self.flush_replies()
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            with sink.lock:
+                if sink.keep_messages:
+                    sink.commands.append(verb)
+                    if verb == 'MAIL':
+                        sink.mail_options.append(command.split('>', 1)[-1].split())
+                scripted = None
+                if verb == 'RCPT':
+                    address = command.split(':', 1)[1].strip().strip('<>')
+                    queued = sink.rcpt_replies.get(address)
+                    scripted = queued.pop(0) if queued else sink.injected_reply()
+            
+            if verb == 'EHLO':
+                lines = ['localhost'] + list(sink.extensions)
+                self.reply('\r\n'.join(f"250{'-' if i < len(lines) - 1 else ' '}{text}"
+                                         for i, text in enumerate(lines)), sink.latency)
+            elif verb == 'HELO':
+                self.reply('250 localhost', sink.latency)
+            elif verb == 'MAIL' and sink.drop_after and delivered >= sink.drop_after:
+                self.reply('421 Too many messages, closing connection', sink.latency)
+                return
+            elif scripted:
+                self.reply(scripted, sink.latency)
+            elif verb in ('MAIL', 'RSET'):
+                accepted = 0
+                chunks = []
+                chunked_size = 0
+                self.reply('250 OK', sink.latency)
+            elif verb == 'RCPT':
+                accepted += 1
+                self.reply('250 OK', sink.latency)
+            elif verb == 'NOOP':
+                self.reply('250 OK', sink.latency)
+            elif verb == 'DATA':
+                if not accepted:
+                    self.reply('554 5.5.1 No valid recipients', sink.latency)
+                    continue
+                self.reply('354 End data with <CR><LF>.<CR><LF>', sink.latency)
+                self.flush_replies()
+                received = self.read_data(sink.keep_messages)
+                if received is None:
+                    return
+                size, data = received
+                self.deliver(data, size, accepted)
+                delivered += 1
+                self.reply('250 Queued', sink.latency + sink.data_latency)
+            elif verb == 'BDAT' and 'CHUNKING' in sink.extensions:
+                arguments = command.split()
+                size = int(arguments[1])
+                chunk = self.rfile.read(size)
+                if len(chunk) < size:
+                    return
+                if not accepted:
+                    # The chunk is read and dropped, as pipelined clients may send it anyway
+                    self.reply('554 5.5.1 No valid recipients', sink.latency)
+                    continue
+                chunked_size += size
+                if sink.keep_messages:
+                    chunks.append(chunk)
+                if len(arguments) > 2 and arguments[2].upper() == 'LAST':
+                    self.deliver(b''.join(chunks), chunked_size, accepted)
+                    delivered += 1
+                    accepted = 0
+                    chunks = []
+                    chunked_size = 0
+                    self.reply('250 Queued', sink.latency + sink.data_latency)
+                else:
+                    self.reply(f'250 {size} octets received', sink.latency)
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented', sink.latency)
+
+
+class SMTPSink:
+    """Threaded SMTP server that accepts mail without delivering it, for tests and benchmarks."""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0,
+                 data_latency: float = 0.0, temp_fail_rate: float = 0.0, perm_fail_rate: float = 0.0,
+                 drop_after: int = 0, keep_messages: bool = True, seed: Optional[int] = None,
+                 extensions: Iterable[str] = ()):
+        """
+        Initialize the sink. Call start() to begin accepting connections.
+        
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+            latency (float): Seconds to wait before every reply
+            data_latency (float): Extra seconds to wait before accepting message data
+            temp_fail_rate (float): Fraction of RCPT TO commands answered with 451
+            perm_fail_rate (float): Fraction of RCPT TO commands answered with 550
+            drop_after (int): Close each connection with 421 after this many
+                messages (0 = never)
+            keep_messages (bool): Keep received messages and commands in memory;
+                turn off for large benchmarks, counters are kept either way
+            seed (Optional[int]): Seed for error injection, for repeatable runs
+            extensions (Iterable[str]): ESMTP extensions to advertise, from
+                EXTENSIONS. With PIPELINING, the replies to a pipelined group of
+                commands share one latency wait, as over a real network
+        """
+        unknown = set(extensions) - set(EXTENSIONS)
+        if unknown:
+            raise ValueError(f"Unsupported extensions: {', '.join(sorted(unknown))}")
+        self.host = host
+        self.requested_port = port
+        self.latency = latency
+        self.data_latency = data_latency
+        self.temp_fail_rate = temp_fail_rate
+        self.perm_fail_rate = perm_fail_rate
+        self.drop_after = drop_after
+        self.keep_messages = keep_messages
+        self.extensions = tuple(extensions)
+        self.pipelining = 'PIPELINING' in self.extensions
+        self.lock = threading.Lock()
+        # Replies to send instead of 250 for RCPT TO, per address, e.g. ['451 Try later']
+        self.rcpt_replies: Dict[str, List[str]] = {}
+        self._random = random.Random(seed)
+        self._server = None
+        self.reset()
+    
+    def reset(self) -> None:
+        """Clear the received messages and counters."""
+        with self.lock:
+            self.connections = 0
+            self.commands: List[str] = []
+            # Parameters given with each MAIL FROM, e.g. ['BODY=8BITMIME', 'SIZE=1024']
+            self.mail_options: List[List[str]] = []
+            self.messages: List[bytes] = []
+            self.message_count = 0
+            self.recipient_count = 0
+            self.bytes_received = 0
+    
+    def injected_reply(self) -> Optional[str]:
+        """
+        Draw a random RCPT TO failure according to the configured rates.
+        
+        Returns:
+            Optional[str]: Failure reply, or None to accept the recipient
+        """
+        if not (self.temp_fail_rate or self.perm_fail_rate):
+            return None
+        draw = self._random.random()
+        if draw < self.temp_fail_rate:
+            return '451 4.7.1 Temporary failure, try again later'
+        if draw < self.temp_fail_rate + self.perm_fail_rate:
+            return '550 5.1.1 No such user'
+        return None
+    
+    @property
+    def port(self) -> int:
+        """Port the sink is listening on."""
+        return self._server.server_address[1]
+    
+    def start(self) -> 'SMTPSink':
+        """
+        Start serving in a background thread.
+        
+        Returns:
+            SMTPSink: This sink
+        """
+        self._server = socketserver.ThreadingTCPServer((self.host, self.requested_port), _SinkHandler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self) -> None:
+        """Stop serving and close the listening socket."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+    
+    def email_config(self, sender: str = 'sender@example.com') -> Dict:
+        """
+        Email configuration that sends through this sink, without TLS or login.
+        
+        Args:
+            sender (str): Sender address
+        
+        Returns:
+            Dict: Configuration for EmailAutomationTool.email_config
+        """
+        return {
+            'provider': 'default',
+            'email': sender,
+            'password': '',
+            'smtp_server': self.host,
+            'smtp_port': self.port,
+            'use_tls': False
+        }
+
+
+def main():
+    """Run a sink in the foreground until interrupted."""
+    parser = argparse.ArgumentParser(description="Local SMTP sink that accepts and discards mail.")
+    parser.add_argument('--host', default='127.0.0.1', help='interface to listen on')
+    parser.add_argument('--port', type=int, default=2525, help='port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before every reply')
+    parser.add_argument('--data-latency', type=float, default=0.0, help='extra seconds before accepting data')
+    parser.add_argument('--temp-fail-rate', type=float, default=0.0, help='fraction of recipients refused with 451')
+    parser.add_argument('--perm-fail-rate', type=float, default=0.0, help='fraction of recipients refused with 550')
+    parser.add_argument('--seed', type=int, default=None, help='seed for error injection')
+    parser.add_argument('--extensions', default='',
+                        help=f"comma-separated ESMTP extensions to advertise ({','.join(EXTENSIONS)})")
+    args = parser.parse_args()
+    
+    sink = SMTPSink(args.host, args.port, latency=args.latency, data_latency=args.data_latency,
+                    temp_fail_rate=args.temp_fail_rate, perm_fail_rate=args.perm_fail_rate,
+                    keep_messages=False, seed=args.seed,
+                    extensions=[name for name in args.extensions.upper().split(',') if name]).start()
+    print(f"📭 SMTP sink listening on {args.host}:{sink.port} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"   {sink.message_count} messages, {sink.recipient_count} recipients, "
+                  f"{sink.bytes_received / 1048576:.1f} MB received")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Template Engine
+Compiles subject and body templates once and renders them per recipient.
+"""
+
+import html
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+# {Field} or {Field|default value}
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)(?:\|([^{}]*))?\}')
+
+
+def _first_name(recipient: Dict[str, str]) -> Optional[str]:
+    parts = (recipient.get('name') or '').split()
+    return parts[0] if parts else None
+
+
+def _last_name(recipient: Dict[str, str]) -> Optional[str]:
+    parts = (recipient.get('name') or '').split()
+    return parts[-1] if len(parts) > 1 else None
+
+
+# Fields computed from other columns when the recipient file does not provide them
+DERIVED_FIELDS: Dict[str, Callable[[Dict[str, str]], Optional[str]]] = {
+    'firstname': _first_name,
+    'lastname': _last_name
+}
+
+
+def field_keys(field: str) -> Tuple[str, ...]:
+    """
+    List the recipient keys a placeholder may refer to.
+    
+    {Name} matches 'Name' or 'name'; {FirstName} also matches 'first_name'.
+    
+    Args:
+        field (str): Placeholder name
+    
+    Returns:
+        Tuple[str, ...]: Candidate keys in lookup order
+    """
+    snake = re.sub(r'(?<=[a-z0-9])([A-Z])', r'_\1', field).lower()
+    keys = []
+    for key in (field, field.lower(), snake):
+        if key not in keys:
+            keys.append(key)
+    return tuple(keys)
+
+
+class CompiledTemplate:
+    """A template parsed into literal and field segments."""
+    
+    def __init__(self, template: str, escape_html: bool = False):
+        """
+        Parse the template.
+        
+        Args:
+            template (str): Text with {Field} or {Field|default} placeholders
+            escape_html (bool): HTML-escape substituted values
+        """
+        self.template = template
+        self.escape_html = escape_html
+        self.literals: List[str] = []
+        self.fields: List[Tuple[str, Tuple[str, ...], Optional[str]]] = []
+        
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(template):
+            self.literals.append(template[position:match.start()])
+            self.fields.append((match.group(0), field_keys(match.group(1)), match.group(2)))
+            position = match.end()
+        self.literals.append(template[position:])
+    
+    @property
+    def field_names(self) -> Tuple[str, ...]:
+        """Placeholder names referenced by the template, in order of appearance."""
+        return tuple(keys[0] for _, keys, _ in self.fields)
+    
+    def lookup(self, recipient: Dict[str, str], keys: Tuple[str, ...]) -> Optional[str]:
+        """
+        Find the value of a field for a recipient.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient data
+            keys (Tuple[str, ...]): Candidate keys from field_keys()
+        
+        Returns:
+            Optional[str]: The value; '' when the field is known but empty for
+                this recipient (a blank column, or a name with no last name);
+                None when no column or derivation provides the field
+        """
+        empty = False
+        for key in keys:
+            value = recipient.get(key)
+            if value is not None:
+                if value != '':
+                    return str(value)
+                empty = True
+        derive = DERIVED_FIELDS.get(keys[-1].replace('_', ''))
+        if derive is not None:
+            return derive(recipient) or ''
+        return '' if empty else None
+    
+    def values(self, recipient: Dict[str, str]) -> Tuple[Optional[str], ...]:
+        """
+        Look up the value of every referenced field for a recipient.
+        
+        Recipients with the same values get the same rendered text, so the
+        tuple identifies the output.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient data
+        
+        Returns:
+            Tuple[Optional[str], ...]: One value (or None) per placeholder
+        """
+        return tuple(self.lookup(recipient, keys) for _, keys, _ in self.fields)
+    
+    def render(self, recipient: Dict[str, str]) -> str:
+        """
+        Render the template for one recipient.
+        
+        Empty fields use their default, or render as nothing. Fields no column
+        provides use their default; without one the placeholder is left untouched.
+        
+        Args:
+            recipient (Dict[str, str]): Recipient data
+        
+        Returns:
+            str: Rendered text
+        """
+        if not self.fields:
+            return self.template
+        return self.render_values(self.values(recipient))
+    
+    def render_values(self, values: Tuple[Optional[str], ...]) -> str:
+        """
+        Render the template from field values looked up with values().
+        
+        Args:
+            values (Tuple[Optional[str], ...]): One value (or None) per placeholder
+        
+        Returns:
+            str: Rendered text
+        """
+        literals = self.literals
+        parts = [literals[0]]
+        for index, ((placeholder, _, default), value) in enumerate(zip(self.fields, values), 1):
+            if not value:
+                if default is not None:
+                    value = default
+                elif value is None:
+                    value = placeholder
+            elif self.escape_html:
+                value = html.escape(value)
+            parts.append(value)
+            parts.append(literals[index])
+        return ''.join(parts)
+
+
+@lru_cache(maxsize=128)
+def compile_template(template: str, escape_html: bool = False) -> CompiledTemplate:
+    """
+    Compile a template, reusing the result for identical templates.
+    
+    Args:
+        template (str): Text with {Field} or {Field|default} placeholders
+        escape_html (bool): HTML-escape substituted values
+    
+    Returns:
+        CompiledTemplate: Parsed template
+    """
+    return CompiledTemplate(template, escape_html)
+
+
+class RenderCache:
+    """
+    Thread-safe LRU cache of rendered output, keyed on the values of the fields
+    a template references.
+    
+    Recipients that share those values (a common {Company}, or any recipient of
+    a template without placeholders) reuse one rendered and serialized result.
+    Templates whose output turns out to be unique per recipient (e.g. {Email})
+    stop being cached, so they do not pay for the bookkeeping.
+    """
+    
+    # Lookups of one template before its hit rate is judged, and the lowest rate kept
+    SAMPLE_SIZE = 1000
+    MIN_HIT_RATE = 0.05
+    
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            max_entries (int): Most results kept (0 disables caching)
+            max_bytes (int): Most rendered text kept, in characters
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[tuple, Tuple[Any, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+        # Per kind and template: [lookups, hits], until caching is given up
+        self._samples: Dict[tuple, List[int]] = {}
+        self._uncached: Set[tuple] = set()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, template: CompiledTemplate, recipient: Dict[str, str], kind: str = 'text',
+            build: Optional[Callable[[str], Any]] = None) -> Any:
+        """
+        Render a template for a recipient, reusing an earlier identical result.
+        
+        Args:
+            template (CompiledTemplate): Template to render
+            recipient (Dict[str, str]): Recipient data
+            kind (str): Name of what build produces, kept apart in the cache
+            build (Optional[Callable[[str], Any]]): Turns the rendered text into the
+                cached result, e.g. a serialized MIME part; the text itself when omitted
+        
+        Returns:
+            Any: Rendered text, or what build returned for it
+        """
+        values = template.values(recipient)
+        template_key = (kind, template.template, template.escape_html)
+        if not self.max_entries or template_key in self._uncached:
+            text = template.render_values(values)
+            return build(text) if build is not None else text
+        
+        key = (template_key, values)
+        with self._lock:
+            sample = self._samples.setdefault(template_key, [0, 0])
+            sample[0] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                sample[1] += 1
+                return entry[0]
+            self.misses += 1
+            if sample[0] >= self.SAMPLE_SIZE and sample[1] < sample[0] * self.MIN_HIT_RATE:
+                self._uncached.add(template_key)
+        
+        text = template.render_values(values)
+        result = build(text) if build is not None else text
+        size = len(text)
+        if size > self.max_bytes:
+            return result
+        
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = (result, size)
+                self.size += size
+                while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.size -= evicted_size
+        return result
+    
+    def __len__(self) -> int:
+        return len(self._entries)
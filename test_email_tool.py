@@ -4,9 +4,61 @@ Test script for Email Automation Tool
 This script demonstrates basic functionality without sending actual emails.
 """
 
+import base64
 import os
 import sys
+import tempfile
+import threading
 from email_automation_tool import EmailAutomationTool
+from smtp_pool import SMTPConnectionPool
+from send_engine import ConcurrentSender
+from rate_limiter import TokenBucketRateLimiter, get_rate_profile
+from recipient_source import RecipientSource
+import recipient_source
+from recipient_store import RecipientStore, MappedRecipientStore, create_recipient_store
+import pickle
+import pstats
+from template_engine import RenderCache, compile_template
+from mime_encoding import choose_encoding, html_to_text, minify_html
+import attachment_cache
+import email
+from email.header import decode_header, make_header
+from message_builder import address_value
+from send_journal import SendJournal, make_campaign_id
+from retry_queue import RetryQueue, classify_error, backoff_delay
+import smtplib
+from recipient_validation import (RecipientValidator, FingerprintSet, ascii_domain, fingerprint,
+                                  is_valid_address, load_suppression_list, normalize_address)
+from domain_batching import DomainBatcher, is_personalized
+from sharded_runner import shard_of, split_rate_profile
+from smtp_sink import SMTPSink
+from metrics import CampaignMetrics, CProfileHook, Histogram, MetricsServer
+from concurrent.futures import ThreadPoolExecutor
+import json
+import urllib.request
+import logging
+from log_pipeline import JsonLinesFormatter, setup_log_pipeline, stop_log_pipeline, tail_lines
+import time
+from datetime import datetime
+from campaign_scheduler import CampaignScheduler, CronRule, RUNNING
+from outbox_spool import OutboxSpool, RenderStage
+from sender_pool import is_sender_error
+from sent_index import SentIndex
+import campaign_cli
+import importlib.util
+import subprocess
+
+def start_smtp_stub(drop_after=0):
+    """Start a local SMTP sink in a background thread."""
+    return SMTPSink(drop_after=drop_after).start()
+
+def stop_smtp_stub(stub):
+    """Shut down a sink started with start_smtp_stub."""
+    stub.stop()
+
+def stub_email_config(stub):
+    """Email configuration pointing at a local sink without TLS or AUTH."""
+    return dict(stub.email_config(), provider='gmail')
 
 def test_recipient_loading():
     """Test recipient loading functionality."""
@@ -73,6 +125,1407 @@ def test_file_validation():
     else:
         print("❌ Should have failed for invalid file format")
 
+def test_connection_pool():
+    """Test SMTP session reuse, recycling and reconnects."""
+    print("\n🧪 Testing SMTP connection pool...")
+    
+    # Sessions are reused and reopened after the server answers 421
+    stub = start_smtp_stub(drop_after=3)
+    try:
+        config = stub_email_config(stub)
+        with SMTPConnectionPool(config, max_messages_per_connection=0) as pool:
+            for i in range(5):
+                pool.send(config['email'], f'user{i}@example.com', 'Subject: Hi\r\n\r\nHello')
+        assert len(stub.messages) == 5
+        assert stub.connections == 2
+        assert 'RSET' in stub.commands
+        print("✅ Sessions reused and reconnected after 421")
+    finally:
+        stop_smtp_stub(stub)
+    
+    # Sessions are recycled after the configured message count
+    stub = start_smtp_stub()
+    try:
+        tool = EmailAutomationTool()
+        tool.email_config = stub_email_config(stub)
+        tool.send_settings['max_messages_per_connection'] = 2
+        email_data = {'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []}
+        with tool.create_connection_pool() as pool:
+            for i in range(5):
+                recipient = {'name': f'User {i}', 'email': f'user{i}@example.com'}
+                success, message = tool.send_email(recipient, email_data, pool)
+                assert success, message
+        assert len(stub.messages) == 5
+        assert stub.connections == 3
+        print("✅ Sessions recycled after max messages per connection")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_concurrent_sending():
+    """Test ordered results, bounded in-flight work and parallel bulk sends."""
+    print("\n🧪 Testing concurrent send engine...")
+    
+    in_flight = []
+    lock = threading.Lock()
+    consumed = []
+    
+    def fake_send(recipient):
+        with lock:
+            in_flight.append(recipient['email'])
+        return recipient['email'].upper()
+    
+    def source():
+        for i in range(50):
+            consumed.append(i)
+            yield {'name': f'User {i}', 'email': f'user{i}@example.com'}
+    
+    sender = ConcurrentSender(fake_send, workers=4, max_in_flight=8)
+    results = []
+    for position, recipient, result in sender.run(source()):
+        # Never more than max_in_flight recipients pulled ahead of the results
+        assert len(consumed) - position < 8
+        results.append((position, result))
+    assert [position for position, _ in results] == list(range(1, 51))
+    assert results[0][1] == 'USER0@EXAMPLE.COM'
+    assert len(in_flight) == 50
+    print("✅ Results returned in order with bounded in-flight work")
+    
+    stub = start_smtp_stub()
+    try:
+        tool = EmailAutomationTool()
+        tool.email_config = stub_email_config(stub)
+        tool.send_settings.update({'workers': 4, 'rate_limit': {'messages_per_second': 1000, 'burst': 1000},
+                                   'journal_path': None})
+        tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(20)]
+        tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []})
+        assert len(stub.messages) == 20
+        assert stub.connections <= 4
+        print("✅ Bulk send delivered through parallel workers")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_rate_limiter():
+    """Test token-bucket pacing, daily quotas and adaptive backoff."""
+    print("\n🧪 Testing rate limiter...")
+    
+    now = [0.0]
+    waits = []
+    
+    def fake_sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+    
+    limiter = TokenBucketRateLimiter(2.0, burst=3, messages_per_day=5,
+                                     clock=lambda: now[0], sleep=fake_sleep)
+    for _ in range(5):
+        assert limiter.acquire()
+    # The burst goes out immediately, then one message every half second
+    assert waits == [0.5, 0.5]
+    assert not limiter.acquire()
+    assert limiter.remaining_today == 0
+    print("✅ Burst, sustained rate and daily quota enforced")
+    
+    limiter = TokenBucketRateLimiter(4.0, burst=1, clock=lambda: now[0], sleep=fake_sleep)
+    limiter.report_throttled()
+    assert limiter.rate == 2.0
+    for _ in range(40):
+        limiter.report_success()
+    assert limiter.rate == 4.0
+    print("✅ Rate backs off on throttling and recovers on success")
+    
+    assert get_rate_profile('outlook')['messages_per_day'] == 300
+    assert get_rate_profile('gmail', delay_between_emails=2)['messages_per_second'] == 0.5
+    print("✅ Provider profiles honour delay_between_emails")
+
+def test_streaming_recipients():
+    """Test lazy CSV/JSON/JSONL loading with per-line error reporting."""
+    print("\n🧪 Testing streaming recipient loader...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        csv_path = os.path.join(directory, 'recipients.csv')
+        with open(csv_path, 'w', encoding='utf-8') as file:
+            file.write('Name,Email\nAda,ada@example.com\nNo Email,\nGrace,grace@example.com\n')
+        source = RecipientSource(csv_path)
+        assert [r['email'] for r in source] == ['ada@example.com', 'grace@example.com']
+        assert source.errors == [(3, 'Empty email address')]
+        print("✅ CSV rows validated individually")
+        
+        jsonl_path = os.path.join(directory, 'recipients.jsonl')
+        with open(jsonl_path, 'w', encoding='utf-8') as file:
+            file.write('{"name": "Ada", "email": "ada@example.com"}\n{broken\n\n{"name": "Grace"}\n')
+        source = RecipientSource(jsonl_path)
+        assert len(list(source)) == 1
+        assert [line for line, _ in source.errors] == [2, 4]
+        print("✅ JSON Lines bad rows reported by line number")
+        
+        json_path = os.path.join(directory, 'recipients.json')
+        with open(json_path, 'w', encoding='utf-8') as file:
+            file.write('[\n  {"name": "Ada", "email": "ada@example.com"},\n  42,\n  {"name": "Grace", "email": "grace@example.com"}\n]')
+        source = RecipientSource(json_path)
+        assert [r['name'] for r in source] == ['Ada', 'Grace']
+        assert source.errors == [(3, 'Row is not an object')]
+        print("✅ JSON arrays decoded incrementally")
+        
+        chunked_path = os.path.join(directory, 'chunked.json')
+        chunk_size = recipient_source.CHUNK_SIZE
+        recipient_source.CHUNK_SIZE = 5
+        try:
+            # Values cut at every point by the tiny chunks still decode
+            with open(chunked_path, 'w', encoding='utf-8') as file:
+                file.write('[{"name": "Zo\\u00eb \\"Z\\"", "email": "zoe@example.com", "Seats": -12.5e1, '
+                           '"Active": true, "Notes": null, "Tags": ["a", "b"]}]')
+            assert list(RecipientSource(chunked_path)) == [{'name': 'Zoë "Z"', 'email': 'zoe@example.com',
+                                                         'Seats': -125.0, 'Active': True, 'Tags': ['a', 'b']}]
+            
+            # Invalid UTF-8 after the malformed element fails the read if the file is read on
+            with open(chunked_path, 'wb') as file:
+                file.write(b'[\n  {"name": "Ada", "email": "ada@example.com"},\n  {"name": Grace},\n'
+                           + b'  {"name": "Bob", "email": "bob@example.com"},\n' * 400 + b'\xff]')
+            source = RecipientSource(chunked_path)
+            loaded = []
+            try:
+                for recipient in source:
+                    loaded.append(recipient)
+                assert False
+            except ValueError as e:
+                assert 'Invalid JSON at line 3' in str(e) and len(loaded) == 1
+        finally:
+            recipient_source.CHUNK_SIZE = chunk_size
+        print("✅ Malformed array element reported without reading the rest of the file")
+        
+        tool = EmailAutomationTool()
+        assert tool.load_recipients(json_path, stream=True)
+        assert isinstance(tool.recipients, RecipientSource)
+        tool.preview_email({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []})
+        assert tool.load_recipients(jsonl_path)
+        assert list(tool.recipients) == [{'name': 'Ada', 'email': 'ada@example.com'}]
+        print("✅ Tool loads and previews streamed recipients")
+        
+        bad_csv_path = os.path.join(directory, 'bad.csv')
+        with open(bad_csv_path, 'w', encoding='utf-8') as file:
+            file.write('Foo,Bar\n1,2\n')
+        bad_json_path = os.path.join(directory, 'bad.json')
+        with open(bad_json_path, 'w', encoding='utf-8') as file:
+            file.write('  {"name": "Ada", "email": "ada@example.com"}')
+        for bad_path in (bad_csv_path, bad_json_path):
+            try:
+                RecipientSource(bad_path)
+                assert False, "Malformed file accepted"
+            except ValueError:
+                pass
+            assert not tool.load_recipients(bad_path, stream=True)
+        print("✅ Streamed files with a bad CSV header or no JSON list are rejected on load")
+        
+        with SMTPSink() as sink:
+            broken_path = os.path.join(directory, 'broken.json')
+            with open(broken_path, 'w', encoding='utf-8') as file:
+                file.write('[{"name": "Ada", "email": "ada@example.com"}, {"name": Grace}]')
+            tool.email_config = sink.email_config()
+            tool.send_settings.update(journal_path=os.path.join(directory, 'journal.db'),
+                                      sent_index_dir=os.path.join(directory, 'sent'),
+                                      rate_limit={'messages_per_second': 1000, 'burst': 1000})
+            assert tool.load_recipients(broken_path, stream=True)
+            assert tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain',
+                                          'attachments': []}) is None
+            # The sent index was still closed and compacted with the address sent before the error
+            with SentIndex(os.path.join(directory, 'sent', os.listdir(os.path.join(directory, 'sent'))[0])) as index:
+                assert 'ada@example.com' in index
+        print("✅ A recipients file that breaks mid-campaign stops it cleanly")
+
+def test_recipient_store():
+    """Test the columnar and memory-mapped recipient stores."""
+    print("\n🧪 Testing recipient store...")
+    
+    rows = [{'name': f'User {i}', 'email': f'user{i}@example.com', 'Company': f'Company {i % 5}'}
+            for i in range(3000)]
+    rows[7] = {'name': 'Ada', 'email': 'ada@example.com', 'Plan': 'pro', 'Seats': 12, 'Notes': ''}
+    expected = [dict(row, Seats='12') if 'Seats' in row else row for row in rows]
+    
+    store = RecipientStore(rows)
+    assert len(store) == 3000 and list(store) == expected
+    assert store[7] == expected[7] and store[-1] == expected[-1] and store[1:3] == expected[1:3]
+    assert type(store.columns['Company']).__name__ == 'InternedColumn'
+    assert type(store.columns['email']).__name__ == 'PackedColumn'
+    assert store.nbytes < 64 * len(store)
+    assert list(pickle.loads(pickle.dumps(store))) == expected
+    try:
+        store[3000]
+        assert False, "Out of range index accepted"
+    except IndexError:
+        pass
+    print(f"✅ Compact store round-trips recipients in {store.nbytes / len(store):.0f} bytes each")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        with MappedRecipientStore(rows[:10], directory) as mapped:
+            assert mapped[7] == expected[7] and list(mapped) == expected[:10]
+            mapped.append({'name': 'Grace', 'email': 'grace@example.com', 'Team': 'Navy'})
+            assert mapped[-1] == {'name': 'Grace', 'email': 'grace@example.com', 'Team': 'Navy'}
+            assert len(mapped) == 11 and mapped[0] == expected[0]
+        assert os.listdir(directory) == []
+    print("✅ Memory-mapped store appends, reads back and deletes its files")
+    
+    assert create_recipient_store('list', rows[:2]) == rows[:2]
+    try:
+        create_recipient_store('sqlite')
+        assert False, "Unknown store accepted"
+    except ValueError:
+        pass
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'recipients.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write("Name,Email,Company\nAda,ada@example.com,Analytical\nGrace,grace@example.com,\n")
+        tool = EmailAutomationTool()
+        tool.send_settings['recipient_store_dir'] = directory
+        for mode in ('list', 'compact', 'mmap'):
+            tool.send_settings['recipient_store'] = mode
+            assert tool.load_recipients(path)
+            assert list(tool.recipients) == [
+                {'name': 'Ada', 'email': 'ada@example.com', 'Company': 'Analytical'},
+                {'name': 'Grace', 'email': 'grace@example.com', 'Company': ''}]
+            # A blank column renders as nothing, not as its placeholder
+            assert compile_template("Hi {Name} from {Company}!").render(tool.recipients[1]) == "Hi Grace from !"
+            tool.preview_email({'subject': 'Hi', 'body': 'Hello {Name|there} from {Company|us}',
+                                'format': 'plain', 'attachments': []})
+        mapped = tool.recipients
+        assert tool.load_recipients(path, stream=True)
+        assert mapped._data.closed and isinstance(tool.recipients, RecipientSource)
+    print("✅ Tool keeps loaded recipients in the configured store and closes the old one")
+
+def test_template_engine():
+    """Test compiled templates with arbitrary fields, defaults and escaping."""
+    print("\n🧪 Testing template engine...")
+    
+    template = compile_template("Hi {FirstName|there}, {Company|your team} ({Email}) {Unknown} {Name}")
+    assert template.field_names == ('FirstName', 'Company', 'Email', 'Unknown', 'Name')
+    recipient = {'name': 'Ada Lovelace', 'email': 'ada@example.com', 'Company': 'Analytical'}
+    assert template.render(recipient) == "Hi Ada, Analytical (ada@example.com) {Unknown} Ada Lovelace"
+    assert template.render({'name': '', 'email': 'x@example.com'}) == "Hi there, your team (x@example.com) {Unknown} "
+    assert compile_template("{Name}: {Plan} {LastName}").render({'name': 'Ada', 'email': 'a@example.com', 'Plan': ''}) == "Ada:  "
+    assert compile_template("Hi {Name}") is compile_template("Hi {Name}")
+    print("✅ Fields, derived names and defaults rendered")
+    
+    tool = EmailAutomationTool()
+    html_body = tool.personalize_message("<p>{Name}</p>", {'name': 'Tom & <Jerry>', 'email': 't@example.com'},
+                                         escape_html=True)
+    assert html_body == "<p>Tom &amp; &lt;Jerry&gt;</p>"
+    assert compile_template("a{color:red} { Name }").render({'name': 'x'}) == "a{color:red} { Name }"
+    print("✅ HTML values escaped and non-placeholder braces kept")
+
+def test_attachment_cache():
+    """Test that attachments are encoded once, typed and refreshed on change."""
+    print("\n🧪 Testing attachment cache...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        pdf_path = os.path.join(directory, 'report.pdf')
+        with open(pdf_path, 'wb') as file:
+            file.write(os.urandom(5000))
+        
+        tool = EmailAutomationTool()
+        tool.email_config = {'email': 'sender@example.com'}
+        email_data = {'subject': 'Report', 'body': 'Hi {Name}', 'format': 'plain', 'attachments': [pdf_path]}
+        messages = [tool.create_email_message({'name': f'User {i}', 'email': f'user{i}@example.com'}, email_data)
+                    for i in range(3)]
+        part = messages[0].get_payload()[1]
+        assert part.get_content_type() == 'application/pdf'
+        assert part.get_filename() == 'report.pdf'
+        assert messages[2].get_payload()[1] is part
+        assert tool.attachment_cache.encoded == 1 and tool.attachment_cache.hits == 2
+        print("✅ Attachment encoded once and shared across messages")
+        
+        with open(pdf_path, 'ab') as file:
+            file.write(b'more')
+        tool.create_email_message({'name': 'Late', 'email': 'late@example.com'}, email_data)
+        assert tool.attachment_cache.encoded == 2
+        print("✅ Changed file re-encoded")
+        
+        limits = (attachment_cache.LARGE_FILE_THRESHOLD, attachment_cache.ENCODE_CHUNK_SIZE)
+        attachment_cache.LARGE_FILE_THRESHOLD, attachment_cache.ENCODE_CHUNK_SIZE = 1024, 57 * 10
+        try:
+            chunked = attachment_cache.encode_file_base64(pdf_path, os.path.getsize(pdf_path))
+        finally:
+            attachment_cache.LARGE_FILE_THRESHOLD, attachment_cache.ENCODE_CHUNK_SIZE = limits
+        with open(pdf_path, 'rb') as file:
+            assert chunked == base64.encodebytes(file.read()).decode('ascii')
+        print("✅ Memory-mapped chunked encoding matches base64")
+
+def test_message_builder():
+    """Test that spliced messages match the full MIME build."""
+    print("\n🧪 Testing spliced message builder...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        attachment = os.path.join(directory, 'notes.txt')
+        with open(attachment, 'wb') as file:
+            file.write(b'line one\nline two\n')
+        
+        tool = EmailAutomationTool()
+        tool.email_config = {'email': 'sender@example.com'}
+        recipient = {'name': 'Zoë <Z>', 'email': 'zoe@example.com'}
+        for email_format, body in (('plain', 'Hello {Name}\nSee attached.'), ('html', '<p>Hi {Name}</p>')):
+            email_data = {'subject': 'Hi {Name}', 'body': body, 'format': email_format, 'attachments': [attachment]}
+            tool.send_settings['message_assembly'] = 'mime'
+            expected = email.message_from_string(tool.serialize_message(recipient, email_data))
+            tool.send_settings['message_assembly'] = 'splice'
+            raw = tool.serialize_message(recipient, email_data)
+            assert isinstance(raw, bytes) and b'\r\n' in raw and b'\n' not in raw.replace(b'\r\n', b'')
+            spliced = email.message_from_bytes(raw)
+            
+            assert spliced['To'] == expected['To'] and spliced['From'] == expected['From']
+            assert str(make_header(decode_header(spliced['Subject']))) == 'Hi Zoë <Z>'
+            assert spliced['Message-ID'] and spliced['Date']
+            spliced_parts = spliced.get_payload()
+            expected_parts = expected.get_payload()
+            assert [p.get_content_type() for p in spliced_parts] == [p.get_content_type() for p in expected_parts]
+            assert (spliced_parts[0].get_payload(decode=True).replace(b'\r\n', b'\n')
+                    == expected_parts[0].get_payload(decode=True))
+            # The text attachment goes as 7bit, its lines ending in CRLF on the wire
+            assert spliced_parts[1]['Content-Transfer-Encoding'] == '7bit'
+            assert (spliced_parts[1].get_payload(decode=True).replace(b'\r\n', b'\n')
+                    == expected_parts[1].get_payload(decode=True))
+            assert spliced_parts[1].get_filename() == 'notes.txt'
+        print("✅ Spliced messages carry the same parts as MIMEMultipart")
+        
+        first = tool._message_builder
+        tool.serialize_message({'name': 'Other', 'email': 'other@example.com'}, email_data)
+        assert tool._message_builder is first
+        print("✅ Builder reused across recipients")
+        
+        # Encoded-words are not allowed in an address (RFC 2047), so it goes out as UTF-8
+        for assembly in ('mime', 'splice'):
+            tool.send_settings['message_assembly'] = assembly
+            raw = tool.serialize_message({'name': 'Jörg', 'email': 'jörg@bücher.example'}, email_data)
+            raw = raw if isinstance(raw, bytes) else raw.encode('utf-8')
+            assert 'To: jörg@bücher.example'.encode('utf-8') in raw.replace(b'\r', b'').split(b'\n')
+            assert b'=?utf-8?b?asO2cmdA' not in raw
+        named = address_value('Jörg <jörg@bücher.example>')
+        assert named.startswith('=?utf-8?') and named.endswith(' <jörg@bücher.example>')
+        print("✅ Internationalized addresses written as raw UTF-8, display names encoded")
+
+def test_transfer_encoding():
+    """Test per-part transfer encodings, HTML alternatives and 8bit bodies."""
+    print("\n🧪 Testing transfer encodings...")
+    
+    french = 'Bonjour à tous,\nvoici les nouvelles de la semaine.\n'.encode('utf-8')
+    assert choose_encoding(b'Hello\nworld\n') == '7bit'
+    assert choose_encoding(french) == 'quoted-printable'
+    assert choose_encoding(french, allow_8bit=True) == '8bit'
+    assert choose_encoding('日本語のテキスト'.encode('utf-8') * 20) == 'base64'
+    assert choose_encoding(b'x' * 2000) == 'quoted-printable', "lines over 998 bytes need encoding"
+    assert choose_encoding(b'plain bytes', text=False) == 'base64'
+    print("✅ Smallest valid encoding chosen for ASCII, accented, CJK, long-line and binary data")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        attachment = os.path.join(directory, 'agenda.csv')
+        with open(attachment, 'w', encoding='utf-8') as file:
+            file.write('Jour,Thème\n' + 'Lundi,Café,Quarterly planning meeting\n' * 200)
+        
+        tool = EmailAutomationTool()
+        tool.email_config = {'email': 'sender@example.com'}
+        recipient = {'name': 'Zoë', 'email': 'zoe@example.com'}
+        email_data = {'subject': 'Nouvelles', 'body': 'Chère {Name},\n' + 'Voici les détails du programme.\n' * 50,
+                      'format': 'plain', 'attachments': [attachment]}
+        sizes = {}
+        for assembly in ('splice', 'mime'):
+            tool.send_settings['message_assembly'] = assembly
+            for encoding in ('base64', 'auto'):
+                tool.send_settings['transfer_encoding'] = encoding
+                raw = tool.serialize_message(recipient, email_data)
+                raw = raw if isinstance(raw, bytes) else raw.encode('utf-8')
+                sizes[assembly, encoding] = len(raw)
+                body, attached = email.message_from_bytes(raw).get_payload()
+                if encoding == 'auto':
+                    assert body['Content-Transfer-Encoding'] == attached['Content-Transfer-Encoding'] == 'quoted-printable'
+                text = body.get_payload(decode=True).decode('utf-8').replace('\r\n', '\n')
+                assert text == email_data['body'].replace('{Name}', 'Zoë')
+                with open(attachment, 'rb') as file:
+                    assert attached.get_payload(decode=True).replace(b'\r\n', b'\n') == file.read()
+        for assembly in ('splice', 'mime'):
+            assert sizes[assembly, 'auto'] < sizes[assembly, 'base64'] * 0.9, sizes
+        print(f"✅ Quoted-printable message {sizes['splice', 'auto']} bytes instead of {sizes['splice', 'base64']} in base64")
+    
+    html = """<html>
+      <head><style> p { margin: 0; } </style></head>
+      <body>
+        <!-- main content -->
+        <table>
+          <tr><td><p>Dear <b>{Name}</b>,</p>
+            <p>Read <a href="https://example.com/news?id={Id|0}">the news</a>.</p></td></tr>
+        </table>
+      </body>
+    </html>"""
+    assert minify_html(html).startswith('<html><head><style> p { margin: 0; } </style></head><body><table><tr>')
+    assert 'main content' not in minify_html(html)
+    assert html_to_text(html) == 'Dear {Name},\n\nRead the news (https://example.com/news?id={Id|0}).\n'
+    
+    tool = EmailAutomationTool()
+    tool.email_config = {'email': 'sender@example.com'}
+    tool.send_settings['html_alternative'] = True
+    email_data = {'subject': 'News', 'body': html, 'format': 'html', 'attachments': []}
+    for assembly in ('splice', 'mime'):
+        tool.send_settings['message_assembly'] = assembly
+        raw = tool.serialize_message({'name': 'Ada & Co', 'email': 'ada@example.com', 'Id': '7'}, email_data)
+        message = email.message_from_bytes(raw) if isinstance(raw, bytes) else email.message_from_string(raw)
+        alternative = message.get_payload()[0]
+        assert alternative.get_content_type() == 'multipart/alternative'
+        text, rich = alternative.get_payload()
+        assert text.get_content_type() == 'text/plain' and rich.get_content_type() == 'text/html'
+        assert 'Dear Ada & Co,' in text.get_payload(decode=True).decode('ascii')
+        assert 'id=7' in text.get_payload(decode=True).decode('ascii')
+        assert '<b>Ada &amp; Co</b>' in rich.get_payload(decode=True).decode('ascii')
+        assert '\n ' not in rich.get_payload(decode=True).decode('ascii').replace('\r\n', '\n')
+    print("✅ HTML sent as multipart/alternative with a generated text part and minified HTML")
+    
+    # 8bit bodies only go to servers that advertise 8BITMIME
+    for extensions, expected in (((), 'quoted-printable'), (('8BITMIME',), '8bit')):
+        with SMTPSink(extensions=extensions) as sink:
+            tool = EmailAutomationTool()
+            tool.email_config = sink.email_config()
+            tool.send_settings.update({'journal_path': None,
+                                       'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+            tool.recipients = [{'name': 'Zoë', 'email': 'zoe@example.com'}]
+            summary = tool.send_bulk_emails({'subject': 'Hi', 'body': 'Chère {Name}, see you at the meeting next week',
+                                             'format': 'plain', 'attachments': []})
+            assert summary['successful'] == 1
+            body = email.message_from_bytes(sink.messages[0]).get_payload()[0]
+            assert body['Content-Transfer-Encoding'] == expected
+            assert body.get_payload(decode=True).decode('utf-8') == 'Chère Zoë, see you at the meeting next week'
+            assert (['BODY=8BITMIME'] in sink.mail_options) == (expected == '8bit')
+            assert tool.metrics.counters['bytes'] == sink.bytes_received
+    print("✅ 8bit bodies sent with BODY=8BITMIME to servers that advertise it, bytes on the wire counted")
+
+def test_render_cache():
+    """Test that identical renders are built once and the cache stays bounded."""
+    print("\n🧪 Testing render cache...")
+    
+    cache = RenderCache(max_entries=2)
+    template = compile_template("Hello from {Company|us}")
+    renders = []
+    build = lambda text: renders.append(text) or text.upper()
+    for company in ('Acme', 'Acme', 'Initech', 'Acme', ''):
+        cache.get(template, {'name': company, 'Company': company}, 'upper', build)
+    assert renders == ['Hello from Acme', 'Hello from Initech', 'Hello from us']
+    assert cache.hits == 2 and cache.misses == 3 and len(cache) == 2
+    assert cache.get(template, {'Company': 'Acme'}) == 'Hello from Acme'
+    cache.get(template, {'Company': 'Initech'}, 'upper', build)
+    assert len(renders) == 4, "least recently used entry is evicted"
+    
+    small = RenderCache(max_entries=100, max_bytes=40)
+    for i in range(10):
+        small.get(compile_template("{Name} " * 3), {'name': f'user{i}'})
+    assert small.size <= 40 and len(small) < 10
+    unique = RenderCache()
+    unique.SAMPLE_SIZE = 10
+    for i in range(30):
+        unique.get(template, {'Company': f'Company {i}'})
+    assert len(unique) == 10 and unique.misses == 10, "unique output stops being cached"
+    off = RenderCache(max_entries=0)
+    off.get(template, {'Company': 'Acme'})
+    assert len(off) == 0
+    print("✅ Entries keyed on referenced fields, evicted by count and size")
+    
+    tool = EmailAutomationTool()
+    tool.email_config = {'email': 'sender@example.com'}
+    email_data = {'subject': 'News for {Company}', 'body': 'Dear {Company} team,\nHéllo!', 'format': 'plain',
+                  'attachments': []}
+    messages = [tool.serialize_message({'name': f'U{i}', 'email': f'u{i}@example.com', 'Company': 'Acme'}, email_data)
+                for i in range(5)]
+    assert tool.render_cache.misses == 2 and tool.render_cache.hits == 8
+    parsed = [email.message_from_bytes(message) for message in messages]
+    assert len({message['Message-ID'] for message in parsed}) == 5 and parsed[4]['To'] == 'u4@example.com'
+    assert parsed[0].get_payload()[0].get_payload(decode=True).decode('utf-8') == 'Dear Acme team,\r\nHéllo!'
+    other = email.message_from_bytes(tool.serialize_message({'name': 'V', 'email': 'v@example.com',
+                                                             'Company': 'Initech'}, email_data))
+    assert other['Subject'] == 'News for Initech'
+    
+    tool.send_settings['message_assembly'] = 'mime'
+    mime = [email.message_from_string(tool.serialize_message({'name': f'U{i}', 'email': f'u{i}@example.com',
+                                                             'Company': 'Acme'}, email_data)) for i in range(2)]
+    assert mime[0].get_payload()[0].get_payload(decode=True) == mime[1].get_payload()[0].get_payload(decode=True)
+    assert mime[1]['To'] == 'u1@example.com'
+    print("✅ Recipients sharing field values reuse one encoded body")
+
+def test_send_journal():
+    """Test that an interrupted campaign resumes without re-sending."""
+    print("\n🧪 Testing send journal and resume...")
+    
+    stub = start_smtp_stub()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'recipients.csv')
+            with open(csv_path, 'w', encoding='utf-8') as file:
+                file.write('Name,Email\n')
+                for i in range(6):
+                    file.write(f'User {i},user{i}@example.com\n')
+            
+            tool = EmailAutomationTool()
+            tool.email_config = stub_email_config(stub)
+            tool.send_settings.update({'journal_path': os.path.join(directory, 'journal.db'),
+                                       'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+            assert tool.load_recipients(csv_path)
+            email_data = {'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []}
+            
+            # Simulate a run that died after delivering two recipients
+            campaign_id = make_campaign_id(email_data, tool.recipients_path)
+            with SendJournal(tool.send_settings['journal_path'], campaign_id) as journal:
+                journal.start_campaign(email_data, tool.recipients_path)
+                journal.record('user0@example.com', 'sent')
+                journal.record('user1@example.com', 'sent')
+                journal.record('user2@example.com', 'pending')
+            
+            tool.recipients = []
+            assert tool.resume_campaign(campaign_id)
+            assert len(stub.messages) == 4
+            assert not any(b'user0@example.com' in message for message in stub.messages)
+            
+            campaigns = tool.list_campaigns()
+            assert len(campaigns) == 1
+            assert campaigns[0]['counts']['sent'] == 6
+            assert campaigns[0]['counts']['pending'] == 0
+            print("✅ Resume skipped delivered recipients and journaled the rest")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_retry_queue():
+    """Test error classification, backoff and retries during bulk sends."""
+    print("\n🧪 Testing retry queue...")
+    
+    assert classify_error(smtplib.SMTPSenderRefused(451, b'Greylisted', 'a@example.com')) == 'transient'
+    assert classify_error(smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'No such user')})) == 'permanent'
+    assert classify_error(smtplib.SMTPServerDisconnected()) == 'transient'
+    assert classify_error(ValueError('bad template')) == 'permanent'
+    assert [backoff_delay(n, 2, 10, rand=lambda: 1.0) for n in (1, 2, 3, 4)] == [2, 4, 8, 10]
+    assert backoff_delay(3, 2, 10, rand=lambda: 0.0) == 4
+    print("✅ SMTP errors classified and backoff grows exponentially")
+    
+    now = [0.0]
+    queue = RetryQueue(max_retries=2, base_delay=1, clock=lambda: now[0], rand=lambda: 1.0)
+    assert queue.schedule('a', 1, smtplib.SMTPServerDisconnected()) == 1
+    assert queue.schedule('b', 1, smtplib.SMTPDataError(554, b'Rejected')) is None
+    assert queue.schedule('c', 3, smtplib.SMTPServerDisconnected()) is None
+    assert list(queue.pop_due()) == []
+    now[0] = 1.5
+    assert list(queue.pop_due()) == [('a', 2)]
+    print("✅ Only transient failures with retries left are queued")
+    
+    stub = start_smtp_stub()
+    try:
+        stub.rcpt_replies = {
+            'grey@example.com': ['451 4.7.1 Greylisted, try again later'],
+            'gone@example.com': ['550 5.1.1 No such user']
+        }
+        tool = EmailAutomationTool()
+        tool.email_config = stub_email_config(stub)
+        tool.send_settings.update({'journal_path': None, 'retry_base_delay': 0.01,
+                                   'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+        tool.recipients = [{'name': name, 'email': f'{name}@example.com'} for name in ('ok', 'grey', 'gone')]
+        tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []})
+        assert len(stub.messages) == 2
+        assert stub.commands.count('RCPT') == 4
+        print("✅ Greylisted recipient retried, bad mailbox dropped")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_recipient_validation():
+    """Test address normalization, deduplication, suppression and domain checks."""
+    print("\n🧪 Testing recipient validation...")
+    
+    assert normalize_address(' <Ada@Example.COM> ') == 'Ada@example.com'
+    assert normalize_address('mailto:bob@example.org') == 'bob@example.org'
+    assert is_valid_address('first.last+tag@mail.example.co.uk')
+    for bad in ('plainaddress', '@example.com', 'a..b@example.com', 'a@-example.com', 'a@example', 'a b@example.com'):
+        assert not is_valid_address(bad), bad
+    assert is_valid_address('zoë.müller@bücher.example') and is_valid_address('用户@例子.广告')
+    assert ascii_domain('bücher.example') == 'xn--bcher-kva.example'
+    assert not is_valid_address('a@bücher..example') and not is_valid_address('ä' * 33 + '@example.com')
+    assert normalize_address('zoe\u0308@B\u00dcCHER.example') == normalize_address('zo\u00eb@bücher.example')
+    print("✅ Addresses normalized and syntax checked, internationalized ones included")
+    
+    index = FingerprintSet(expected=4)
+    values = [fingerprint(f'user{i}@example.com') for i in range(1000)]
+    assert all(index.add(value) for value in values)
+    assert not index.add(values[10])
+    assert len(index) == 1000 and all(value in index for value in values)
+    assert fingerprint('someone@else.com') not in index
+    assert index.memory_bytes <= 8 * 2048
+    print("✅ Fingerprint index grows and stays compact")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        suppression_path = os.path.join(directory, 'suppressed.txt')
+        with open(suppression_path, 'w', encoding='utf-8') as file:
+            file.write('# unsubscribed\nblocked@example.com\n')
+        lookups = []
+        
+        def resolver(domain):
+            lookups.append(domain)
+            return domain != 'nowhere.invalid'
+        
+        validator = RecipientValidator(load_suppression_list(suppression_path), resolver)
+        recipients = [
+            {'name': 'Ada', 'email': 'ada@example.com'},
+            {'name': 'Ada again', 'email': 'ADA@Example.com'},
+            {'name': 'Broken', 'email': 'not-an-email'},
+            {'name': 'Blocked', 'email': 'Blocked@example.com'},
+            {'name': 'Nowhere', 'email': 'x@nowhere.invalid'},
+            {'name': 'Bob', 'email': 'bob@EXAMPLE.com'},
+        ]
+        accepted = list(validator.filter(recipients))
+        assert [r['email'] for r in accepted] == ['ada@example.com', 'bob@example.com']
+        assert validator.stats == {'checked': 6, 'accepted': 2, 'invalid_syntax': 1,
+                                   'duplicate': 1, 'suppressed': 1, 'bad_domain': 1}
+        assert lookups == ['example.com', 'nowhere.invalid']
+        assert validator.check({'name': 'Zoë', 'email': 'zoë@bücher.example'}) is None
+        assert lookups[-1] == 'xn--bcher-kva.example', "domains looked up in their IDNA form"
+        print("✅ Duplicates, suppressed and bad-domain recipients filtered with cached lookups")
+
+def test_domain_batching():
+    """Test grouping recipients by domain and multi-recipient transactions."""
+    print("\n🧪 Testing domain batching...")
+    
+    recipients = [{'name': f'u{i}', 'email': f'u{i}@{domain}'}
+                  for i, domain in enumerate(['a.com', 'b.com', 'A.com', 'a.com', 'b.com', 'c.com'])]
+    batches = [[r['email'] for r in batch] for batch in DomainBatcher(batch_size=2).batches(recipients)]
+    assert batches == [['u0@a.com', 'u2@A.com'], ['u1@b.com', 'u4@b.com'], ['u3@a.com'], ['u5@c.com']]
+    bounded = list(DomainBatcher(batch_size=3, max_buffered=3).batches(recipients))
+    assert [len(batch) for batch in bounded] == [2, 2, 1, 1]
+    assert is_personalized({'subject': 'Hi {Name}', 'body': 'Hello'})
+    assert not is_personalized({'subject': 'News', 'body': 'Hello everyone'})
+    print("✅ Recipients grouped per domain with bounded buffering")
+    
+    stub = start_smtp_stub()
+    try:
+        stub.rcpt_replies = {'gone@b.com': ['550 5.1.1 No such user']}
+        tool = EmailAutomationTool()
+        tool.email_config = stub_email_config(stub)
+        tool.send_settings.update({'journal_path': None, 'recipients_per_transaction': 10,
+                                   'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+        tool.recipients = [{'name': name, 'email': f'{name}@{domain}'}
+                           for name, domain in [('ann', 'a.com'), ('bob', 'b.com'), ('cat', 'a.com'),
+                                                ('gone', 'b.com'), ('dan', 'b.com')]]
+        newsletter = {'subject': 'News', 'body': 'Hello everyone', 'format': 'plain', 'attachments': []}
+        tool.send_bulk_emails(newsletter)
+        assert stub.commands.count('RCPT') == 5
+        assert len(stub.messages) == 2
+        assert all(b'To: undisclosed-recipients:;' in message for message in stub.messages)
+        assert not any(b'ann@a.com' in message for message in stub.messages)
+        print("✅ One transaction per domain, refused recipient reported alone")
+        
+        tool.send_bulk_emails(dict(newsletter, body='Hello {Name}'))
+        assert len(stub.messages) == 2 + 5
+        print("✅ Personalized templates still sent one message per recipient")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_sharded_campaign():
+    """Test splitting a campaign across worker processes."""
+    print("\n🧪 Testing sharded campaign...")
+    
+    assert shard_of('Ada@Example.com', 4) == shard_of(' <ada@example.com>', 4)
+    shares = [split_rate_profile({'messages_per_second': 2, 'messages_per_day': 500, 'burst': 10}, 3, shard)
+              for shard in range(3)]
+    assert sum(share['messages_per_day'] for share in shares) == 500
+    assert all(share['messages_per_second'] == 2 / 3 and share['burst'] == 3 for share in shares)
+    print("✅ Stable shard assignment and rate-limit shares")
+    
+    stub = start_smtp_stub()
+    try:
+        tool = EmailAutomationTool()
+        tool.email_config = stub_email_config(stub)
+        tool.send_settings.update({'journal_path': None, 'processes': 2,
+                                   'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+        tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(20)]
+        summary = tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []})
+        assert summary == {'successful': 20, 'failed': 0, 'skipped': 0, 'filtered': 0}
+        assert len(stub.messages) == 20
+        print("✅ In-memory recipients partitioned across processes")
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipients.jsonl')
+            with open(path, 'w', encoding='utf-8') as file:
+                for i in range(10):
+                    file.write(f'{{"name": "Reader {i}", "email": "reader{i}@example.org"}}\n')
+            tool.load_recipients(path, stream=True)
+            summary = tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello', 'format': 'plain', 'attachments': []})
+            assert summary['successful'] == 10
+            assert len(stub.messages) == 30
+        print("✅ Streamed recipient file read by every shard, each sending its own rows")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_smtp_sink():
+    """Test the local SMTP sink's counters, latency and error injection."""
+    print("\n🧪 Testing SMTP sink...")
+    
+    with SMTPSink(latency=0.005, perm_fail_rate=0.3, keep_messages=False, seed=7) as sink:
+        tool = EmailAutomationTool()
+        tool.email_config = sink.email_config()
+        tool.send_settings.update({'journal_path': None, 'workers': 4,
+                                   'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+        tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(40)]
+        summary = tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []})
+        assert summary['failed'] > 0 and summary['successful'] > 0
+        assert summary['successful'] + summary['failed'] == 40
+        assert sink.message_count == sink.recipient_count == summary['successful']
+        assert sink.messages == [] and sink.bytes_received > 0
+        print("✅ Injected 5xx failures reported, accepted messages counted without being kept")
+    
+    with SMTPSink() as sink:
+        tool = EmailAutomationTool()
+        tool.email_config = sink.email_config()
+        assert tool.test_smtp_connection()
+        success, _ = tool.send_email({'name': 'Ada', 'email': 'ada@example.com'},
+                                     {'subject': 'Hi {Name}', 'body': 'Hello', 'format': 'plain', 'attachments': []})
+        assert success and sink.connections == 2
+        assert b'Subject: Hi Ada' in sink.messages[0]
+        sink.rcpt_replies = {'ada@example.com': ['550 5.1.1 No such user']}
+        success, message = tool.send_email({'name': 'Ada', 'email': 'ada@example.com'},
+                                           {'subject': 'Hi', 'body': 'Hello', 'format': 'plain', 'attachments': []})
+        assert not success and '550' in message
+        print("✅ Single send_email over a one-off session delivered and refused")
+
+def test_metrics():
+    """Test phase histograms, Prometheus export and campaign instrumentation."""
+    print("\n🧪 Testing metrics...")
+    
+    histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+    for value in [0.0005] * 50 + [0.005] * 49 + [0.05]:
+        histogram.observe(value)
+    assert histogram.counts == [50, 49, 1, 0] and histogram.count == 100
+    assert histogram.quantile(0.5) <= 0.001 < histogram.quantile(0.9) <= 0.01
+    assert histogram.quantile(1.0) == 0.05
+    print("✅ Histogram buckets and quantile estimates")
+    
+    metrics = CampaignMetrics()
+    metrics.observe('render', 0.002)
+    metrics.increment('sent')
+    text = metrics.to_prometheus()
+    assert 'email_phase_seconds_bucket{phase="render",le="0.0025"} 1' in text
+    assert 'email_phase_seconds_bucket{phase="render",le="+Inf"} 1' in text
+    assert 'email_messages_total{result="sent"} 1' in text
+    server = MetricsServer(lambda: metrics, port=0).start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics') as response:
+            assert response.read().decode('utf-8') == text
+    finally:
+        server.stop()
+    print("✅ Prometheus exposition served over HTTP")
+    
+    with tempfile.TemporaryDirectory() as directory, SMTPSink() as sink:
+        tool = EmailAutomationTool()
+        tool.email_config = sink.email_config()
+        tool.send_settings.update({
+            'journal_path': None,
+            'rate_limit': {'messages_per_second': 1000, 'burst': 1000},
+            'metrics_path': os.path.join(directory, 'email.prom'),
+            'metrics_summary_path': os.path.join(directory, 'metrics.json'),
+            'profile_path': os.path.join(directory, 'campaign.prof'),
+            'workers': 2
+        })
+        sink.rcpt_replies = {'user4@example.com': ['550 5.1.1 No such user']}
+        tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(5)]
+        tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []})
+        
+        with open(os.path.join(directory, 'metrics.json'), encoding='utf-8') as file:
+            summary = json.load(file)
+        assert summary['counters']['sent'] == 4 and summary['counters']['failed'] == 1
+        # One session per worker at most
+        assert 1 <= summary['counters']['connections'] <= 2
+        assert {'render', 'connect', 'sendmail', 'message'} <= set(summary['phases'])
+        assert summary['phases']['render']['count'] == 5 and summary['phases']['sendmail']['count'] == 5
+        with open(os.path.join(directory, 'email.prom'), encoding='utf-8') as file:
+            assert 'email_messages_total{result="failed"} 1' in file.read()
+        profiled = {function for _, _, function in pstats.Stats(os.path.join(directory, 'campaign.prof')).stats}
+        # Sends run in the worker threads, which are profiled too
+        assert '_attempt_send' in profiled
+        
+        # A pool of several threads under one hook, which the interpreter's profiler must allow
+        def pool_task(n):
+            return sum(range(n))
+        hook = CProfileHook(os.path.join(directory, 'pool.prof'))
+        hook.start()
+        try:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                assert list(executor.map(pool_task, [10] * 6)) == [45] * 6
+        finally:
+            hook.stop()
+        profiled = {function for _, _, function in pstats.Stats(os.path.join(directory, 'pool.prof')).stats}
+        assert 'pool_task' in profiled
+        print("✅ Campaign phases timed, exported and profiled")
+
+def test_log_pipeline():
+    """Test queued logging with rotation, JSON lines and tailing."""
+    print("\n🧪 Testing log pipeline...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'big.log')
+        with open(path, 'w', encoding='utf-8') as file:
+            for i in range(50000):
+                file.write(f'line {i}\n')
+        assert tail_lines(path, 3) == ['line 49997', 'line 49998', 'line 49999']
+        assert tail_lines(path, 20, chunk_size=16) == [f'line {i}' for i in range(49980, 50000)]
+        assert len(tail_lines(path, 100000)) == 50000
+        print("✅ Tail reads only the end of the file")
+        
+        root = logging.getLogger()
+        saved_handlers, saved_level = list(root.handlers), root.level
+        try:
+            log_path = os.path.join(directory, 'email_logs.log')
+            assert setup_log_pipeline(log_path, max_bytes=2000, backup_count=2, log_format='json',
+                                      console_level='OFF', force=True)
+            assert not setup_log_pipeline(log_path)
+            assert isinstance(root.handlers[0], logging.handlers.QueueHandler)
+            logger = logging.getLogger('pipeline-test')
+            for i in range(100):
+                logger.info(f'Email sent successfully to User {i}')
+            stop_log_pipeline()
+            entry = json.loads(tail_lines(log_path, 1)[0])
+            assert entry['msg'] == 'Email sent successfully to User 99' and entry['level'] == 'INFO'
+            assert os.path.exists(log_path + '.1') and not os.path.exists(log_path + '.3')
+            print("✅ Records written off-thread as JSON lines and rotated by size")
+        finally:
+            stop_log_pipeline()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            for handler in saved_handlers:
+                root.addHandler(handler)
+            root.setLevel(saved_level)
+    
+    record = logging.LogRecord('x', logging.WARNING, __file__, 1, 'Rate "limited" %s', ('now',), None)
+    assert json.loads(JsonLinesFormatter().format(record))['msg'] == 'Rate "limited" now'
+    print("✅ JSON lines escape messages")
+
+def test_campaign_scheduler():
+    """Test cron rules, the persistent job store and background campaigns."""
+    print("\n🧪 Testing campaign scheduler...")
+    
+    start = datetime(2026, 3, 6, 8, 59, 30)  # a Friday
+    assert CronRule('0 9 * * 1-5').next_after(start) == datetime(2026, 3, 6, 9, 0)
+    assert CronRule('0 9 * * 1-5').next_after(datetime(2026, 3, 6, 9, 0)) == datetime(2026, 3, 9, 9, 0)
+    assert CronRule('*/15 * * * *').next_after(start) == datetime(2026, 3, 6, 9, 0)
+    assert CronRule('30 6 1,15 * 0').next_after(start) == datetime(2026, 3, 8, 6, 30)
+    assert CronRule('@monthly').next_after(start) == datetime(2026, 4, 1, 0, 0)
+    for bad in ('* * *', '61 * * * *', '0 9 * * mon', '*/0 * * * *'):
+        try:
+            CronRule(bad)
+            assert False, bad
+        except ValueError:
+            pass
+    print("✅ Cron rules find the next matching minute")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'jobs.db')
+        ran = []
+        done = threading.Event()
+        
+        def runner(job):
+            ran.append(job['email_data']['subject'])
+            if len(ran) == 3:
+                done.set()
+            return {'successful': 1}
+        
+        scheduler = CampaignScheduler(path, runner, max_concurrent=2)
+        scheduler.add_job({'subject': 'soon'}, 'r.csv', run_at=time.time() + 0.2)
+        scheduler.add_job({'subject': 'overdue'}, 'r.csv', run_at=time.time() - 60)
+        later = scheduler.add_job({'subject': 'later'}, 'r.csv', run_at=time.time() + 3600)
+        weekly = scheduler.add_job({'subject': 'weekly'}, 'r.csv', rule='@weekly', run_at=time.time() + 0.1)
+        scheduler.start()
+        assert done.wait(5)
+        assert ran[0] == 'overdue' and set(ran) == {'overdue', 'weekly', 'soon'}
+        assert scheduler.cancel(later) and not scheduler.cancel(later)
+        scheduler.close()
+        print("✅ Due jobs run in time order and cancelled jobs are dropped")
+        
+        scheduler = CampaignScheduler(path, runner)
+        jobs = {job['email_data']['subject']: job for job in scheduler.list_jobs()}
+        assert set(jobs) == {'weekly'}
+        assert jobs['weekly']['runs'] == 1 and jobs['weekly']['next_run'] > time.time() + 60
+        finished = {job['email_data']['subject']: job['status'] for job in scheduler.list_jobs(include_finished=True)}
+        assert finished['later'] == 'cancelled' and finished['overdue'] == 'done'
+        scheduler._connection.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (RUNNING, weekly))
+        scheduler.close()
+        
+        resumed = []
+        scheduler = CampaignScheduler(path, lambda job: resumed.append(job) or {})
+        scheduler.start()
+        deadline = time.time() + 5
+        while not resumed and time.time() < deadline:
+            time.sleep(0.02)
+        scheduler.close()
+        assert resumed and resumed[0]['job_id'] == weekly and resumed[0]['interrupted']
+        print("✅ Jobs persist across restarts; recurring jobs reschedule and interrupted runs resume")
+    
+    stub = start_smtp_stub()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            recipients = os.path.join(directory, 'recipients.csv')
+            with open(recipients, 'w', encoding='utf-8') as file:
+                file.write('Name,Email\n' + ''.join(f'User {i},user{i}@example.com\n' for i in range(5)))
+            tool = EmailAutomationTool()
+            tool.email_config = stub_email_config(stub)
+            tool.send_settings.update({
+                'scheduler_path': os.path.join(directory, 'jobs.db'),
+                'journal_path': None,
+                'rate_limit': {'messages_per_second': 1000, 'burst': 1000}
+            })
+            assert tool.load_recipients(recipients)
+            job_id = tool.schedule_campaign({'subject': 'Hi {Name}', 'body': 'Hello', 'format': 'plain',
+                                             'attachments': []}, run_at=datetime.now())
+            assert job_id
+            deadline = time.time() + 10
+            while tool.scheduler.list_jobs() and time.time() < deadline:
+                time.sleep(0.05)
+            job = tool.scheduler.list_jobs(include_finished=True)[0]
+            tool.scheduler.close()
+            assert job['status'] == 'done' and job['last_result']['successful'] == 5
+            assert stub.message_count == 5
+            print("✅ Scheduled campaigns send in the background")
+            
+            # Restarted before email is configured: due and interrupted jobs wait instead of failing
+            path = tool.send_settings['scheduler_path']
+            seed = CampaignScheduler(path, lambda job: {})
+            job_id = seed.add_job({'subject': 'Again {Name}', 'body': 'Hello', 'format': 'plain', 'attachments': []},
+                                  recipients, run_at=time.time() - 60)
+            seed._connection.execute("UPDATE jobs SET status = ? WHERE job_id = ?", (RUNNING, job_id))
+            seed.close()
+            tool = EmailAutomationTool()
+            tool.send_settings.update({'scheduler_path': path, 'journal_path': None,
+                                       'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+            tool.scheduler = CampaignScheduler(path, tool.run_scheduled_job, defer_delay=0.3)
+            tool.scheduler.start()
+            deadline = time.time() + 5
+            while not tool.scheduler.list_jobs()[0]['last_result'] and time.time() < deadline:
+                time.sleep(0.02)
+            job = tool.scheduler.list_jobs()[0]
+            assert job['status'] == 'scheduled' and job['interrupted'], job
+            assert job['last_result']['deferred'] == 'Email not configured'
+            tool.email_config = stub_email_config(stub)
+            deadline = time.time() + 10
+            while tool.scheduler.list_jobs() and time.time() < deadline:
+                time.sleep(0.05)
+            job = next(job for job in tool.scheduler.list_jobs(include_finished=True) if job['job_id'] == job_id)
+            tool.scheduler.close()
+            assert job['status'] == 'done' and job['last_result']['successful'] == 5
+            assert stub.message_count == 10
+            print("✅ Jobs due before email is configured wait for it and then run")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_headless_campaign():
+    """Test running campaign spec files without prompts."""
+    print("\n🧪 Testing headless campaign runner...")
+    
+    stub = start_smtp_stub()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'recipients.csv'), 'w', encoding='utf-8') as file:
+                file.write('Name,Email\n' + ''.join(f'User {i},user{i}@example.com\n' for i in range(4)))
+            with open(os.path.join(directory, 'welcome.html'), 'w', encoding='utf-8') as file:
+                file.write('<p>Hello <b>{Name}</b></p>')
+            with open(os.path.join(directory, 'campaign.toml'), 'w', encoding='utf-8') as file:
+                file.write(f"""
+[smtp]
+email = "sender@example.com"
+smtp_server = "127.0.0.1"
+smtp_port = {stub.port}
+use_tls = false
+
+[email]
+subject = "Hi {{Name}}"
+body_file = "welcome.html"
+
+[recipients]
+path = "recipients.csv"
+
+[settings]
+workers = 2
+journal_path = "{os.path.join(directory, 'journal.db').replace(os.sep, '/')}"
+rate_limit = {{ messages_per_second = 1000, burst = 1000 }}
+""")
+            spec_path = os.path.join(directory, 'campaign.toml')
+            result_path = os.path.join(directory, 'result.json')
+            assert campaign_cli.main([spec_path, '--result', result_path, '--quiet']) == campaign_cli.EXIT_OK
+            with open(result_path, encoding='utf-8') as file:
+                result = json.load(file)
+            assert result['status'] == 'sent' and result['successful'] == 4 and result['campaign_id']
+            assert stub.message_count == 4 and b'text/html' in stub.messages[0]
+            print("✅ TOML spec sends the whole campaign and writes a JSON result")
+            
+            spec = campaign_cli.load_spec(spec_path)
+            spec['resume'] = True
+            result = campaign_cli.run_campaign(spec, directory)
+            assert result['exit_code'] == campaign_cli.EXIT_OK and result['skipped'] == 4
+            assert stub.message_count == 4
+            
+            stub.rcpt_replies['user0@example.com'] = ['550 5.1.1 No such user']
+            spec['campaign_id'] = 'second'
+            result = campaign_cli.run_campaign(spec, directory)
+            assert result['status'] == 'partial' and result['exit_code'] == campaign_cli.EXIT_FAILURES
+            assert result['failed'] == 1 and result['successful'] == 3
+            print("✅ Resumed and partially failed campaigns report their exit codes")
+            
+            json_path = os.path.join(directory, 'campaign.json')
+            with open(json_path, 'w', encoding='utf-8') as file:
+                json.dump({'email': {'subject': 'Hi', 'body': 'Hello'}, 'recipients': 'recipients.csv',
+                           'settings': {'wrokers': 2}}, file)
+            result = campaign_cli.run_campaign(campaign_cli.load_spec(json_path), directory,
+                                               {'smtp': stub_email_config(stub), 'settings': {}})
+            assert result['exit_code'] == campaign_cli.EXIT_ERROR and 'wrokers' in result['error']
+            for bad in ({'email': {'subject': 'Hi'}}, {'email': {'subject': 'Hi', 'body': 'x'}},
+                        {'email': {'subject': 'Hi', 'body': 'x', 'attachments': ['missing.pdf']},
+                         'recipients': 'recipients.csv'}):
+                result = campaign_cli.run_campaign(bad, directory, {'smtp': stub_email_config(stub), 'settings': {}})
+                assert result['status'] == 'error' and result['exit_code'] == campaign_cli.EXIT_ERROR
+            try:
+                campaign_cli.load_spec(os.path.join(directory, 'recipients.csv'))
+                assert False
+            except campaign_cli.SpecError:
+                pass
+            print("✅ Spec errors exit with code 2 before anything is sent")
+            
+            config = {'smtp': stub_email_config(stub), 'settings': {}}
+            send_bulk_emails = campaign_cli.EmailAutomationTool.send_bulk_emails
+            run_campaign = campaign_cli.run_campaign
+            try:
+                campaign_cli.EmailAutomationTool.send_bulk_emails = lambda *args, **kwargs: 1 / 0
+                result = campaign_cli.run_campaign(spec, directory, config)
+                assert result['exit_code'] == campaign_cli.EXIT_ERROR and 'ZeroDivisionError' in result['error']
+                campaign_cli.run_campaign = lambda *args, **kwargs: {}['missing']
+                assert campaign_cli.main([spec_path, '--result', result_path, '--quiet']) == campaign_cli.EXIT_ERROR
+                with open(result_path, encoding='utf-8') as file:
+                    result = json.load(file)
+                assert result['status'] == 'error' and 'KeyError' in result['error']
+            finally:
+                campaign_cli.EmailAutomationTool.send_bulk_emails = send_bulk_emails
+                campaign_cli.run_campaign = run_campaign
+            print("✅ Unexpected errors still write a JSON result and exit with code 2")
+            
+            with open(os.path.join(directory, 'tool_settings_config.py'), 'w', encoding='utf-8') as file:
+                file.write("EMAIL_SETTINGS = {'delay_between_emails': 2, 'max_retries': 7, 'bogus': 1}\n")
+            sys.path.insert(0, directory)
+            try:
+                tool = EmailAutomationTool()
+                assert tool.load_settings_file('tool_settings_config')
+                assert tool.send_settings['delay_between_emails'] == 2 and tool.send_settings['max_retries'] == 7
+                assert 'bogus' not in tool.send_settings
+                assert not EmailAutomationTool().load_settings_file('no_such_config_module')
+            finally:
+                sys.path.remove(directory)
+                sys.modules.pop('tool_settings_config', None)
+            print("✅ Interactive tool applies EMAIL_SETTINGS from the config module")
+    finally:
+        stop_smtp_stub(stub)
+
+def test_outbox_spool():
+    """Test rendering into the outbox spool and sending from it."""
+    print("\n🧪 Testing outbox spool...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        spool_path = os.path.join(directory, 'spool')
+        recipients = [[{'name': f'User {i}', 'email': f'user{i}@example.com', 'Plan': 'pro'}] for i in range(3)]
+        with OutboxSpool(spool_path, 'w') as spool:
+            entries = list(RenderStage(recipients, lambda batch: f"To: {batch[0]['email']}\r\n\r\nHi\r\n".encode(),
+                                       spool, queue_size=1))
+            assert spool.read(entries[2]) == b"To: user2@example.com\r\n\r\nHi\r\n"
+        with OutboxSpool(spool_path) as spool:
+            assert not spool.complete and list(spool.entries()) == entries
+            assert entries[0].recipients == [{'name': 'User 0', 'email': 'user0@example.com'}]
+        with open(os.path.join(spool_path, 'index.jsonl'), 'a', encoding='utf-8') as file:
+            file.write('[999, 10, [')
+        assert len(list(OutboxSpool(spool_path).entries())) == 3
+        print("✅ Spool reads back complete entries and ignores a cut-off index line")
+        
+        def failing(batch):
+            raise ValueError("render failed")
+        try:
+            list(RenderStage(recipients, failing, OutboxSpool(spool_path, 'w')))
+            assert False, "Render error swallowed"
+        except ValueError:
+            pass
+        
+        stub = start_smtp_stub()
+        try:
+            email_data = {'subject': 'Hi {Name}', 'body': 'Hello {Name}, your plan: {Plan}',
+                          'format': 'plain', 'attachments': []}
+            tool = EmailAutomationTool()
+            tool.email_config = stub_email_config(stub)
+            tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com', 'Plan': 'pro'}
+                               for i in range(6)]
+            tool.recipients_path = os.path.join(directory, 'recipients.csv')
+            tool.send_settings.update(workers=2, outbox_path=spool_path, outbox_queue_size=2,
+                                      journal_path=os.path.join(directory, 'journal.db'),
+                                      rate_limit={'messages_per_second': 1000, 'burst': 1000})
+            result = tool.send_bulk_emails(email_data)
+            assert result['successful'] == 6 and stub.message_count == 6
+            spool = OutboxSpool(spool_path)
+            assert spool.complete and spool.messages == 6 and spool.manifest['email_data'] == email_data
+            assert sorted(stub.messages) == sorted(spool.read(entry) for entry in spool.entries())
+            spool.close()
+            print("✅ Campaign renders into the spool while the sessions send from it")
+            
+            rendered_path = os.path.join(directory, 'rendered')
+            assert tool.render_outbox(dict(email_data, subject='Later {Name}'), rendered_path) == 6
+            assert stub.message_count == 6
+            
+            sender = EmailAutomationTool()
+            sender.email_config = stub_email_config(stub)
+            sender.send_settings.update(journal_path=tool.send_settings['journal_path'],
+                                        rate_limit={'messages_per_second': 1000, 'burst': 1000})
+            stub.rcpt_replies['user1@example.com'] = ['550 5.1.1 No such user']
+            result = sender.send_outbox(rendered_path)
+            assert result['successful'] == 5 and result['failed'] == 1 and stub.message_count == 11
+            assert all(b'Subject: Later User' in message for message in stub.messages[6:])
+            del stub.rcpt_replies['user1@example.com']
+            result = sender.send_outbox(rendered_path, resume=True)
+            assert result['skipped'] == 5 and result['successful'] == 1 and stub.message_count == 12
+            print("✅ Pre-rendered outbox is sent on its own and resumes from the journal")
+        finally:
+            stop_smtp_stub(stub)
+
+def test_esmtp_extensions():
+    """Test pipelined, chunked sends and the plain SMTP fallback."""
+    print("\n🧪 Testing ESMTP extensions...")
+    
+    message = 'Subject: Café\r\n\r\nBonjour é\r\n.hidden dot\r\n'.encode('utf-8')
+    recipients = ['ada@example.com', 'bob@example.com']
+    
+    def send_all(extensions):
+        with SMTPSink(latency=0.02, extensions=extensions) as sink:
+            config = sink.email_config()
+            start = time.perf_counter()
+            with SMTPConnectionPool(config) as pool:
+                for _ in range(10):
+                    pool.send(config['email'], recipients, message)
+            return time.perf_counter() - start, sink
+    
+    plain_seconds, plain = send_all(())
+    fast_seconds, fast = send_all(('PIPELINING', 'CHUNKING', '8BITMIME', 'SIZE'))
+    assert 'DATA' in plain.commands and 'BDAT' not in plain.commands
+    assert plain.mail_options[0] == []
+    assert 'BDAT' in fast.commands and 'DATA' not in fast.commands
+    assert fast.mail_options[0] == ['BODY=8BITMIME', f'SIZE={len(message)}']
+    assert plain.message_count == fast.message_count == 10
+    assert plain.recipient_count == fast.recipient_count == 20
+    # DATA dot-stuffs the body; BDAT sends it unchanged
+    assert fast.messages[0] == message and plain.messages[0] == message.replace(b'\n.', b'\n..')
+    assert fast_seconds < plain_seconds / 2, f"pipelined {fast_seconds:.2f}s, plain {plain_seconds:.2f}s"
+    print(f"✅ Pipelined BDAT sends in {fast_seconds:.2f}s, plain DATA in {plain_seconds:.2f}s")
+    
+    with SMTPSink(extensions=('PIPELINING', 'CHUNKING'), drop_after=2) as sink:
+        config = sink.email_config()
+        sink.rcpt_replies = {'bob@example.com': ['550 5.1.1 No such user']}
+        with SMTPConnectionPool(config) as pool:
+            assert pool.send(config['email'], recipients, message) == {'bob@example.com': (550, b'5.1.1 No such user')}
+            sink.rcpt_replies = {'ada@example.com': ['550 5.1.1 No such user']}
+            try:
+                pool.send(config['email'], 'ada@example.com', message)
+                assert False, "refused recipient accepted"
+            except smtplib.SMTPRecipientsRefused as e:
+                assert list(e.recipients) == ['ada@example.com']
+            for _ in range(3):
+                pool.send(config['email'], recipients, message)
+        assert sink.message_count == 4 and sink.connections == 2
+        print("✅ Refused recipients and 421 reconnects handled inside pipelined groups")
+    
+    with SMTPSink() as sink:
+        config = sink.email_config()
+        with SMTPConnectionPool(config) as pool:
+            try:
+                pool.send(config['email'], 'zoë@example.com', message)
+                assert False, "non-ASCII address sent without SMTPUTF8"
+            except smtplib.SMTPNotSupportedError:
+                pass
+    with SMTPSink(extensions=('PIPELINING', 'SMTPUTF8')) as sink:
+        config = sink.email_config()
+        with SMTPConnectionPool(config) as pool:
+            pool.send(config['email'], 'zoë@example.com', message)
+        assert sink.mail_options == [['SMTPUTF8']] and sink.message_count == 1
+        
+        # Validation is on by default and lets internationalized recipients through
+        tool = EmailAutomationTool()
+        tool.email_config = config
+        tool.send_settings.update({'journal_path': None, 'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+        tool.recipients = [{'name': 'Zoë', 'email': 'zoë@bücher.example'}]
+        summary = tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello', 'format': 'plain', 'attachments': []})
+        assert summary['successful'] == 1 and summary['filtered'] == 0
+        assert 'To: zoë@bücher.example\r\n'.encode('utf-8') in sink.messages[-1]
+    
+    with SMTPSink() as sink:
+        # Without SMTPUTF8 only the internationalized recipient fails, also when batched
+        tool = EmailAutomationTool()
+        tool.email_config = sink.email_config()
+        tool.send_settings.update({'journal_path': None, 'recipients_per_transaction': 10,
+                                   'rate_limit': {'messages_per_second': 1000, 'burst': 1000}})
+        tool.recipients = [{'name': 'Ann', 'email': 'ann@bucher.example'},
+                           {'name': 'Jörg', 'email': 'jörg@bucher.example'}]
+        summary = tool.send_bulk_emails({'subject': 'Hi', 'body': 'Hello', 'format': 'plain', 'attachments': []})
+        assert summary['successful'] == 1 and summary['failed'] == 1 and sink.message_count == 1
+        assert tool.metrics.counters['retried'] == 0, "missing SMTPUTF8 is not worth retrying"
+    print("✅ SMTPUTF8 declared for non-ASCII addresses and required from the server")
+
+def test_sender_pool():
+    """Test weighted load balancing, quotas and failover across senders."""
+    print("\n🧪 Testing sender pool...")
+    
+    email_data = {'subject': 'Hi {Name}', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []}
+    fast = {'messages_per_second': 1000, 'burst': 1000}
+    with SMTPSink() as first, SMTPSink() as second:
+        tool = EmailAutomationTool()
+        tool.email_config = first.email_config()
+        tool.send_settings.update({
+            'journal_path': None, 'workers': 1, 'rate_limit': fast,
+            'senders': [dict(first.email_config('a@example.com'), weight=3),
+                        dict(second.email_config('b@example.com'), weight=1)]
+        })
+        tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(40)]
+        summary = tool.send_bulk_emails(email_data)
+        assert summary['successful'] == 40
+        assert (first.message_count, second.message_count) == (30, 10)
+        assert b'From: b@example.com' in second.messages[0] and b'sender@example.com' not in second.messages[0]
+        with tool.create_sender_pool() as pool:
+            pool.send('sender@example.com', ['x@example.com', 'y@example.com'],
+                      'From: Team <sender@example.com>\r\nSubject: Hi\r\n\r\nHello from sender@example.com')
+            assert [stats['sent'] for stats in pool.stats()] == [2, 0], "recipients counted, not transactions"
+        assert first.messages[-1].startswith(b'From: Team <a@example.com>\r\n')
+        assert first.messages[-1].endswith(b'Hello from sender@example.com\r\n'), "only the header is rewritten"
+        print("✅ Messages spread 3:1 by weight, each sender using its own envelope and From address")
+        
+        # A sender with two messages of quota left hands the rest to the other one
+        first.reset()
+        second.reset()
+        tool.send_settings['senders'][0]['messages_per_day'] = 2
+        summary = tool.send_bulk_emails(email_data)
+        assert summary['successful'] == 40
+        assert (first.message_count, second.message_count) == (2, 38)
+        
+        tool.send_settings['senders'][1]['messages_per_day'] = 5
+        summary = tool.send_bulk_emails(email_data)
+        assert summary['successful'] == 7 and summary['failed'] == 33
+        assert tool.metrics.counters['retried'] == 0
+        print("✅ Daily quotas tracked per sender, the campaign fails only when all are used up")
+    
+    # A sender that cannot connect is passed over and the campaign keeps going
+    with SMTPSink() as healthy:
+        down = SMTPSink().start()
+        down_config = down.email_config('down@example.com')
+        down.stop()
+        tool = EmailAutomationTool()
+        tool.email_config = healthy.email_config()
+        tool.send_settings.update({'journal_path': None, 'workers': 2, 'rate_limit': fast,
+                                   'sender_selection': 'least_loaded',
+                                   'senders': [down_config, healthy.email_config()]})
+        tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(20)]
+        summary = tool.send_bulk_emails(email_data)
+        assert summary['successful'] == 20 and healthy.message_count == 20
+        assert tool.metrics.counters['sender_failovers'] == 1
+        print("✅ Failed sender rested after one failover, least-loaded selection sent the rest")
+        
+        # Recipient refusals are not retried through other senders
+        healthy.rcpt_replies = {'user0@example.com': ['550 5.1.1 No such user']}
+        tool.send_settings['senders'] = [healthy.email_config(), dict(healthy.email_config(), name='second')]
+        with tool.create_sender_pool() as pool:
+            try:
+                pool.send('sender@example.com', 'user0@example.com', 'Subject: Hi\r\n\r\nHello')
+                assert False, "refused recipient accepted"
+            except smtplib.SMTPRecipientsRefused:
+                pass
+            assert [stats['failed'] for stats in pool.stats()] == [0, 0]
+        tool.send_settings['sender_selection'] = 'fastest'
+        assert tool.send_bulk_emails(email_data) is None
+        print("✅ Recipient refusals raised without failover, invalid selection rejected")
+    
+    denied = smtplib.SMTPDataError(554, b'5.2.0 STOREDRV.Submission.Exception:SendAsDeniedException.MapiExceptionSendAsDenied')
+    assert is_sender_error(denied)
+    assert not is_sender_error(smtplib.SMTPDataError(554, b'5.6.0 Message content rejected'))
+    print("✅ Send-as refusals fail over to another sender")
+
+def test_sent_index():
+    """Test the persistent index of addresses a campaign already sent to."""
+    print("\n🧪 Testing sent index...")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'campaign')
+        with SentIndex(path) as index:
+            assert index.add('Ann@Example.com') and not index.add('ann@example.com')
+            assert 'ANN@example.com' in index and 'bob@example.com' not in index
+            for i in range(99):
+                index.add(f'user{i}@example.com')
+        assert os.listdir(path) == ['index.bin'], "logs folded into the index on close"
+        
+        # Grows in place while the table has room, then is rebuilt at twice the size
+        for batch in range(3):
+            with SentIndex(path) as index:
+                assert len(index) == 100 + 300 * batch
+                for i in range(99 + 300 * batch, 399 + 300 * batch):
+                    index.add(f'user{i}@example.com')
+                slots = len(index._slots)
+        with SentIndex(path) as index:
+            assert len(index) == 1000 and len(index._slots) > slots == 1024
+            assert all(f'user{i}@example.com' in index for i in range(999))
+            assert not any(f'new{i}@example.com' in index for i in range(5000)), "Bloom hits are confirmed"
+        print("✅ Addresses found case-insensitively across runs, never confused with new ones")
+        
+        # A run that never closed its index left a log, possibly with a torn last record
+        index = SentIndex(path)
+        for i in range(300):
+            index.add(f'crashed{i}@example.com')
+        index.flush()
+        with open(index._logs[0], 'ab') as log:
+            log.write(b'\x01\x02\x03')
+        with SentIndex(path) as reopened:
+            assert 'crashed299@example.com' in reopened and len(reopened) == 1300
+        assert os.listdir(path) == ['index.bin']
+        print("✅ Logs of interrupted runs are read back and folded in")
+        
+        # A weekly re-run of a grown list only sends to the new addresses
+        with SMTPSink() as sink:
+            email_data = {'subject': 'Weekly', 'body': 'Hello {Name}', 'format': 'plain', 'attachments': []}
+            tool = EmailAutomationTool()
+            tool.email_config = sink.email_config()
+            tool.recipients_path = os.path.join(directory, 'recipients.csv')
+            tool.send_settings.update(journal_path=None, sent_index_dir=os.path.join(directory, 'sent'),
+                                      rate_limit={'messages_per_second': 1000, 'burst': 1000})
+            tool.recipients = [{'name': f'User {i}', 'email': f'user{i}@example.com'} for i in range(3)]
+            assert tool.send_bulk_emails(email_data)['successful'] == 3
+            
+            tool.recipients = [{'name': f'User {i}', 'email': f'USER{i}@example.com'} for i in range(5)]
+            result = tool.send_bulk_emails(email_data)
+            assert result['successful'] == 2 and result['skipped'] == 3, result
+            assert [b'To: USER3@example.com' in message for message in sink.messages[3:]] == [True, False]
+            
+            # Another composition is another campaign with its own index
+            result = tool.send_bulk_emails(dict(email_data, subject='Monthly'))
+            assert result['successful'] == 5 and len(os.listdir(os.path.join(directory, 'sent'))) == 2
+        print("✅ Re-running a campaign skips the addresses it already sent to")
+
+def test_startup_budget():
+    """Test that the tool imports its heavy subsystems lazily."""
+    print("\n🧪 Testing startup imports...")
+    
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'bench_startup.py')
+    spec = importlib.util.spec_from_file_location('bench_startup', path)
+    bench_startup = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bench_startup)
+    
+    script = (
+        "import json, logging, sys, email_automation_tool\n"
+        "tool = email_automation_tool.EmailAutomationTool()\n"
+        "tool.recipients = [{'name': 'Ada', 'email': 'ada@example.com'}]\n"
+        "tool.preview_email({'subject': 'Hi {Name}', 'body': 'Hello', 'format': 'plain', 'attachments': []})\n"
+        "tool.view_logs()\n"
+        "print(json.dumps({'loaded': [name for name in %r if name in sys.modules],"
+        " 'handlers': len(logging.getLogger().handlers)}))\n" % (bench_startup.LAZY_MODULES,)
+    )
+    completed = subprocess.run([sys.executable, '-c', script], cwd=bench_startup.ROOT,
+                               stdout=subprocess.PIPE, text=True, check=True)
+    state = json.loads(completed.stdout.strip().splitlines()[-1])
+    assert state['loaded'] == [], f"imported eagerly: {state['loaded']}"
+    assert state['handlers'] == 0, "logging set up without anything logged"
+    print("✅ Preview and View Logs run without the SMTP, MIME, scheduler or logging subsystems")
+    
+    # The time budget depends on the machine, so only benchmarks/bench_startup.py enforces it
+    times = bench_startup.import_times()
+    assert not [name for name in bench_startup.LAZY_MODULES if name in times]
+    print("✅ Importing the tool loads none of the lazy subsystems")
+
 def main():
     """Run all tests."""
     print("🚀 Running Email Automation Tool Tests")
@@ -82,6 +1535,31 @@ def main():
         test_recipient_loading()
         test_email_composition()
         test_file_validation()
+        test_connection_pool()
+        test_concurrent_sending()
+        test_rate_limiter()
+        test_streaming_recipients()
+        test_recipient_store()
+        test_template_engine()
+        test_attachment_cache()
+        test_message_builder()
+        test_transfer_encoding()
+        test_render_cache()
+        test_send_journal()
+        test_retry_queue()
+        test_recipient_validation()
+        test_domain_batching()
+        test_sharded_campaign()
+        test_smtp_sink()
+        test_metrics()
+        test_log_pipeline()
+        test_campaign_scheduler()
+        test_headless_campaign()
+        test_outbox_spool()
+        test_esmtp_extensions()
+        test_sender_pool()
+        test_sent_index()
+        test_startup_budget()
         
         print("\n✅ All tests completed!")
         print("\nNote: This test script only validates functionality without sending actual emails.")